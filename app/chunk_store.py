@@ -0,0 +1,111 @@
+import json
+import mmap
+import os
+from array import array
+
+import numpy as np
+
+OFFSET_DTYPE = np.dtype([("id", "<i8"), ("offset", "<u8"), ("length", "<u4")])
+
+
+class ChunkStore:
+    """
+    Read-only chunk mapping backed by two files:
+    an offset table (.npy of id/offset/length records sorted by id) and a blob of
+    compact JSON records. Both are memory-mapped, so opening is O(1) and only the
+    chunks that are actually looked up get paged in and decoded.
+    """
+
+    def __init__(self, offsets_path, blob_path):
+        self._table = np.load(offsets_path, mmap_mode="r")
+        self._ids = self._table["id"]
+        self._file = open(blob_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._blob = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return len(self._table)
+
+    def _position(self, chunk_id):
+        pos = int(np.searchsorted(self._ids, chunk_id))
+        if pos < len(self._ids) and self._ids[pos] == chunk_id:
+            return pos
+        return None
+
+    def __contains__(self, chunk_id):
+        return self._position(chunk_id) is not None
+
+    def __getitem__(self, chunk_id):
+        pos = self._position(chunk_id)
+        if pos is None:
+            raise KeyError(chunk_id)
+        return self.at(pos)
+
+    def at(self, position):
+        record = self._table[position]
+        start = int(record["offset"])
+        return json.loads(self._blob[start:start + int(record["length"])])
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self.at(position)
+
+    def ids(self):
+        return self._ids
+
+    def close(self):
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+        self._file.close()
+        self._table = self._ids = None
+
+
+class ChunkStoreWriter:
+    """
+    Appends chunks to a new offset table + blob at exactly the given paths. Chunk data
+    goes straight to the blob; only ids, offsets and lengths are held in memory (as
+    compact arrays) until close() writes the table.
+    """
+
+    def __init__(self, offsets_path, blob_path):
+        self.offsets_path = offsets_path
+        self._blob = open(blob_path, "wb")
+        self._ids = array("q")
+        self._offsets = array("Q")
+        self._lengths = array("I")
+        self._offset = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, chunk):
+        data = json.dumps(chunk, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        self._blob.write(data)
+        self._ids.append(chunk["id"])
+        self._offsets.append(self._offset)
+        self._lengths.append(len(data))
+        self._offset += len(data)
+
+    def close(self):
+        self._blob.close()
+        table = np.empty(len(self._ids), dtype=OFFSET_DTYPE)
+        table["id"] = self._ids
+        table["offset"] = self._offsets
+        table["length"] = self._lengths
+        if len(table) and np.any(np.diff(table["id"]) <= 0):
+            order = np.argsort(table["id"], kind="stable")
+            table = table[order]
+        with open(self.offsets_path, "wb") as f:
+            np.save(f, table)
+
+
+def write_chunk_store(chunks, offsets_path, blob_path):
+    """
+    Writes chunks (an iterable of dicts with increasing "id") to a new offset table + blob.
+    Files are written next to the targets as .tmp; the caller swaps them in with os.replace
+    (CodebaseIndex.commit).
+    """
+    writer = ChunkStoreWriter(offsets_path + ".tmp", blob_path + ".tmp")
+    for chunk in chunks:
+        writer.add(chunk)
+    writer.close()
@@ -0,0 +1,377 @@
+import bisect
+import os
+import re
+
+from app.config import CHUNK_MAX_CHARS, CHUNK_OVERLAP_LINES, FALLBACK_CHUNK_LINES
+
+BRACE_EXTENSIONS = {".c", ".h", ".cpp", ".hpp", ".cc", ".cxx", ".java", ".js", ".ts", ".tsx",
+                    ".cs", ".go", ".php", ".swift"}
+PYTHON_EXTENSIONS = {".py"}
+
+# Brace structure is read with two compiled patterns whose alternatives are all
+# unambiguous: a full string or comment wherever one starts, and a lone quote, slash or
+# newline only where it cannot. Braces inside strings, comments and preprocessor lines
+# are never counted, and a failed match never backtracks into another tokenisation.
+_SKIPPED = (
+    r'"[^"\\\n]*(?:\\.[^"\\\n]*)*"'
+    r'|//[^\n]*(?![^\n])'
+    r'|/\*[^*]*(?:\*+[^*/][^*]*)*(?:\*+/|\**\Z)'
+    r'|/(?![/*])'
+    r"|'[^'\\\n]*(?:\\.[^'\\\n]*)*'"
+    r'|`[^`\\]*(?:\\.[^`\\]*)*`'
+    r'|"(?![^"\\\n]*(?:\\.[^"\\\n]*)*")'
+    r"|'(?![^'\\\n]*(?:\\.[^'\\\n]*)*')"
+    r'|`(?![^`\\]*(?:\\.[^`\\]*)*`)'
+)
+# The next structural token (group 1): a brace, ';' or a preprocessor line.
+_CODE = r'[^{};"\'/`\n]*'
+BRACE_STRUCTURE = re.compile(
+    _CODE + r'(?:(?:' + _SKIPPED + r'|\n(?![ \t]*#))' + _CODE + r')*([{};]|\n[ \t]*#[^\n]*)',
+    re.S,
+)
+# A whole function body, braces nested up to BRACE_BODY_DEPTH deep, in one match. Newlines
+# are plain code here, so a body containing a preprocessor line is walked token by token.
+BRACE_BODY_DEPTH = 12
+_BODY_CODE = r'[^{}"\'/`]*'
+
+
+def _body_pattern(depth):
+    pattern = r'\{' + _BODY_CODE + r'(?:(?:' + _SKIPPED + r')' + _BODY_CODE + r')*\}'
+    for _ in range(depth - 1):
+        pattern = r'\{' + _BODY_CODE + r'(?:(?:' + pattern + '|' + _SKIPPED + r')' + _BODY_CODE + r')*\}'
+    return pattern
+
+
+BRACE_BODY = re.compile(_body_pattern(BRACE_BODY_DEPTH), re.S)
+PREPROCESSOR_LINE = re.compile(r'\n[ \t]*#')
+# The ';' ending a declaration whose body just closed ("struct P { ... };", "f = () => { ... };")
+TRAILING_SEMICOLON = re.compile(r'[ \t]*;')
+NEWLINE = re.compile(r'\n')
+COMMENT = re.compile(r'//[^\n]*|/\*.*?\*/', re.S)
+CONTAINER_HEADER = re.compile(
+    r'\b(namespace|class|struct|interface|union|enum|trait|extension|protocol|module'
+    r'|extern\s+"C(?:\+\+)?")(?!\w)\s*([A-Za-z_][\w:.]*)?'
+)
+NON_DEFINITION_HEADER = re.compile(
+    r'^(?:\}\s*)?(?:if|else|for|while|do|switch|try|catch|finally|import)\b|^export$'
+)
+IDENTIFIER = re.compile(r'[A-Za-z_]\w*(?:::~?[A-Za-z_]\w*)*')
+# The start of a K&R definition: "name(a, b)" followed by a declaration of some of its parameters
+KR_DECLARATOR = re.compile(r'.*?[A-Za-z_]\w*\s*\(\s*([A-Za-z_]\w*(?:\s*,\s*[A-Za-z_]\w*)*)\s*\)([^;{}()]+;)$')
+
+# String prefixes (r, b, f, ...) need no special handling: matching starts at the quote.
+PY_TOKENS = re.compile(
+    r'\n|[()\[\]{}]'
+    r'|#[^\n]*'
+    r'|"""(?:\\.|[^\\])*?(?:"""|\Z)'
+    r"|'''(?:\\.|[^\\])*?(?:'''|\Z)"
+    r'|"(?:\\.|[^"\\\n])*"'
+    r"|'(?:\\.|[^'\\\n])*'",
+)
+PY_DEFINITION = re.compile(r'(async\s+def|def|class)\s+([A-Za-z_]\w*)')
+
+
+class _Source:
+    """
+    Line and byte offset lookups for one file; newline positions are only collected
+    when a caller needs them.
+    """
+
+    def __init__(self, code):
+        self.code = code
+        self.ascii = code.isascii()
+        self._newlines = None
+
+    @property
+    def newlines(self):
+        if self._newlines is None:
+            self._newlines = [m.start() for m in NEWLINE.finditer(self.code)]
+        return self._newlines
+
+    def line_start(self, line):
+        return self.newlines[line - 1] + 1 if line > 0 else 0
+
+    def byte_offsets(self, offsets):
+        """
+        Maps character offsets to UTF-8 byte offsets in one pass over the sorted offsets.
+        """
+        if self.ascii:
+            return {o: o for o in offsets}
+        result = {}
+        position = byte_position = 0
+        for offset in sorted(set(offsets)):
+            byte_position += len(self.code[position:offset].encode("utf-8"))
+            position = offset
+            result[offset] = byte_position
+        return result
+
+
+def _signature_of(header):
+    if "/" in header:
+        header = COMMENT.sub(" ", header)
+    return " ".join(header.split())
+
+
+def _symbol_of(signature):
+    if "(" in signature:
+        names = IDENTIFIER.findall(signature.split("(", 1)[0])
+        return names[-1] if names else None
+    container = CONTAINER_HEADER.search(signature)
+    return container.group(2).rstrip(":") if container and container.group(2) else None
+
+
+def _through_semicolon(code, end):
+    semicolon = TRAILING_SEMICOLON.match(code, end)
+    return semicolon.end() if semicolon else end
+
+
+def _declares_only(declaration, params):
+    """True if declaration, ending at its ';', declares nothing but names in params."""
+    declaration = _signature_of(declaration)
+    if "(" in declaration or "=" in declaration:
+        return False
+    for declarator in declaration[:-1].split(","):
+        names = IDENTIFIER.findall(declarator)
+        if not names or names[-1] not in params:
+            return False
+    return True
+
+
+def _kr_parameters(statement):
+    """
+    The parameter names if statement, ending at a ';', is a K&R function declarator
+    followed by a declaration of its parameters ("int add(a, b) int a;"), else None.
+    """
+    # Cheap rejections first: calls ("f(x);"), then assignments and initialisers
+    if ")" not in statement or not statement[statement.rfind(")") + 1:-1].strip():
+        return None
+    signature = _signature_of(statement)
+    match = "=" not in signature and KR_DECLARATOR.match(signature)
+    if not match:
+        return None
+    params = frozenset(name.strip() for name in match.group(1).split(","))
+    return params if _declares_only(match.group(2), params) else None
+
+
+def _brace_units(src):
+    """
+    Yields (start, end, signature) for every function-like block at file,
+    namespace or class level. Classes/namespaces are descended into; a container
+    with no function inside (a plain struct or enum) is emitted as a whole.
+    """
+    code = src.code
+    # frame: [kind, header_start, signature, emitted_children]
+    stack = []
+    boundary = 0
+    units_open = 0
+    # Parameters of a K&R definition whose declarations are being read, and where the next one starts
+    kr_params = kr_start = None
+    if code.lstrip(" \t").startswith("#"):
+        boundary = code.find("\n") if "\n" in code else len(code)
+    position = boundary
+    while True:
+        match = BRACE_STRUCTURE.match(code, position)
+        if not match:
+            break
+        position = match.end()
+        token = match.group(1)
+        in_unit = units_open > 0
+
+        if token == "{":
+            if in_unit:
+                stack.append(["block", None, None, False])
+                continue
+            kr_params = None
+            brace = match.start(1)
+            header = code[boundary:brace]
+            start = boundary + len(header) - len(header.lstrip())
+            signature = _signature_of(header)
+            if NON_DEFINITION_HEADER.match(signature) or not signature:
+                kind = "block"
+            elif "(" not in signature.split("{")[0].split("=")[0] and CONTAINER_HEADER.search(signature):
+                kind = "container"
+            else:
+                kind = "unit"
+                body = BRACE_BODY.match(code, brace)
+                if body and not PREPROCESSOR_LINE.search(code, brace, body.end()):
+                    # The common case: the whole body in one match, no per-token walk
+                    boundary = position = _through_semicolon(code, body.end())
+                    yield start, boundary, signature
+                    for frame in stack:
+                        frame[3] = True
+                    continue
+            stack.append([kind, start, signature, False])
+            units_open += kind == "unit"
+            boundary = match.end()
+        elif token == "}":
+            kr_params = None
+            if not stack:
+                boundary = match.end()
+                continue
+            kind, start, signature, emitted = stack.pop()
+            units_open -= kind == "unit"
+            end = match.end()
+            if kind == "unit" or (kind == "container" and not emitted):
+                end = position = _through_semicolon(code, end)
+                yield start, end, signature
+                for frame in stack:
+                    frame[3] = True
+            if not in_unit or kind == "unit":
+                boundary = end
+        elif not in_unit:
+            # ';' or a preprocessor line ends the current declaration, unless it ends
+            # a parameter declaration of a K&R definition. Each declaration is read once.
+            if token == ";" and kr_params is not None and _declares_only(code[kr_start:match.end()], kr_params):
+                kr_start = match.end()
+                continue
+            statement_start = boundary if kr_params is None else kr_start
+            kr_params = _kr_parameters(code[statement_start:match.end()]) if token == ";" else None
+            if kr_params is None:
+                boundary = match.end()
+            else:
+                boundary, kr_start = statement_start, match.end()
+
+    # Unterminated units (truncated files) run to the end of the file
+    for kind, start, signature, emitted in stack:
+        if kind == "unit":
+            yield start, len(code), signature
+            break
+
+
+def _python_units(src):
+    """
+    Yields (start, end, signature) for top-level functions, methods and classes
+    without methods, following indentation of logical lines (continuation lines
+    and multi-line strings are skipped).
+    """
+    code = src.code
+    logical_starts = [0]
+    depth = 0
+    for match in PY_TOKENS.finditer(code):
+        token = match.group()
+        if token == "\n":
+            if depth == 0:
+                logical_starts.append(match.end())
+        elif token in "([{":
+            depth += 1
+        elif token in ")]}":
+            depth = max(0, depth - 1)
+
+    # frame: [indent, kind, start, signature, emitted_children]
+    stack = []
+    last_end = 0
+    decorator_start = None
+
+    def close(indent):
+        while stack and stack[-1][0] >= indent:
+            _, kind, start, signature, emitted = stack.pop()
+            if kind == "def" and (not stack or stack[-1][1] == "class"):
+                yield start, last_end, signature
+                if stack:
+                    stack[-1][4] = True
+            elif kind == "class" and not emitted and (not stack or stack[-1][1] == "class"):
+                yield start, last_end, signature
+
+    for n, start in enumerate(logical_starts):
+        end = logical_starts[n + 1] if n + 1 < len(logical_starts) else len(code)
+        text = code[start:end]
+        stripped = text.lstrip(" \t")
+        if not stripped.strip() or stripped.startswith("#"):
+            continue
+        indent = len(text) - len(stripped)
+        yield from close(indent)
+        definition = PY_DEFINITION.match(stripped)
+        if stripped.startswith("@"):
+            if decorator_start is None:
+                decorator_start = start + indent
+        elif definition:
+            kind = "class" if definition.group(1) == "class" else "def"
+            signature = " ".join(stripped.split())
+            unit_start = decorator_start if decorator_start is not None else start + indent
+            stack.append([indent, kind, unit_start, signature, False])
+            decorator_start = None
+        else:
+            decorator_start = None
+        last_end = start + len(text.rstrip())
+    yield from close(-1)
+
+
+def _split(src, start, end):
+    """
+    Splits [start, end) at line boundaries into pieces of about CHUNK_MAX_CHARS,
+    each repeating the last CHUNK_OVERLAP_LINES lines of the previous piece.
+    """
+    if end - start <= CHUNK_MAX_CHARS:
+        return [(start, end)]
+    starts = [start] + [m.end() for m in NEWLINE.finditer(src.code, start, end - 1)]
+    pieces = []
+    i = 0
+    while True:
+        # First line that no longer fits in a piece starting at line i
+        j = bisect.bisect_right(starts, starts[i] + CHUNK_MAX_CHARS, i + 1)
+        if j >= len(starts):
+            pieces.append((starts[i], end))
+            return pieces
+        pieces.append((starts[i], starts[j] - 1))
+        i = max(j - CHUNK_OVERLAP_LINES, i + 1)
+
+
+def _fallback_units(src):
+    lines = len(src.newlines) + 1
+    for first in range(0, lines, FALLBACK_CHUNK_LINES):
+        start = src.line_start(first)
+        last = min(first + FALLBACK_CHUNK_LINES, lines) - 1
+        end = src.newlines[last] if last < len(src.newlines) else len(src.code)
+        if src.code[start:end].strip():
+            yield start, end, "fallback"
+
+
+def chunk_code(code, source_path):
+    """
+    Splits a source file into function-level chunks in one pass.
+    Brace languages and Python are parsed structurally; anything else, or a file
+    without functions, is cut into FALLBACK_CHUNK_LINES-line windows.
+    Chunks carry 0-based start_line/end_line (inclusive) and UTF-8 start_byte/end_byte.
+    """
+    src = _Source(code)
+    ext = os.path.splitext(source_path)[1].lower()
+    if ext in BRACE_EXTENSIONS:
+        units = list(_brace_units(src))
+    elif ext in PYTHON_EXTENSIONS:
+        units = list(_python_units(src))
+    else:
+        units = []
+    if not units:
+        units = list(_fallback_units(src))
+
+    spans = []
+    for start, end, signature in units:
+        pieces = _split(src, start, end)
+        for part, (piece_start, piece_end) in enumerate(pieces):
+            spans.append((piece_start, piece_end, signature, part if len(pieces) > 1 else None))
+    spans.sort()
+
+    byte_offsets = src.byte_offsets([offset for span in spans for offset in span[:2]])
+    chunks = []
+    # spans are sorted, so line numbers are counted incrementally from the previous start
+    line = position = 0
+    for start, end, signature, part in spans:
+        content = code[start:end].strip()
+        if not content:
+            continue
+        line += code.count("\n", position, start)
+        position = start
+        chunk = {
+            "content": content,
+            "source": source_path,
+            "start_line": line,
+            "end_line": line + code.count("\n", start, max(start, end - 1)),
+            "start_byte": byte_offsets[start],
+            "end_byte": byte_offsets[end],
+            "signature": signature,
+            "symbol": None if signature == "fallback" else _symbol_of(signature),
+        }
+        if part is not None:
+            chunk["part"] = part
+        chunks.append(chunk)
+    return chunks
@@ -1,7 +1,144 @@
+import os
+
 MODEL_NAME = "Qwen/Qwen1.5-0.5B-Chat" 
 EMBED_MODEL_NAME = "all-MiniLM-L6-v2"  
 CODE_FOLDER = "data/codebase"
 CHUNK_FILE = "data/chunks.json"
 
+# Ingestion: chunking worker processes and embedding batch size
+INGEST_WORKERS = os.cpu_count() or 1
+INGEST_PARALLEL_MIN_FILES = 64
+EMBED_BATCH_SIZE = 256
+
+# Chunking: oversized functions are split at line boundaries with overlap
+CHUNK_MAX_CHARS = 2000
+CHUNK_OVERLAP_LINES = 3
+FALLBACK_CHUNK_LINES = 20
+
+# Embedding backend: "torch" (fp32), "torch_int8" (int8 dynamic quantization of the Linear
+# layers) or "onnx" (ONNX Runtime running EMBED_ONNX_FILE from the model repo; needs
+# `pip install sentence-transformers[onnx]`). Check a quantized backend against fp32 with
+# `python -m benchmarks.embedding_parity`.
+EMBED_BACKEND = "torch"
+EMBED_ONNX_FILE = "onnx/model_qint8_avx2.onnx"
+# Texts are embedded in length buckets of at most this many padded tokens per forward pass
+EMBED_MAX_BATCH_TOKENS = 16384
+
+# Persistent embedding cache shared by all ingests (LRU-evicted past the entry limit)
+EMBED_CACHE_FILE = "vector_store/embedding_cache.sqlite"
+EMBED_CACHE_MAX_ENTRIES = 500_000
+
+# Vector index: "auto" picks flat / ivf_flat / ivf_pq from the chunk count;
+# "flat", "ivf_flat", "ivf_pq" or "hnsw" forces a type.
+INDEX_TYPE = "auto"
+INDEX_AUTO_FLAT_MAX = 50_000
+INDEX_AUTO_IVF_FLAT_MAX = 2_000_000
+IVF_NLIST = None          # None = ~4*sqrt(chunk count)
+IVF_NPROBE = 16
+IVF_TRAIN_POINTS_PER_LIST = 64
+PQ_M = 16
+PQ_NBITS = 8
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+INDEX_MMAP = True         # memory-map index.faiss when serving
+
+# Hybrid retrieval: FAISS + BM25 over identifiers + exact symbol matches, fused by reciprocal rank
+HYBRID_RETRIEVAL = True
+HYBRID_CANDIDATES = 4     # each ranking contributes top_k * HYBRID_CANDIDATES candidates
+RRF_K = 60
+BM25_K1 = 1.2
+BM25_B = 0.75
+MIN_CONTEXT_CHUNKS = 1    # kept even when below the request's similarity_threshold
+# Default minimum cosine similarity of a retrieved chunk to the question; question-to-code
+# similarities of MiniLM rarely reach 0.7, so a high default leaves only MIN_CONTEXT_CHUNKS
+SIMILARITY_THRESHOLD = 0.3
+
+# Local LLM: weights as "float32", "bfloat16" or "int8" (dynamic quantization of the
+# Linear layers); reuse of the precomputed KV cache of the constant system prompt;
+# generation stops after this many complete ``` code blocks (0 = run to LLM_MAX_NEW_TOKENS)
+LLM_DTYPE = "float32"
+LLM_PREFIX_CACHE = True
+LLM_MAX_NEW_TOKENS = 300
+LLM_STOP_AFTER_CODE_BLOCKS = 1
+
+# Models load on first use; with WARMUP_ON_STARTUP the API loads them in the background
+# at startup (see /ready) so the first request does not pay for it
+WARMUP_ON_STARTUP = True
+
+# Token budget (Qwen tokenizer) for the retrieved code packed into the prompt
+PROMPT_CONTEXT_TOKENS = 1500
+
+# Inference pool for /ask_model: concurrent generations, waiting requests, per-request timeout
+INFERENCE_WORKERS = 1
+INFERENCE_MAX_QUEUE = 16
+INFERENCE_TIMEOUT_SECONDS = 120
+# Largest top_k a question may ask for
+MAX_TOP_K = 50
+
+# Micro-batching of concurrent /ask_model requests: requests arriving within
+# BATCH_WINDOW_MS are embedded, searched and generated together (up to BATCH_MAX_SIZE).
+BATCHING_ENABLED = True
+BATCH_MAX_SIZE = 8
+BATCH_WINDOW_MS = 15
+
+# Cache of /ask_model results, keyed by normalized question + index version.
+# Set QUERY_CACHE_SEMANTIC_THRESHOLD (cosine, e.g. 0.95) to also reuse answers of near-identical questions.
+QUERY_CACHE_MAX_ENTRIES = 1024
+QUERY_CACHE_TTL_SECONDS = 3600
+QUERY_CACHE_SEMANTIC_THRESHOLD = None
+
+# Codebases: each codebase id has its own vector store. The default codebase keeps the
+# original vector_store/ + CODE_FOLDER layout; others live under CODEBASE_STORE_DIR/<id>
+# with their sources in CODEBASE_UPLOAD_DIR/<id>.
+DEFAULT_CODEBASE = "default"
+VECTOR_STORE_DIR = "vector_store"
+CODEBASE_STORE_DIR = "vector_store/codebases"
+CODEBASE_UPLOAD_DIR = "data/codebases"
+# Only the most recently used codebases stay loaded, within the RAM budget; the rest load on first query
+MAX_RESIDENT_CODEBASES = 4
+RESIDENT_MEMORY_BUDGET_MB = 2048
+
+# Background ingestion for /upload_codebase: concurrent jobs (always one at a time per
+# codebase) and how many finished jobs /jobs/{id} remembers
+INGEST_JOB_WORKERS = 1
+INGEST_JOB_HISTORY = 100
+
+# Zip uploads are indexed straight from the archive members. Members above
+# ZIP_MAX_MEMBER_BYTES are skipped; archives whose accepted members exceed
+# ZIP_MAX_TOTAL_BYTES uncompressed are rejected. UPLOAD_KEEP_SOURCES also writes the
+# members to the codebase's upload folder (needed by /codebase_file).
+ZIP_MAX_MEMBER_BYTES = 2 * 1024 * 1024
+ZIP_MAX_TOTAL_BYTES = 512 * 1024 * 1024
+UPLOAD_KEEP_SOURCES = True
+
+# /list_codebase page size: default and largest allowed ?limit=
+LIST_PAGE_SIZE = 100
+LIST_MAX_PAGE_SIZE = 1000
+
+# /diagrams: rendered Mermaid texts memoized per codebase index, largest graph drawn
+# and deepest call/include traversal allowed
+DIAGRAM_CACHE_ENTRIES = 256
+DIAGRAM_MAX_NODES = 200
+DIAGRAM_MAX_DEPTH = 5
+
+# Duplicate chunks (vendored copies, generated code, pasted helpers) get one vector:
+# chunks equal up to whitespace, or whose 64-bit SimHashes differ in at most
+# DEDUP_MAX_DISTANCE bits, share the first copy's vector, which lists the other
+# copies' locations under "duplicates". Chunks shorter than DEDUP_MIN_TOKENS tokens
+# are only merged when equal; DEDUP_MAX_DISTANCE = 0 merges equal chunks only.
+# Changing these takes effect on the next full (non-incremental) ingest.
+DEDUP_CHUNKS = True
+DEDUP_MAX_DISTANCE = 3
+DEDUP_MIN_TOKENS = 32
+# Retrieved chunks list at most this many of their copies' locations (plus "duplicate_count")
+DEDUP_LISTED_LOCATIONS = 5
+
+# Observability: stage latencies, token and cache counters are served at /metrics.
+# TIMING_HEADER adds a Server-Timing header with the stage times of each /ask_model call.
+# LOG_LEVEL=DEBUG also logs retrieved chunks and per-generation timings.
+TIMING_HEADER = False
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
 
 # uvicorn app.main:app --reload --host 0.0.0.0 --port 8000
@@ -0,0 +1,79 @@
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+TOKEN = re.compile(r"\w+|[^\w\s]")
+SHINGLE = 3
+_MASK = np.uint64(0xFFFFFFFFFFFFFFFF)
+_BITS = np.arange(64, dtype=np.uint64)
+
+
+def _mix(h):
+    """splitmix64 finalizer: spreads every input bit over all 64 output bits."""
+    with np.errstate(over="ignore"):
+        h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return h ^ (h >> np.uint64(31))
+
+
+def fingerprint(content, min_tokens=32):
+    """
+    (content_hash, simhash) of a chunk. content_hash is equal for texts that only
+    differ in whitespace; simhash is a 64-bit SimHash over token 3-shingles as a hex
+    string, or None when the chunk has fewer than min_tokens tokens (too short for
+    near-duplicate matching to be reliable).
+    """
+    tokens = TOKEN.findall(content)
+    content_hash = hashlib.blake2b(" ".join(tokens).encode("utf-8", "surrogatepass"), digest_size=8).hexdigest()
+    if len(tokens) < max(min_tokens, SHINGLE):
+        return content_hash, None
+    hashes = np.array([zlib.crc32(t.encode("utf-8", "surrogatepass")) for t in tokens], dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        shingles = _mix(hashes[:-2] * np.uint64(0x9E3779B97F4A7C15)
+                        ^ _mix(hashes[1:-1]) ^ (hashes[2:] << np.uint64(32)))
+    votes = ((shingles[:, None] >> _BITS) & np.uint64(1)).sum(axis=0)
+    bits = (votes * 2 > len(shingles)).astype(np.uint64) << _BITS
+    return content_hash, f"{int(np.bitwise_or.reduce(bits)):016x}"
+
+
+class Deduplicator:
+    """
+    Maps chunks to the canonical chunk they duplicate: the same text up to whitespace,
+    or the same symbol with a SimHash at most max_distance bits away (templated code
+    has distinct functions that close, so near-duplicates must also define the same
+    name). Near-duplicate candidates come from max_distance + 1 bands of the 64 bits,
+    since two fingerprints that close agree exactly on at least one band; only those
+    candidates are compared.
+    """
+
+    def __init__(self, max_distance=3):
+        self.max_distance = max_distance
+        self.by_hash = {}
+        self.bands = []
+        if max_distance > 0:
+            width = -(-64 // (max_distance + 1))
+            self.bands = [(shift, (1 << min(width, 64 - shift)) - 1) for shift in range(0, 64, width)]
+        self.buckets = [defaultdict(list) for _ in self.bands]
+
+    def find(self, content_hash, simhash, symbol=None):
+        """Id of the canonical chunk this one duplicates, or None."""
+        canonical = self.by_hash.get(content_hash)
+        if canonical is not None or simhash is None or not self.bands:
+            return canonical
+        value = int(simhash, 16)
+        for (shift, mask), bucket in zip(self.bands, self.buckets):
+            for other, chunk_id in bucket.get((symbol, (value >> shift) & mask), ()):
+                if bin(value ^ other).count("1") <= self.max_distance:
+                    return chunk_id
+        return None
+
+    def add(self, chunk_id, content_hash, simhash, symbol=None):
+        """Registers a canonical chunk."""
+        self.by_hash.setdefault(content_hash, chunk_id)
+        if simhash is not None and self.bands:
+            value = int(simhash, 16)
+            for (shift, mask), bucket in zip(self.bands, self.buckets):
+                bucket[(symbol, (value >> shift) & mask)].append((value, chunk_id))
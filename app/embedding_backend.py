@@ -0,0 +1,77 @@
+import numpy as np
+
+EMBED_BACKENDS = ("torch", "torch_int8", "onnx")
+
+
+def load_embedding_model(model_name, backend="torch", onnx_file=None):
+    """
+    Loads the sentence-transformers model for one backend:
+    "torch" is the fp32 PyTorch model, "torch_int8" the same model with its Linear layers
+    dynamically quantized to int8 (CPU only), and "onnx" runs onnx_file (e.g. one of the
+    quantized exports published with the model) on ONNX Runtime, which needs
+    `pip install sentence-transformers[onnx]`.
+    """
+    from sentence_transformers import SentenceTransformer  # imports torch; only needed once a model loads
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    if backend == "torch_int8":
+        import torch
+        model = SentenceTransformer(model_name, device="cpu")
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if backend == "onnx":
+        return SentenceTransformer(model_name, backend="onnx",
+                                   model_kwargs={"file_name": onnx_file} if onnx_file else None)
+    raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {EMBED_BACKENDS}")
+
+
+def embedding_model_id(model_name, backend):
+    """Key for cached vectors: quantized backends produce (slightly) different vectors."""
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+class BucketedEncoder:
+    """
+    Encodes texts in sequence-length buckets: texts are sorted by token count and cut
+    into batches of at most max_batch_tokens padded tokens (and max_batch_size texts),
+    so short texts share large batches and one long chunk never pads a batch of short ones.
+    """
+
+    def __init__(self, model, max_batch_tokens, max_batch_size):
+        self.model = model
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        # get_sentence_embedding_dimension was renamed in sentence-transformers 6
+        dimension = getattr(model, "get_embedding_dimension", None) or model.get_sentence_embedding_dimension
+        self.dimension = dimension()
+        self.tokens = 0
+        self.padded_tokens = 0
+
+    def token_lengths(self, texts):
+        encoded = self.model.tokenizer(texts, truncation=True, max_length=self.model.max_seq_length)
+        return np.array([len(ids) for ids in encoded["input_ids"]])
+
+    def encode(self, texts, normalize=False):
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        if not texts:
+            return vectors
+        lengths = self.token_lengths(texts)
+        order = np.argsort(-lengths, kind="stable")
+        start = 0
+        while start < len(order):
+            # Longest first: the first text of each batch sets its padded length
+            longest = max(int(lengths[order[start]]), 1)
+            size = max(1, min(self.max_batch_size, self.max_batch_tokens // longest))
+            batch = order[start:start + size]
+            vectors[batch] = self.model.encode([texts[i] for i in batch], batch_size=len(batch),
+                                               normalize_embeddings=normalize, convert_to_numpy=True)
+            self.tokens += int(lengths[batch].sum())
+            self.padded_tokens += longest * len(batch)
+            start += size
+        return vectors
+
+    def stats(self):
+        return {
+            "tokens": self.tokens,
+            "padded_tokens": self.padded_tokens,
+            "padding_efficiency": round(self.tokens / self.padded_tokens, 4) if self.padded_tokens else None,
+        }
@@ -0,0 +1,108 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by sha256(model name + chunk content).
+    Entries are evicted least-recently-used first once max_entries is exceeded.
+    The SQLite file is opened on first lookup or insert, not when the cache is created.
+    """
+
+    SQL_BATCH = 500
+
+    def __init__(self, path, model_name, max_entries):
+        self.path = path
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._count = None
+
+    def _connection(self):
+        """The SQLite connection, opened (and the table created) on first use; call with _lock held."""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            with conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS embeddings (
+                        key TEXT PRIMARY KEY,
+                        vector BLOB NOT NULL,
+                        last_used REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+            self._count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def key(self, text):
+        return hashlib.sha256((self.model_name + "\0" + text).encode("utf-8")).hexdigest()
+
+    def get_many(self, texts):
+        """
+        Returns a list aligned with texts holding cached vectors, or None for misses.
+        """
+        keys = [self.key(t) for t in texts]
+        found = {}
+        with self._lock:
+            conn = self._connection()
+            for i in range(0, len(keys), self.SQL_BATCH):
+                part = keys[i:i + self.SQL_BATCH]
+                marks = ",".join("?" * len(part))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", part
+                ).fetchall()
+                found.update(rows)
+                if rows:
+                    conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({','.join('?' * len(rows))})",
+                        [time.time()] + [k for k, _ in rows],
+                    )
+            conn.commit()
+            hit_count = sum(k in found for k in keys)
+            self.hits += hit_count
+            self.misses += len(keys) - hit_count
+
+        return [np.frombuffer(found[k], dtype=np.float32) if k in found else None for k in keys]
+
+    def put_many(self, texts, vectors):
+        now = time.time()
+        rows = [(self.key(t), np.asarray(v, dtype=np.float32).tobytes(), now) for t, v in zip(texts, vectors)]
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                before = conn.total_changes
+                conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+                )
+                self._count += conn.total_changes - before
+                overflow = self._count - self.max_entries
+                if overflow > 0:
+                    conn.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (overflow,),
+                    )
+                    self._count -= overflow
+
+    def stats(self):
+        """Lookup counters; entries is None until the cache file has been opened."""
+        with self._lock:
+            hits, misses, entries = self.hits, self.misses, self._count
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+            "entries": entries,
+        }
@@ -0,0 +1,122 @@
+import re
+import threading
+from collections import OrderedDict
+
+CODEBASE_ID = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,63}")
+
+
+def validate_codebase_id(codebase_id):
+    """
+    Codebase ids name directories on disk, so only short [A-Za-z0-9_.-] names are accepted.
+    """
+    if not isinstance(codebase_id, str) or not CODEBASE_ID.fullmatch(codebase_id) or ".." in codebase_id:
+        raise ValueError(f"Invalid codebase id: {codebase_id!r}")
+    return codebase_id
+
+
+class IndexRegistry:
+    """
+    LRU registry of loaded per-codebase indexes.
+    At most max_resident entries, together using at most memory_budget bytes (as reported
+    by each entry's memory_bytes()), stay in memory; the least recently used ones are
+    dropped and loaded again by loader(codebase_id) on their next use.
+    The most recently used entry is always kept, even if it alone exceeds the budget.
+    Evicted entries are not closed: queries still holding one finish normally and its
+    files are released once the last reference goes away.
+    """
+
+    def __init__(self, loader, max_resident, memory_budget):
+        self.loader = loader
+        self.max_resident = max_resident
+        self.memory_budget = memory_budget
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def _load_lock(self, codebase_id):
+        return self._load_locks.setdefault(codebase_id, threading.Lock())
+
+    def _touch(self, codebase_id):
+        entry = self._entries.get(codebase_id)
+        if entry is not None:
+            self._entries.move_to_end(codebase_id)
+            self.hits += 1
+        return entry
+
+    def get(self, codebase_id):
+        """
+        Returns the loaded entry for codebase_id, loading it (once, even under
+        concurrent requests) if it is not resident.
+        """
+        with self._lock:
+            entry = self._touch(codebase_id)
+            if entry is not None:
+                return entry
+            load_lock = self._load_lock(codebase_id)
+        with load_lock:
+            with self._lock:
+                entry = self._touch(codebase_id)
+                if entry is not None:
+                    return entry
+            entry = self.loader(codebase_id)
+            with self._lock:
+                self.loads += 1
+            self.put(codebase_id, entry)
+            return entry
+
+    def peek(self, codebase_id):
+        """Returns the entry if it is resident, without loading it or changing LRU order."""
+        with self._lock:
+            return self._entries.get(codebase_id)
+
+    def put(self, codebase_id, entry):
+        with self._lock:
+            self._entries[codebase_id] = entry
+            self._entries.move_to_end(codebase_id)
+            self._evict()
+
+    def swap(self, codebase_id, commit, entry=None):
+        """
+        Runs commit(), which replaces the codebase's files on disk, while no loader can
+        read them, then makes entry (if given) the resident index of codebase_id.
+        Queries in flight keep the entry they already hold.
+        """
+        with self._lock:
+            load_lock = self._load_lock(codebase_id)
+        with load_lock:
+            commit()
+            if entry is not None:
+                self.put(codebase_id, entry)
+
+    def discard(self, codebase_id):
+        with self._lock:
+            return self._entries.pop(codebase_id, None)
+
+    def resident(self):
+        """(codebase_id, entry) of every resident codebase, least recently used first."""
+        with self._lock:
+            return list(self._entries.items())
+
+    def _resident_bytes(self):
+        return sum(entry.memory_bytes() for entry in self._entries.values())
+
+    def _evict(self):
+        while len(self._entries) > 1 and (len(self._entries) > self.max_resident
+                                          or self._resident_bytes() > self.memory_budget):
+            codebase_id, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+            print(f"Evicted index of codebase {codebase_id} from memory")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "resident": list(self._entries),
+                "resident_bytes": self._resident_bytes(),
+                "memory_budget_bytes": self.memory_budget,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
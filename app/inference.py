@@ -0,0 +1,254 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from app import metrics
+
+
+class QueueFullError(Exception):
+    """Raised when the admission queue of an InferencePool is full."""
+
+
+class InferencePool:
+    """
+    Runs blocking retrieval/generation calls on a dedicated thread pool so they
+    never block the event loop. At most `workers` calls run at once and at most
+    `max_queue` more may wait; anything beyond that is rejected immediately.
+    The thread pool is only created by the first run() or stream(): a pool used for
+    run_batched() admits calls for a MicroBatcher, which has its own thread.
+    """
+
+    def __init__(self, workers, max_queue, timeout):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _submit(self, task):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        return self._executor.submit(task)
+
+    def is_full(self):
+        return self.waiting + self.active >= self.workers + self.max_queue
+
+    def _admit(self):
+        with self._lock:
+            if self.is_full():
+                self.rejected += 1
+                raise QueueFullError()
+            self.waiting += 1
+        return time.perf_counter()
+
+    def _started(self, submitted):
+        wait = time.perf_counter() - submitted
+        metrics.record("queue_wait", wait)
+        with self._lock:
+            self.waiting -= 1
+            self.active += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+
+    def _finished(self):
+        with self._lock:
+            self.active -= 1
+            self.completed += 1
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on the pool and awaits the result.
+        Raises QueueFullError when the queue is full and asyncio.TimeoutError
+        when the call does not finish within the pool timeout.
+        """
+        submitted = self._admit()
+
+        def task():
+            self._started(submitted)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._finished()
+
+        return await self._wait(self._submit(task))
+
+    async def run_batched(self, batcher, *args):
+        """
+        Like run, but hands the call to a MicroBatcher that groups it with
+        concurrent requests. Admission and timeouts work the same way.
+        """
+        submitted = self._admit()
+        future = batcher.submit(args, on_start=lambda: self._started(submitted), on_finish=self._finished)
+        return await self._wait(future)
+
+    def stream(self, fn, *args):
+        """
+        Runs the generator fn(*args, stop=event) on the pool and returns an async
+        iterator over its items. Admission happens here, so QueueFullError is raised
+        before a response starts. Iteration raises asyncio.TimeoutError once the pool
+        timeout has passed since admission; on a timeout or when the consumer goes
+        away, event is set so fn can end early and free its worker.
+        """
+        submitted = self._admit()
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        stop = threading.Event()
+        end = object()
+
+        def put(item, error=None):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(items.put_nowait, (item, error))
+
+        def task():
+            self._started(submitted)
+            error = None
+            try:
+                for item in fn(*args, stop=stop):
+                    if stop.is_set():
+                        break
+                    put(item)
+            except Exception as e:
+                error = e
+            finally:
+                self._finished()
+            put(end, error)  # after _finished, so the slot is free once the consumer sees the end
+
+        future = self._submit(task)
+        future.add_done_callback(self._on_done)
+        return self._stream(loop, loop.time() + self.timeout, items, end, stop, future)
+
+    async def _stream(self, loop, deadline, items, end, stop, future):
+        try:
+            while True:
+                try:
+                    item, error = await asyncio.wait_for(items.get(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    with self._lock:
+                        self.timed_out += 1
+                    raise
+                if item is end:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            stop.set()
+            future.cancel()  # still queued: it never runs
+
+    async def _wait(self, future):
+        future.add_done_callback(self._on_done)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timed_out += 1
+            raise
+
+    def _on_done(self, future):
+        # A call cancelled by its timeout before it started never ran
+        if future.cancelled():
+            with self._lock:
+                self.waiting -= 1
+
+    def stats(self):
+        with self._lock:
+            started = self.completed + self.active
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self.waiting,
+                "active": self.active,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_wait_seconds": round(self._wait_total / started, 4) if started else 0.0,
+                "max_wait_seconds": round(self._wait_max, 4),
+            }
+
+
+class MicroBatcher:
+    """
+    Collects calls that arrive within window_ms of each other (at most max_size)
+    and runs them through a single batch_fn(list_of_args) call on one thread.
+    batch_fn must return one result per args tuple, in order.
+    """
+
+    def __init__(self, batch_fn, max_size, window_ms):
+        self.batch_fn = batch_fn
+        self.max_size = max_size
+        self.window = window_ms / 1000
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, args, on_start=None, on_finish=None):
+        future = Future()
+        self._queue.put((args, future, on_start, on_finish))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Drop calls whose caller already gave up
+        return [item for item in batch if item[1].set_running_or_notify_cancel()]
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                continue
+            for _, _, on_start, _ in batch:
+                if on_start:
+                    on_start()
+            try:
+                try:
+                    outcomes = [(result, None) for result in self.batch_fn([args for args, _, _, _ in batch])]
+                except Exception as e:
+                    # One bad call must not fail the calls batched with it: run each on its own
+                    outcomes = self._run_each(batch) if len(batch) > 1 else [(None, e)]
+                for (_, future, _, _), (result, error) in zip(batch, outcomes):
+                    if error is None:
+                        future.set_result(result)
+                    else:
+                        future.set_exception(error)
+            finally:
+                self.batches += 1
+                self.items += len(batch)
+                for _, _, _, on_finish in batch:
+                    if on_finish:
+                        on_finish()
+
+    def _run_each(self, batch):
+        outcomes = []
+        for args, _, _, _ in batch:
+            try:
+                outcomes.append((self.batch_fn([args])[0], None))
+            except Exception as e:
+                outcomes.append((None, e))
+        return outcomes
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+        }
@@ -0,0 +1,97 @@
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class IngestJob:
+    """
+    Progress of one background ingestion. update() is passed to the indexer as its
+    progress callback; to_dict() is what /jobs/{id} returns.
+    """
+
+    def __init__(self, codebase_id):
+        self.id = uuid.uuid4().hex
+        self.codebase_id = codebase_id
+        self.status = "queued"
+        self.stage = None
+        self.files_total = 0
+        self.files_processed = 0
+        self.chunks_processed = 0
+        self.chunks_per_sec = 0.0
+        self.stats = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def update(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "codebase_id": self.codebase_id,
+            "status": self.status,
+            "stage": self.stage,
+            "files_total": self.files_total,
+            "files_processed": self.files_processed,
+            "chunks_processed": self.chunks_processed,
+            "chunks_per_sec": self.chunks_per_sec,
+            "stats": self.stats,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestJobs:
+    """
+    Runs ingestion jobs on background threads, one at a time per codebase,
+    and remembers the last max_history jobs for status queries.
+    """
+
+    def __init__(self, workers, max_history):
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self._jobs = OrderedDict()
+        self._codebase_locks = {}
+        self._lock = threading.Lock()
+
+    def submit(self, codebase_id, fn, *args, **kwargs):
+        """
+        Queues fn(*args, progress=job.update, **kwargs) and returns the job right away.
+        fn's return value becomes the job's stats.
+        """
+        job = IngestJob(codebase_id)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_history:
+                self._jobs.popitem(last=False)
+            codebase_lock = self._codebase_locks.setdefault(codebase_id, threading.Lock())
+        self._executor.submit(self._run, job, codebase_lock, fn, args, kwargs)
+        return job
+
+    def _run(self, job, codebase_lock, fn, args, kwargs):
+        with codebase_lock:
+            job.update(status="running", started_at=time.time())
+            try:
+                job.stats = fn(*args, progress=job.update, **kwargs)
+                job.update(status="done", stage=None)
+            except Exception as e:
+                traceback.print_exc()
+                job.update(status="failed", error=str(e))
+            finally:
+                job.finished_at = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active(self):
+        with self._lock:
+            return [job for job in self._jobs.values() if job.status in ("queued", "running")]
@@ -0,0 +1,136 @@
+import os
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from app.utils import symbol_from_signature, tokenize_code
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over code identifiers plus an exact symbol table.
+    Posting lists are flat numpy arrays addressed through a sorted vocabulary
+    (term i owns postings[offsets[i]:offsets[i + 1]]), so the whole index is a
+    handful of contiguous arrays that load with one np.load.
+    """
+
+    def __init__(self, arrays, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids = arrays["doc_ids"]
+        self.doc_lengths = arrays["doc_lengths"].astype(np.float32)
+        self.terms = arrays["terms"]
+        self.term_offsets = arrays["term_offsets"]
+        self.postings = arrays["postings"]
+        self.frequencies = arrays["frequencies"].astype(np.float32)
+        self.symbols = arrays["symbols"]
+        self.symbol_offsets = arrays["symbol_offsets"]
+        self.symbol_postings = arrays["symbol_postings"]
+        self.avg_length = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+
+    @classmethod
+    def build(cls, chunks, **params):
+        """
+        Builds the index from an iterable of chunk dicts (uses id, content, symbol/signature),
+        sorted by id. A duplicate chunk ("duplicate_of") is not a document of its own: its
+        symbol finds the chunk it duplicates.
+        """
+        doc_ids, doc_lengths = [], []
+        positions = {}
+        term_postings = defaultdict(list)
+        symbol_postings = defaultdict(dict)
+        for chunk in chunks:
+            symbol = chunk.get("symbol") or symbol_from_signature(chunk.get("signature"))
+            if "duplicate_of" in chunk:
+                position = positions.get(chunk["duplicate_of"])
+            else:
+                position = positions[chunk["id"]] = len(doc_ids)
+                counts = Counter(tokenize_code(chunk["content"]))
+                doc_ids.append(chunk["id"])
+                doc_lengths.append(sum(counts.values()))
+                for term, count in counts.items():
+                    term_postings[term].append((position, min(count, 65535)))
+            if symbol and position is not None:
+                symbol_postings[symbol][position] = None
+                if "::" in symbol:
+                    symbol_postings[symbol.rsplit("::", 1)[1]][position] = None
+
+        terms = sorted(term_postings)
+        flat = [p for term in terms for p in term_postings[term]]
+        symbols = sorted(symbol_postings)
+        return cls({
+            "doc_ids": np.array(doc_ids, dtype=np.int64),
+            "doc_lengths": np.array(doc_lengths, dtype=np.int32),
+            "terms": np.array(terms, dtype=str),
+            "term_offsets": np.cumsum([0] + [len(term_postings[t]) for t in terms], dtype=np.int64),
+            "postings": np.array([p for p, _ in flat], dtype=np.int32),
+            "frequencies": np.array([f for _, f in flat], dtype=np.uint16),
+            "symbols": np.array(symbols, dtype=str),
+            "symbol_offsets": np.cumsum([0] + [len(symbol_postings[s]) for s in symbols], dtype=np.int64),
+            "symbol_postings": np.array([p for s in symbols for p in symbol_postings[s]], dtype=np.int32),
+        }, **params)
+
+    def save(self, path):
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, doc_ids=self.doc_ids, doc_lengths=self.doc_lengths.astype(np.int32),
+                     terms=self.terms, term_offsets=self.term_offsets, postings=self.postings,
+                     frequencies=self.frequencies.astype(np.uint16), symbols=self.symbols,
+                     symbol_offsets=self.symbol_offsets, symbol_postings=self.symbol_postings)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path, **params):
+        with np.load(path) as arrays:
+            return cls({name: arrays[name] for name in arrays.files}, **params)
+
+    @staticmethod
+    def _find(sorted_keys, key):
+        pos = int(np.searchsorted(sorted_keys, key))
+        if pos < len(sorted_keys) and sorted_keys[pos] == key:
+            return pos
+        return None
+
+    def lookup_symbol(self, name):
+        """
+        Chunk ids whose function is exactly `name` (qualified or unqualified).
+        """
+        pos = self._find(self.symbols, name)
+        if pos is None:
+            return []
+        positions = self.symbol_postings[self.symbol_offsets[pos]:self.symbol_offsets[pos + 1]]
+        return [int(self.doc_ids[p]) for p in positions]
+
+    def search(self, query, k):
+        """
+        Top-k (chunk id, BM25 score) pairs for a free-text query.
+        """
+        if not len(self.doc_ids):
+            return []
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        for term in set(tokenize_code(query)):
+            pos = self._find(self.terms, term)
+            if pos is None:
+                continue
+            start, end = self.term_offsets[pos], self.term_offsets[pos + 1]
+            docs = self.postings[start:end]
+            tf = self.frequencies[start:end]
+            idf = np.log(1 + (len(self.doc_ids) - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = tf + self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / self.avg_length)
+            scores[docs] += idf * tf * (self.k1 + 1) / norm
+        k = min(k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.doc_ids[p]), float(scores[p])) for p in top]
+
+
+def reciprocal_rank_fusion(rankings, k, rrf_k=60):
+    """
+    Fuses several ranked id lists into one top-k list by sum of 1 / (rrf_k + rank).
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] += 1.0 / (rrf_k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)[:k]
@@ -1,23 +1,136 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
-from app.config import MODEL_NAME
-
-print("Loading Qwen model...")
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, trust_remote_code=True)
-model = AutoModelForCausalLM.from_pretrained(MODEL_NAME, trust_remote_code=True)
-pipe = pipeline("text-generation", model=model, tokenizer=tokenizer)
-
-def generate_answer(question, chunks):
-    print("DEBUG chunks:", chunks)
-    context = "\n\n".join(
-        (chunk.text if hasattr(chunk, 'text') else
-         chunk.get('text') if isinstance(chunk, dict) and 'text' in chunk else
-         str(chunk))
-        for chunk in chunks
-    )
+import copy
+import logging
+import time
+from threading import Event, Lock, Thread
+# torch and transformers are imported inside the functions that need them:
+# importing them costs seconds and hundreds of MB, and this module is imported by every entry point
+from app import metrics
+from app.config import (MODEL_NAME, PROMPT_CONTEXT_TOKENS, LLM_DTYPE, LLM_PREFIX_CACHE,
+                        LLM_MAX_NEW_TOKENS, LLM_STOP_AFTER_CODE_BLOCKS)
+
+SYSTEM_PROMPT = ("You are a code generation assistant. Your task is to provide only the requested code or code "
+                 "modifications, without any additional conversational text, explanations, or examples. "
+                 "Focus strictly on the code. STICK TO THE CODE ")
+
+
+def _load_model(dtype):
+    """
+    Loads the chat model with CPU-friendly weights: "float32", "bfloat16", or "int8"
+    (float32 weights with Linear layers dynamically quantized to int8).
+    """
+    import torch
+    from transformers import AutoModelForCausalLM
+    if dtype == "bfloat16":
+        return AutoModelForCausalLM.from_pretrained(MODEL_NAME, trust_remote_code=True, dtype=torch.bfloat16)
+    model = AutoModelForCausalLM.from_pretrained(MODEL_NAME, trust_remote_code=True, dtype=torch.float32)
+    if dtype == "int8":
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    elif dtype != "float32":
+        raise ValueError(f"Unknown LLM_DTYPE {dtype!r}, expected float32, bfloat16 or int8")
+    return model.eval()
+
+
+# Loaded on first use (or by warmup()), so importing this module stays cheap
+tokenizer = None
+model = None
+_load_lock = Lock()
+
+
+def _get_tokenizer():
+    global tokenizer
+    if tokenizer is None:
+        from transformers import AutoTokenizer
+        with _load_lock:
+            if tokenizer is None:
+                loaded = AutoTokenizer.from_pretrained(MODEL_NAME, trust_remote_code=True)
+                loaded.padding_side = "left"  # batched generation appends new tokens on the right
+                if loaded.pad_token is None:
+                    loaded.pad_token = loaded.eos_token
+                tokenizer = loaded
+    return tokenizer
+
+
+def _get_model():
+    global model
+    _get_tokenizer()
+    if model is None:
+        with _load_lock:
+            if model is None:
+                print(f"Loading Qwen model ({LLM_DTYPE})...")
+                model = _load_model(LLM_DTYPE)
+    return model
+
+
+def is_loaded():
+    return model is not None
+
+
+def warmup():
+    """Loads the tokenizer and model and prefills the cached system prompt."""
+    _get_model()
+    if LLM_PREFIX_CACHE:
+        _system_prefix()
+
+_prefix = None  # (system prompt text, its token ids, KV cache of those tokens)
+_prefix_lock = Lock()
+generation_stats = {"generations": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0, "new_tokens": 0,
+                    "prefill_seconds": 0.0, "decode_seconds": 0.0}
+_stats_lock = Lock()
+TOKENS = metrics.Counter("llm_tokens_total", "Prompt tokens (kind=prompt, of which kind=cached came from "
+                         "the prefix cache) and generated tokens (kind=generated).", ("kind",))
+GENERATIONS = metrics.Counter("llm_generations_total", "Prompts answered by the model.")
+TIME_TO_FIRST_TOKEN = metrics.Histogram("llm_time_to_first_token_seconds", "Latency of the first streamed piece.")
+logger = logging.getLogger(__name__)
+
+def _chunk_text(chunk):
+    if hasattr(chunk, 'text'):
+        return chunk.text
+    if isinstance(chunk, dict) and 'text' in chunk:
+        return chunk['text']
+    if isinstance(chunk, dict) and 'content' in chunk:
+        return f"// {chunk.get('source', '')}:{chunk.get('start_line', '')}\n{chunk['content']}"
+    return str(chunk)
+
+def pack_context(chunks, budget=PROMPT_CONTEXT_TOKENS):
+    """
+    Joins the highest-scoring chunks that fit into `budget` Qwen tokens.
+    Smaller chunks still fill the remaining space after a larger one is skipped;
+    the best chunk is truncated rather than dropped when it alone exceeds the budget.
+    """
+    _get_tokenizer()
+    ranked = sorted(chunks, key=lambda c: c.get('score', 0.0) if isinstance(c, dict) else 0.0, reverse=True)
+    parts = []
+    used = 0
+    for chunk in ranked:
+        text = _chunk_text(chunk)
+        ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+        if used + len(ids) <= budget:
+            parts.append(text)
+            used += len(ids)
+        elif not parts:
+            parts.append(tokenizer.decode(ids[:budget]))
+            used = budget
+    return "\n\n".join(parts)
+
+def _sampling_args(temperature):
+    """
+    generate() kwargs for a request temperature: None keeps the model defaults, <= 0 is greedy.
+    """
+    if temperature is None:
+        return {}
+    if temperature <= 0:
+        return {"do_sample": False}
+    return {"do_sample": True, "temperature": temperature}
+
+def _build_prompt(question, chunks):
+    with metrics.span("prompt"):
+        return _render_prompt(question, chunks)
+
+def _render_prompt(question, chunks):
+    _get_tokenizer()
+    context = pack_context(chunks)
     messages = [
-        {"role": "system",
-          "content": "You are a code generation assistant. Your task is to provide only the requested code or code modifications, without any additional conversational text, explanations, or examples. Focus strictly on the code. STICK TO THE CODE "
-          },
+        {"role": "system", "content": SYSTEM_PROMPT},
 
         {"role": "user", "content": f"""Answer the question using only the code context below:
 
@@ -28,14 +141,231 @@ QUESTION:
 {question}
 """}
     ]
-    prompt = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-    response = pipe(prompt, max_new_tokens=300)[0]["generated_text"]
+    return tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+
+def _system_prefix():
+    """
+    The rendered chat prompt up to the end of the system message, its token ids and
+    the KV cache of those tokens, computed once. Every prompt starts with this text,
+    so its prefill is reused instead of recomputed per request.
+    """
+    import torch
+    from transformers import DynamicCache
+    global _prefix
+    _get_model()
+    with _prefix_lock:
+        if _prefix is None:
+            rendered = _render_prompt("", [])
+            text = rendered[:rendered.index(SYSTEM_PROMPT) + len(SYSTEM_PROMPT)]
+            ids = tokenizer(text, add_special_tokens=False, return_tensors="pt")["input_ids"]
+            with torch.no_grad():
+                cache = model(input_ids=ids, past_key_values=DynamicCache(config=model.config),
+                              use_cache=True).past_key_values
+            _prefix = (text, ids, cache)
+        return _prefix
+
+
+def _encode_prompts(prompts):
+    """
+    Tokenizes prompts for generate(). With LLM_PREFIX_CACHE the shared system prefix
+    comes from the precomputed KV cache: each row is prefix + padding + own tokens,
+    with the padding masked out, so the cache lines up for every row of a batch.
+    Returns (generate kwargs, prompt tokens per row, cached tokens per row).
+    """
+    import torch
+    if LLM_PREFIX_CACHE:
+        text, prefix_ids, cache = _system_prefix()
+        if all(p.startswith(text) for p in prompts):
+            suffixes = [tokenizer(p[len(text):], add_special_tokens=False)["input_ids"] for p in prompts]
+            width = max(len(ids) for ids in suffixes)
+            prefix_len = prefix_ids.shape[1]
+            input_ids = torch.full((len(prompts), prefix_len + width), tokenizer.pad_token_id, dtype=torch.long)
+            attention_mask = torch.zeros_like(input_ids)
+            input_ids[:, :prefix_len] = prefix_ids
+            attention_mask[:, :prefix_len] = 1
+            for row, ids in enumerate(suffixes):
+                if ids:
+                    input_ids[row, -len(ids):] = torch.tensor(ids)
+                    attention_mask[row, -len(ids):] = 1
+            past_key_values = copy.deepcopy(cache)
+            if len(prompts) > 1:
+                past_key_values.batch_repeat_interleave(len(prompts))
+            return ({"input_ids": input_ids, "attention_mask": attention_mask, "past_key_values": past_key_values},
+                    prefix_len + width, prefix_len)
+    inputs = tokenizer(prompts, return_tensors="pt", padding=True)
+    return dict(inputs), inputs["input_ids"].shape[1], 0
+
+
+class _CodeBlockStop:
+    """
+    Stops a row once its answer holds `blocks` complete ``` fenced code blocks,
+    instead of always running to max_new_tokens.
+    """
 
-    # Remove the prompt from generated text
-    answer_text = response[len(prompt):].strip()
+    def __init__(self, prompt_length, blocks):
+        self.prompt_length = prompt_length
+        self.fences = 2 * blocks
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+        texts = tokenizer.batch_decode(input_ids[:, self.prompt_length:], skip_special_tokens=True)
+        return torch.tensor([text.count("```") >= self.fences for text in texts], device=input_ids.device)
+
+
+class _StopOnEvent:
+    """Stops every row once `event` is set, e.g. when the streaming client has gone away."""
+
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+class _PrefillTimer:
+    """Records when the first logits arrive, i.e. when prefill has finished."""
+
+    def __init__(self):
+        self.prefill_done = None
+
+    def __call__(self, input_ids, scores):
+        if self.prefill_done is None:
+            self.prefill_done = time.perf_counter()
+        return scores
+
+
+def _generate_kwargs(prompts, max_new_tokens, temperature):
+    from transformers import LogitsProcessorList, StoppingCriteriaList
+    _get_model()
+    with metrics.span("tokenize"):
+        kwargs, prompt_tokens, cached_tokens = _encode_prompts(prompts)
+    timer = _PrefillTimer()
+    kwargs.update(max_new_tokens=max_new_tokens, pad_token_id=tokenizer.pad_token_id,
+                  logits_processor=LogitsProcessorList([timer]), **_sampling_args(temperature))
+    if LLM_STOP_AFTER_CODE_BLOCKS:
+        kwargs["stopping_criteria"] = StoppingCriteriaList([
+            _CodeBlockStop(kwargs["input_ids"].shape[1], LLM_STOP_AFTER_CODE_BLOCKS)])
+    return kwargs, timer, prompt_tokens, cached_tokens
+
+
+def _record_generation(start, timer, rows, prompt_tokens, cached_tokens, new_tokens):
+    end = time.perf_counter()
+    prefill = (timer.prefill_done or end) - start
+    decode = end - (timer.prefill_done or end)
+    with _stats_lock:
+        generation_stats["generations"] += rows
+        generation_stats["prompt_tokens"] += rows * prompt_tokens
+        generation_stats["cached_prompt_tokens"] += rows * cached_tokens
+        generation_stats["new_tokens"] += new_tokens
+        generation_stats["prefill_seconds"] += prefill
+        generation_stats["decode_seconds"] += decode
+    metrics.record("prefill", prefill)
+    metrics.record("decode", decode)
+    GENERATIONS.inc(rows)
+    TOKENS.inc(rows * prompt_tokens, kind="prompt")
+    TOKENS.inc(rows * cached_tokens, kind="cached")
+    TOKENS.inc(new_tokens, kind="generated")
+    logger.debug("Generated %d tokens for %d prompt(s): prefill %.3fs (%d tokens, %d from the prefix cache), "
+                 "%.1f tokens/s", new_tokens, rows, prefill, prompt_tokens, cached_tokens,
+                 new_tokens / decode if decode > 0 else 0.0)
+
+
+def _generate(prompts, max_new_tokens, temperature):
+    import torch
+    kwargs, timer, prompt_tokens, cached_tokens = _generate_kwargs(prompts, max_new_tokens, temperature)
+    start = time.perf_counter()
+    with torch.no_grad():
+        outputs = model.generate(**kwargs)
+    new_tokens = outputs[:, kwargs["input_ids"].shape[1]:]
+    _record_generation(start, timer, len(prompts), prompt_tokens, cached_tokens,
+                       int((new_tokens != tokenizer.pad_token_id).sum()))
+    return tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+
+
+def llm_stats():
+    """Cumulative generation counters with prefill time and decode throughput."""
+    with _stats_lock:
+        stats = dict(generation_stats)
+    generations = stats["generations"] or 1
+    stats["avg_prefill_seconds"] = round(stats["prefill_seconds"] / generations, 4)
+    stats["tokens_per_sec"] = round(stats["new_tokens"] / stats["decode_seconds"], 1) if stats["decode_seconds"] else None
+    stats["dtype"] = LLM_DTYPE
+    stats["prefix_cache"] = LLM_PREFIX_CACHE
+    return stats
+
+
+def generate_answer(question, chunks, temperature=None, max_new_tokens=LLM_MAX_NEW_TOKENS):
+    logger.debug("Answering %r from chunks: %s", question, chunks)
+    prompt = _build_prompt(question, chunks)
+    return _clean_answer(_generate([prompt], max_new_tokens, temperature)[0])
+
+def _clean_answer(answer_text):
+    answer_text = answer_text.strip()
 
     # Optional: Remove unwanted prefixes like "Assistant:"
     if "Assistant:" in answer_text:
         answer_text = answer_text.split("Assistant:")[-1].strip()
     
     return answer_text
+
+def generate_answers(questions, chunk_lists, max_new_tokens=LLM_MAX_NEW_TOKENS, temperature=None):
+    """
+    Answers several questions with one batched generate call.
+    """
+    prompts = [_build_prompt(q, chunks) for q, chunks in zip(questions, chunk_lists)]
+    return [_clean_answer(text) for text in _generate(prompts, max_new_tokens, temperature)]
+
+def stream_answer(question, chunks, max_new_tokens=LLM_MAX_NEW_TOKENS, temperature=None, stop=None):
+    """
+    Yields answer text pieces as the model produces them.
+    Generation runs in a background thread feeding a TextIteratorStreamer;
+    time-to-first-token and total latency are logged separately.
+    Generation ends early once the stop Event is set, or when the caller closes this
+    generator (a disconnected client) instead of running to max_new_tokens.
+    """
+    import torch
+    from transformers import StoppingCriteriaList, TextIteratorStreamer
+    stop = stop or Event()
+    prompt = _build_prompt(question, chunks)
+    kwargs, timer, prompt_tokens, cached_tokens = _generate_kwargs([prompt], max_new_tokens, temperature)
+    kwargs.setdefault("stopping_criteria", StoppingCriteriaList()).append(_StopOnEvent(stop))
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    outputs = []
+    errors = []
+
+    def run():
+        try:
+            with torch.no_grad():
+                outputs.append(model.generate(**kwargs, streamer=streamer))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            streamer.end()  # otherwise a failed generate leaves the loop below waiting forever
+
+    start = time.perf_counter()
+    first_token_at = None
+    pieces = 0
+    thread = Thread(target=run)
+    thread.start()
+    try:
+        for text in streamer:
+            if not text:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            pieces += 1
+            yield text
+        thread.join()
+        if errors:
+            raise errors[0]
+    finally:
+        stop.set()
+        thread.join()
+        total = time.perf_counter() - start
+        ttft = (first_token_at - start) if first_token_at else total
+        TIME_TO_FIRST_TOKEN.observe(ttft)
+        logger.debug("Streamed answer: time to first token %.2fs, total %.2fs, %d pieces", ttft, total, pieces)
+        if outputs:
+            _record_generation(start, timer, 1, prompt_tokens, cached_tokens,
+                               outputs[0].shape[1] - kwargs["input_ids"].shape[1])
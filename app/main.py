@@ -1,13 +1,29 @@
 import uvicorn
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
 from fastapi.middleware.cors import CORSMiddleware
-from app import rag_pipeline, llm_module
+from app import rag_pipeline, llm_module, mermaid_generator, metrics
+from app.config import (INFERENCE_WORKERS, INFERENCE_MAX_QUEUE, INFERENCE_TIMEOUT_SECONDS, MAX_TOP_K,
+                        BATCHING_ENABLED, BATCH_MAX_SIZE, BATCH_WINDOW_MS, DEFAULT_CODEBASE,
+                        INGEST_JOB_WORKERS, INGEST_JOB_HISTORY, WARMUP_ON_STARTUP,
+                        LIST_PAGE_SIZE, LIST_MAX_PAGE_SIZE, DIAGRAM_MAX_NODES, DIAGRAM_MAX_DEPTH,
+                        TIMING_HEADER, LOG_LEVEL, SIMILARITY_THRESHOLD)
+from app.inference import InferencePool, MicroBatcher, QueueFullError
+from app.ingest_jobs import IngestJobs
+import asyncio
+import threading
+import time
 import shutil
+import tempfile
 import os
-import zipfile
-from typing import List
-import stat
+import json
+import logging
+from typing import List, Optional
+
+logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logging.getLogger("app").setLevel(LOG_LEVEL)
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -20,13 +36,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+REQUEST_SECONDS = metrics.Histogram("http_request_seconds", "HTTP request latency until the response starts.",
+                                    ("method", "route", "status"))
+
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method,
+                            route=route.path if route else "unmatched", status=response.status_code)
+    return response
+
+
 class QuestionInput(BaseModel):
     question: str
-    temperature: float = 0.2
-    top_k: int = 5
-    similarity_threshold: float = 0.7
+    temperature: float = Field(0.2, ge=0.0, le=2.0)
+    top_k: int = Field(5, ge=1, le=MAX_TOP_K)
+    similarity_threshold: float = SIMILARITY_THRESHOLD
+    codebase_id: str = DEFAULT_CODEBASE
 
-UPLOAD_DIR = "data/codebase"
+    @field_validator("similarity_threshold")
+    @classmethod
+    def clamp_similarity_threshold(cls, value):
+        # Cosine similarity lies in [-1, 1]; older clients' sliders sent up to 2
+        return min(max(value, -1.0), 1.0)
 
 ALLOWED_EXTENSIONS = {
     '.c', '.cpp', '.h', '.hpp', '.py', '.java', '.js', '.ts', '.tsx',
@@ -38,93 +73,422 @@ def is_allowed(filename: str) -> bool:
 
 
 
+readiness = {"warmup": "pending" if WARMUP_ON_STARTUP else "disabled"}
+
+
+def _warmup():
+    start = time.perf_counter()
+    try:
+        rag_pipeline.warmup()
+        llm_module.warmup()
+    except Exception as e:
+        readiness.update(warmup="failed", error=str(e))
+        print(f"⚠️ Model warmup failed: {e}")
+        return
+    readiness.update(warmup="done", warmup_seconds=round(time.perf_counter() - start, 2))
+    print(f"✅ Models warmed up in {readiness['warmup_seconds']}s.")
+
+
 @app.on_event("startup")
 def startup():
-    """Load FAISS index if exists, else build it from codebase."""
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    """Load the default codebase's FAISS index if exists, else queue building it from codebase.
+    Other codebases are loaded on their first query. Models load in a background
+    warmup (WARMUP_ON_STARTUP) or on first use, so the server is live immediately;
+    /ready reports when warmup has finished."""
+    upload_dir = rag_pipeline.codebase_source_dir(DEFAULT_CODEBASE)
+    os.makedirs(upload_dir, exist_ok=True)
     try:
         rag_pipeline.load_faiss_index_and_chunks()
         print("✅ FAISS index loaded successfully.")
     except FileNotFoundError:
         print("⚠️ No FAISS index found, building a new one...")
-        rag_pipeline.process_and_store_local_code(base_path=UPLOAD_DIR)
+        ingest_jobs.submit(DEFAULT_CODEBASE, rag_pipeline.process_and_store_local_code, base_path=upload_dir)
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=_warmup, name="warmup", daemon=True).start()
+
+
+def _check_codebase(codebase_id):
+    try:
+        exists = rag_pipeline.codebase_exists(codebase_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not exists:
+        raise HTTPException(status_code=404, detail=f"Codebase {codebase_id} has not been uploaded.")
+
+
+def _answer(data):
+    codebase = rag_pipeline.get_codebase(data.codebase_id)
+    version = codebase.version
+    params = (data.codebase_id, data.top_k, data.similarity_threshold, data.temperature)
+    cached = rag_pipeline.query_cache.get(data.question, params, version)
+    if cached:
+        return cached
+    chunks = codebase.retrieve_batch([data.question], [data.top_k], [data.similarity_threshold])[0]
+    result = (chunks, llm_module.generate_answer(data.question, chunks, temperature=data.temperature))
+    rag_pipeline.query_cache.put(data.question, params, version, result)
+    return result
+
+
+def _answer_batch(requests):
+    requests = [data for (data,) in requests]
+    versions = [rag_pipeline.get_codebase(d.codebase_id).version for d in requests]
+    params = [(d.codebase_id, d.top_k, d.similarity_threshold, d.temperature) for d in requests]
+    results = [rag_pipeline.query_cache.get(d.question, p, v) for d, p, v in zip(requests, params, versions)]
+    misses = [i for i, result in enumerate(results) if result is None]
+    if misses:
+        chunk_lists = rag_pipeline.retrieve_relevant_chunks_batch(
+            [requests[i].question for i in misses],
+            [requests[i].top_k for i in misses],
+            [requests[i].similarity_threshold for i in misses],
+            [requests[i].codebase_id for i in misses],
+        )
+        chunks_by_request = dict(zip(misses, chunk_lists))
+        # generate() takes one temperature, so each distinct temperature is its own sub-batch
+        for temperature in dict.fromkeys(requests[i].temperature for i in misses):
+            group = [i for i in misses if requests[i].temperature == temperature]
+            answers = llm_module.generate_answers([requests[i].question for i in group],
+                                                  [chunks_by_request[i] for i in group],
+                                                  temperature=temperature)
+            for i, answer in zip(group, answers):
+                results[i] = (chunks_by_request[i], answer)
+                rag_pipeline.query_cache.put(requests[i].question, params[i], versions[i], results[i])
+    return results
+
+
+def _timed(fn, *args):
+    """fn(*args) and the stage timings it recorded."""
+    with metrics.collect_timings() as timings:
+        return fn(*args), timings
+
+
+def _timed_batch(requests):
+    """_answer_batch, each result paired with the stage timings of the whole batch."""
+    with metrics.collect_timings() as timings:
+        results = _answer_batch(requests)
+    return [(result, timings) for result in results]
+
+
+if BATCHING_ENABLED:
+    # A whole batch runs at once, so a full batch counts as the active set; the pool only
+    # admits calls (run_batched) and never starts threads of its own
+    batcher = MicroBatcher(_timed_batch, BATCH_MAX_SIZE, BATCH_WINDOW_MS)
+    inference_pool = InferencePool(BATCH_MAX_SIZE, INFERENCE_MAX_QUEUE, INFERENCE_TIMEOUT_SECONDS)
+    # Streams are not batched, each one is a full generate call: INFERENCE_WORKERS bounds them
+    stream_pool = InferencePool(INFERENCE_WORKERS, INFERENCE_MAX_QUEUE, INFERENCE_TIMEOUT_SECONDS)
+else:
+    batcher = None
+    inference_pool = InferencePool(INFERENCE_WORKERS, INFERENCE_MAX_QUEUE, INFERENCE_TIMEOUT_SECONDS)
+    stream_pool = inference_pool
+
 
 @app.post("/ask_model")
-async def ask_model(data: QuestionInput):
+async def ask_model(data: QuestionInput, response: Response):
     """
     Local model RAG endpoint.
+    With TIMING_HEADER the response carries a Server-Timing header with the time
+    spent in each stage (a batched request reports its batch's stages).
     """
-    print("Using LOCAL model")
-    chunks = rag_pipeline.retrieve_relevant_chunks(data.question, k=data.top_k)
-    answer = llm_module.generate_answer(data.question, chunks)
+    logger.debug("Using LOCAL model")
+    _check_codebase(data.codebase_id)
+    start = time.perf_counter()
+    try:
+        if batcher:
+            (chunks, answer), timings = await inference_pool.run_batched(batcher, data)
+        else:
+            (chunks, answer), timings = await inference_pool.run(_timed, _answer, data)
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Inference queue is full, retry later.",
+                            headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Inference timed out.")
+    if TIMING_HEADER:
+        response.headers["Server-Timing"] = metrics.server_timing(dict(timings, total=time.perf_counter() - start))
     return {
         "question": data.question,
         "answer": answer,
         "retrieved_context": chunks
     }
 
-def remove_readonly(func, path, _):
-    """Clear the readonly bit and reattempt the removal."""
-    os.chmod(path, stat.S_IWRITE)
-    func(path)
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/ask_model/stream")
+async def ask_model_stream(data: QuestionInput):
+    """
+    Streaming variant of /ask_model as server-sent events:
+    one "context" event with the retrieved chunks, "token" events as the
+    answer is generated, then "done". Runs on an inference pool like /ask_model
+    (its own, of INFERENCE_WORKERS, when /ask_model is batched);
+    past the inference timeout or when generation fails, the stream ends with an "error" event.
+    """
+    _check_codebase(data.codebase_id)
+    try:
+        events = stream_pool.stream(_stream_events, data)
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Inference queue is full, retry later.",
+                            headers={"Retry-After": "1"})
+
+    async def body():
+        try:
+            async for event in events:
+                yield event
+        except asyncio.TimeoutError:
+            yield _sse("error", {"detail": "Inference timed out."})
+        except Exception as e:
+            logger.exception("Streaming answer failed")
+            yield _sse("error", {"detail": f"Generation failed: {e}"})
+
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 
+def _stream_events(data, stop):
+    chunks = rag_pipeline.retrieve_relevant_chunks(data.question, k=data.top_k,
+                                                   similarity_threshold=data.similarity_threshold,
+                                                   codebase_id=data.codebase_id)
+    yield _sse("context", chunks)
+    for text in llm_module.stream_answer(data.question, chunks, temperature=data.temperature, stop=stop):
+        yield _sse("token", text)
+    yield _sse("done", {})
 
-@app.post("/upload_codebase")
-async def upload_codebase(file: UploadFile = File(...)):
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
+ingest_jobs = IngestJobs(INGEST_JOB_WORKERS, INGEST_JOB_HISTORY)
+
+
+def _ingest_upload(spool_path, filename, upload_dir, codebase_id, progress):
+    """
+    Background part of /upload_codebase: re-indexes the codebase from the spooled
+    upload and replaces its sources. The new sources go to a staging folder that
+    replaces the upload folder only once the new index has been built, so a rejected
+    archive or failed build leaves the previous sources in place.
+    """
+    progress(stage="extracting")
+    staging_dir = rag_pipeline.stage_sources(codebase_id)
+    try:
+        # A zip is indexed straight from its members (written out only if UPLOAD_KEEP_SOURCES)
+        if filename.endswith(".zip"):
+            stats = rag_pipeline.process_zip_archive(spool_path, codebase_id, include=is_allowed,
+                                                     progress=progress, source_dir=staging_dir)
+        else:
+            shutil.move(spool_path, os.path.join(staging_dir, filename))
+            stats = rag_pipeline.process_and_store_local_code(base_path=upload_dir, codebase_id=codebase_id,
+                                                              progress=progress, source_dir=staging_dir)
+        if stats is not None:
+            rag_pipeline.replace_sources(codebase_id, staging_dir)
+        return stats
+    finally:
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+        rag_pipeline.remove_tree(staging_dir)
 
-    # Clear old files, skipping .git
-    for f in os.listdir(UPLOAD_DIR):
-        file_path = os.path.join(UPLOAD_DIR, f)
-        if f == ".git":  # skip git folder
-            continue
-        if os.path.isfile(file_path) or os.path.islink(file_path):
-            os.unlink(file_path)
-        elif os.path.isdir(file_path):
-            shutil.rmtree(file_path, onerror=remove_readonly)
 
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
+@app.post("/upload_codebase", status_code=202)
+def upload_codebase(file: UploadFile = File(...), codebase_id: str = DEFAULT_CODEBASE):
+    """
+    Replaces the sources of codebase_id with the uploaded file (or zip) and re-indexes it
+    in the background. Returns a job id to poll at /jobs/{id}; the codebase's current
+    index keeps serving until the new one is complete. Other codebases keep their indexes.
+    """
+    try:
+        upload_dir = rag_pipeline.codebase_source_dir(codebase_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filename = os.path.basename(file.filename)
 
-    # Save uploaded file
-    with open(file_path, "wb") as buffer:
+    # Save uploaded file (a plain def endpoint, so this blocking copy runs on the threadpool)
+    with tempfile.NamedTemporaryFile("wb", suffix=os.path.splitext(filename)[1], delete=False) as buffer:
         shutil.copyfileobj(file.file, buffer)
 
-    # If it's a zip, extract it
-    if file.filename.endswith(".zip"):
-        with zipfile.ZipFile(file_path, "r") as zip_ref:
-            zip_ref.extractall(UPLOAD_DIR)
-        os.remove(file_path)
+    job = ingest_jobs.submit(codebase_id, _ingest_upload, buffer.name, filename, upload_dir, codebase_id)
+    return {"message": "Codebase uploaded, indexing in the background.",
+            "codebase_id": codebase_id, "job_id": job.id, "status_url": f"/jobs/{job.id}"}
+
 
-    rag_pipeline.process_and_store_local_code(base_path=UPLOAD_DIR)
-    return {"message": "Codebase uploaded and processed successfully."}
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    """Status and progress (files/chunks processed, embedding rate) of an ingestion job."""
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}.")
+    return job.to_dict()
+
+
+@app.get("/codebases")
+def codebases():
+    """Ids of the indexed codebases and which of them are loaded in memory."""
+    return {"codebases": rag_pipeline.list_codebases(), "registry": rag_pipeline.registry.stats()}
+
+
+def _etag_matches(request, etag):
+    """True if the request's If-None-Match names etag (or is *)."""
+    header = request.headers.get("if-none-match")
+    if not header or etag is None:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
 
 
 @app.get("/list_codebase")
-def list_codebase():
-    """
-    Return a list of uploaded files (name, content, type) so the frontend can display them.
-    """
-    files_data = []
-    if not os.path.exists(UPLOAD_DIR):
-        return files_data
-
-    for root, _, files in os.walk(UPLOAD_DIR):
-        for f in files:
-            file_path = os.path.join(root, f)
-            try:
-                with open(file_path, "r", encoding="utf-8", errors="ignore") as fp:
-                    content = fp.read()
-            except Exception as e:
-                content = f"<<unreadable file: {str(e)}>>"
-
-            ext = os.path.splitext(f)[1].lstrip(".").lower()
-            files_data.append({
-                "name": f,
-                "content": content,
-                "type": ext or "unknown"
-            })
-
-    return files_data
+def list_codebase(request: Request, codebase_id: str = DEFAULT_CODEBASE,
+                  offset: int = Query(0, ge=0),
+                  limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_MAX_PAGE_SIZE),
+                  file_type: Optional[str] = Query(None, alias="type"),
+                  path_prefix: Optional[str] = None, q: Optional[str] = None):
+    """
+    Return one page of the indexed files (name, path, type, size, mtime, chunks) so the
+    frontend can display them; fetch a file's content with /codebase_file.
+    Filter by extension (type), path prefix or a substring of the path (q).
+    The ETag follows the index version: polls sending it back in If-None-Match get a
+    304 with no body until the codebase is re-indexed.
+    """
+    try:
+        version, files = rag_pipeline.list_source_files(codebase_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    etag = f'"{version}"' if version else None
+    headers = {"ETag": etag, "Cache-Control": "no-cache"} if etag else None
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    if file_type:
+        file_type = file_type.lstrip(".").lower()
+        files = [f for f in files if f["type"] == file_type]
+    if path_prefix:
+        files = [f for f in files if f["path"].startswith(path_prefix)]
+    if q:
+        q = q.lower()
+        files = [f for f in files if q in f["path"].lower()]
+    return JSONResponse({
+        "codebase_id": codebase_id,
+        "index_version": version,
+        "total": len(files),
+        "offset": offset,
+        "limit": limit,
+        "files": files[offset:offset + limit],
+    }, headers=headers)
+
+
+@app.get("/codebase_file")
+def codebase_file(request: Request, path: str, codebase_id: str = DEFAULT_CODEBASE,
+                  start_line: int = Query(1, ge=1), end_line: Optional[int] = Query(None, ge=1)):
+    """
+    Return the content of one uploaded file, or only lines start_line..end_line of it.
+    """
+    if end_line is not None and end_line < start_line:
+        raise HTTPException(status_code=400, detail="end_line is before start_line")
+    try:
+        version, _ = rag_pipeline.list_source_files(codebase_id)
+        etag = f'"{version}"' if version else None
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        content = rag_pipeline.read_source_file(codebase_id, path, start_line, end_line)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OSError:
+        raise HTTPException(status_code=404, detail=f"File {path} not found")
+    return JSONResponse({
+        "codebase_id": codebase_id,
+        "path": path,
+        "start_line": start_line,
+        "end_line": end_line,
+        "content": content,
+    }, headers={"ETag": etag, "Cache-Control": "no-cache"} if etag else None)
+
+
+DIAGRAM_KINDS = ("calls", "includes", "flowchart", "class", "structure")
+
+
+@app.get("/diagrams/{kind}")
+def diagram(kind: str, codebase_id: str = DEFAULT_CODEBASE, name: Optional[str] = None,
+            depth: int = Query(2, ge=1, le=DIAGRAM_MAX_DEPTH)):
+    """
+    Mermaid diagram of an indexed codebase, drawn from its symbol index:
+    calls (call graph around function `name`), includes (include/import graph around
+    file `name`, or of the whole codebase), flowchart (of function `name`),
+    class (of class `name`) or structure (files linked by includes).
+    """
+    if kind not in DIAGRAM_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown diagram {kind}, expected one of {DIAGRAM_KINDS}")
+    if kind in ("calls", "flowchart", "class") and not name:
+        raise HTTPException(status_code=400, detail=f"The {kind} diagram needs a name")
+    _check_codebase(codebase_id)
+    codebase = rag_pipeline.get_codebase(codebase_id)
+    symbols = codebase.get_symbol_index()
+
+    if kind == "calls":
+        text = mermaid_generator.generate_call_graph(symbols, name, depth)
+    elif kind == "includes":
+        text = mermaid_generator.generate_include_graph(symbols, name, depth)
+    elif kind == "flowchart":
+        text = mermaid_generator.generate_symbol_flowchart(symbols, codebase.chunk_store, name)
+    elif kind == "class":
+        read_file = lambda path, start_line: rag_pipeline.read_source_file(codebase_id, path, start_line)
+        try:
+            text = mermaid_generator.generate_symbol_class_diagram(symbols, read_file, name)
+        except OSError:
+            raise HTTPException(status_code=404, detail="Sources of this codebase were not kept")
+    else:
+        _, files = rag_pipeline.list_source_files(codebase_id)
+        text = symbols.memoize(("structure",), lambda: mermaid_generator.generate_codebase_structure_diagram(
+            files[:DIAGRAM_MAX_NODES], symbols))
+    if text is None:
+        raise HTTPException(status_code=404, detail=f"{name} not found in codebase {codebase_id}")
+    return {"kind": kind, "name": name, "codebase_id": codebase_id, "mermaid": text}
+
+
+@app.get("/inference/stats")
+def inference_stats():
+    """Queue depth, wait time and rejection counters of the inference pools."""
+    stats = inference_pool.stats()
+    if batcher:
+        stats.update(batcher.stats())
+    if stream_pool is not inference_pool:
+        stats["stream"] = stream_pool.stats()
+    stats["query_cache"] = rag_pipeline.query_cache.stats()
+    stats["llm"] = llm_module.llm_stats()
+    return stats
+
+
+@metrics.collector
+def _inference_metrics():
+    pools = [("ask", inference_pool.stats())]
+    if stream_pool is not inference_pool:
+        pools.append(("stream", stream_pool.stats()))
+    return [
+        ("inference_queue_depth", "gauge", "Requests waiting for an inference worker.", ("pool",),
+         [((pool,), stats["queue_depth"]) for pool, stats in pools]),
+        ("inference_active", "gauge", "Requests being answered.", ("pool",),
+         [((pool,), stats["active"]) for pool, stats in pools]),
+        ("inference_requests_total", "counter", "Inference requests by outcome.", ("pool", "outcome"),
+         [((pool, outcome), stats[outcome]) for pool, stats in pools
+          for outcome in ("completed", "rejected", "timed_out")]),
+    ]
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Stage latencies, token, cache and queue counters in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health")
+def health():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready():
+    """
+    Readiness: 200 once model warmup has finished (or is disabled), 503 before that
+    or if it failed.
+    """
+    is_ready = readiness["warmup"] in ("done", "disabled")
+    body = dict(readiness, ready=is_ready,
+                embedding_model_loaded=rag_pipeline.is_loaded(),
+                llm_loaded=llm_module.is_loaded(),
+                ingest_jobs_active=len(ingest_jobs.active()))
+    return JSONResponse(body, status_code=200 if is_ready else 503)
 
 
 @app.get("/")
@@ -1,5 +1,10 @@
 import os
 import re
+from collections import deque
+
+from app.config import DIAGRAM_MAX_NODES
+
+ACCESS_SPECIFIER = re.compile(r'^(public|private|protected)\s*:$')
 
 def generate_function_flowchart(code_content, function_name):
     """
@@ -13,12 +18,13 @@ def generate_function_flowchart(code_content, function_name):
     function_found = False
     in_function = False
     current_node = None
+    header = re.compile(r'\b' + re.escape(function_name) + r'\b.*\(.*\)\s*{')
 
     # Simple state machine for parsing
     for i, line in enumerate(lines):
         stripped_line = line.strip()
 
-        if re.search(r'\b' + re.escape(function_name) + r'\b.*\(.*\)\s*{', stripped_line):
+        if not function_found and header.search(stripped_line):
             function_found = True
             in_function = True
             node_id_counter += 1
@@ -74,19 +80,31 @@ def generate_class_diagram(code_content, class_name):
     in_class = False
     attributes = []
     methods = []
+    header = re.compile(r'^(?:\w+\s+)*(class|interface|struct)\s+' + re.escape(class_name) + r'\b[^;]*({|$)')
 
     for line in lines:
         stripped_line = line.strip()
 
-        if re.match(r'^(class|interface)\s+' + re.escape(class_name) + r'\s*({|$)', stripped_line):
+        if not class_found and header.match(stripped_line):
             class_found = True
             in_class = True
+            class_indent = len(line) - len(line.lstrip())
+            member_indent = None
             continue
 
         if in_class:
-            if stripped_line == "}":
+            indent = len(line) - len(line.lstrip())
+            # The class ends at its closing brace or, for Python, at the next dedented line
+            if stripped_line in ("}", "};") or (stripped_line and indent <= class_indent and stripped_line != "{"):
                 in_class = False
                 break
+            if not stripped_line or stripped_line == "{" or ACCESS_SPECIFIER.match(stripped_line):
+                continue
+            # Members share one indentation level; deeper lines are method bodies
+            if member_indent is None:
+                member_indent = indent
+            if indent > member_indent:
+                continue
 
             # Basic attribute/method detection (can be improved with regex for types, visibility)
             if stripped_line and not stripped_line.startswith(("//", "/*", "*", "*/")):
@@ -107,30 +125,153 @@ def generate_class_diagram(code_content, class_name):
 
     return mermaid_syntax
 
-# You can add more generation functions here, e.g., for module dependencies, call graphs, etc.
-# These would likely require more advanced AST parsing or a more comprehensive code analysis.
+def _node(ids, name):
+    """Stable Mermaid node id for name; the label is quoted so any text is allowed."""
+    if name not in ids:
+        ids[name] = f"N{len(ids) + 1}"
+    return ids[name]
+
+
+def _graph(edges, names, highlight=None):
+    ids = {}
+    lines = ["graph TD"]
+    for name in names:
+        lines.append(f'{_node(ids, name)}["{name.replace(chr(34), "#quot;")}"]')
+    lines.extend(f"{_node(ids, a)} --> {_node(ids, b)}" for a, b in edges)
+    if highlight in ids:
+        lines.append(f"style {ids[highlight]} stroke-width:3px")
+    return "\n".join(lines)
+
+
+def _neighbourhood(start, forward, backward, depth, max_nodes):
+    """
+    Nodes within depth steps of start along forward(name) and backward(name) edges,
+    breadth first and at most max_nodes of them, with the edges between them.
+    """
+    seen = {start}
+    edges = []
+    for step in (forward, backward):
+        queue = deque([(start, 0)])
+        while queue:
+            name, level = queue.popleft()
+            if level == depth:
+                continue
+            for other in step(name):
+                if other not in seen:
+                    if len(seen) >= max_nodes:
+                        continue
+                    seen.add(other)
+                    queue.append((other, level + 1))
+                edges.append((name, other) if step is forward else (other, name))
+    return sorted(seen), sorted(set(edges))
+
+
+def generate_call_graph(symbols, function_name, depth=2, max_nodes=DIAGRAM_MAX_NODES):
+    """
+    Mermaid call graph around a function, from the codebase's SymbolIndex: the functions
+    it calls and the functions calling it, up to depth calls away.
+    Returns None if the function is not defined in the codebase.
+    """
+    name = function_name.rsplit("::", 1)[-1]
+    if not symbols.lookup(name):
+        return None
+
+    def render():
+        nodes, edges = _neighbourhood(name, symbols.callees, lambda n: symbols.callers.get(n, ()), depth, max_nodes)
+        return _graph(edges, nodes, highlight=name)
+    return symbols.memoize(("calls", name, depth, max_nodes), render)
+
+
+def generate_include_graph(symbols, path=None, depth=2, max_nodes=DIAGRAM_MAX_NODES):
+    """
+    Mermaid include/import graph from the codebase's SymbolIndex: around one file (what
+    it includes and what includes it, up to depth levels) or, without a path, of the
+    whole codebase (files with include edges first, at most max_nodes files).
+    Returns None if the path is not part of the codebase.
+    """
+    if path is not None and path not in symbols.files:
+        return None
+
+    def render():
+        if path is not None:
+            nodes, edges = _neighbourhood(path, lambda p: symbols.files[p]["includes"],
+                                          lambda p: symbols.included_by.get(p, ()), depth, max_nodes)
+            return _graph(edges, nodes, highlight=path)
+        linked = sorted(p for p, info in symbols.files.items() if info["includes"] or p in symbols.included_by)
+        nodes = set((linked + sorted(symbols.files))[:max_nodes])
+        edges = [(p, target) for p in sorted(nodes) for target in symbols.files[p]["includes"] if target in nodes]
+        return _graph(edges, sorted(nodes))
+    return symbols.memoize(("includes", path, depth, max_nodes), render)
+
 
-def generate_codebase_structure_diagram(files_data):
+def generate_symbol_flowchart(symbols, chunk_store, function_name):
+    """
+    generate_function_flowchart for a function of the codebase, found through the
+    SymbolIndex: only its own chunks are read instead of scanning whole files.
+    """
+    places = symbols.lookup(function_name)
+    if not places:
+        return None
+
+    def render():
+        _, _, _, chunk_ids = places[0]
+        lines = []
+        last_line = -1
+        # Parts of a split function overlap by a few lines; keep each line once
+        for chunk in sorted((chunk_store[i] for i in chunk_ids if i in chunk_store), key=lambda c: c["start_line"]):
+            part_lines = chunk["content"].split("\n")
+            lines.extend(part_lines[max(0, last_line - chunk["start_line"] + 1):])
+            last_line = chunk["end_line"]
+        # The chunk starts at the signature; put it on one line with its opening brace
+        code = "\n".join(lines)
+        brace = code.find("{") + 1
+        if brace:
+            code = " ".join(code[:brace].split()) + code[brace:]
+        return generate_function_flowchart(code, function_name.rsplit("::", 1)[-1])
+    return symbols.memoize(("flowchart", function_name), render)
+
+
+def generate_symbol_class_diagram(symbols, read_file, class_name):
+    """
+    generate_class_diagram for a class of the codebase: the SymbolIndex gives the file
+    and line it is defined at, and read_file(path, start_line) returns the file from
+    that (1-based) line on, so no other file is read.
+    """
+    places = symbols.classes.get(class_name)
+    if not places:
+        return None
+
+    def render():
+        path, line = places[0]
+        return generate_class_diagram(read_file(path, line + 1), class_name)
+    return symbols.memoize(("class", class_name), render)
+
+
+def generate_codebase_structure_diagram(files_data, symbols=None):
     """
     Generates a Mermaid graph representing the overall codebase structure (files and their types).
+    With the codebase's SymbolIndex, files are linked by their include/import edges.
     """
     mermaid_syntax = "graph TD\n"
     nodes = []
     links = []
+    ids = {}
 
     # Create nodes for each file
     for file_info in files_data:
-        file_name = os.path.basename(file_info["name"]).replace('.', '_') # Sanitize for Mermaid node ID
+        path = file_info.get("path", file_info["name"])
         file_type = file_info["type"]
-        nodes.append(f"{file_name}[{file_info['name']}<br/>({file_type})]")
+        nodes.append(f"{_node(ids, path)}[\"{file_info['name']}<br/>({file_type})\"]")
 
-    # Add links (conceptual, as direct file-to-file links aren't easily derived here without deeper parsing)
-    # For a more meaningful diagram, you'd need to parse imports/includes.
-    # For now, let's just show the files.
+    # Include edges between the listed files
+    if symbols is not None:
+        for path in list(ids):
+            for target in symbols.files.get(path.replace(os.sep, "/"), {}).get("includes", ()):
+                if target in ids:
+                    links.append(f"{ids[path]} --> {ids[target]}")
 
     mermaid_syntax += "\n".join(nodes)
     if links:
         mermaid_syntax += "\n" + "\n".join(links)
 
     return mermaid_syntax
-
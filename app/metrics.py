@@ -0,0 +1,152 @@
+"""
+Counters, histograms and stage timing spans, rendered in the Prometheus text format
+for /metrics.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Seconds; covers sub-millisecond lookups up to multi-second generations
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_metrics = []
+_collectors = []
+_timings = ContextVar("timings", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Counter:
+    """A monotonically increasing count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, self.labels, key, value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Observations counted into cumulative buckets per label set, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        names = self.labels + ("le",)
+        samples = []
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    samples.append((self.name + "_bucket", names, key + (_number(bound),), cumulative))
+                samples.append((self.name + "_sum", self.labels, key, total))
+                samples.append((self.name + "_count", self.labels, key, cumulative))
+        return samples
+
+
+def collector(fn):
+    """
+    Registers fn() -> [(name, kind, help, labels, [(label values, value)])], called on
+    every scrape, for values that live elsewhere (cache counters, index sizes).
+    """
+    _collectors.append(fn)
+    return fn
+
+
+STAGE_SECONDS = Histogram("rag_stage_seconds", "Time spent per pipeline stage.", ("stage",))
+
+
+def record(stage, seconds):
+    """Records a stage duration measured by the caller."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def span(stage):
+    """Times the block as one run of stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def collect_timings():
+    """
+    Yields a dict that receives {stage: seconds} of every span in this thread (or
+    async task) until the block ends, for per-request timing headers.
+    """
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def server_timing(timings):
+    """Formats {stage: seconds} as a Server-Timing header value (milliseconds)."""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    families = [(m.name, m.kind, m.help, m.samples()) for m in _metrics]
+    for fn in _collectors:
+        for name, kind, help, labels, values in fn():
+            families.append((name, kind, help, [(name, labels, key, value) for key, value in values]))
+    lines = []
+    for name, kind, help, samples in families:
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample_name, labels, key, value in samples:
+            lines.append(f"{sample_name}{_label_text(labels, key)} {_number(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,91 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_question(question):
+    return re.sub(r"\s+", " ", question.strip().lower()).rstrip(" ?.!")
+
+
+class QueryCache:
+    """
+    LRU + TTL cache of query results keyed by (normalized question, request params, index version).
+    params is any hashable describing the request options (top_k, threshold, ...).
+    With semantic_threshold set, a miss falls back to the cached entry whose query
+    embedding has the highest cosine similarity, if it is at least the threshold.
+    """
+
+    def __init__(self, max_entries, ttl_seconds, semantic_threshold=None, embed_fn=None):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.semantic_threshold = semantic_threshold if embed_fn else None
+        self.embed_fn = embed_fn
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _embed(self, question):
+        vector = np.asarray(self.embed_fn(question), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def get(self, question, params, version):
+        key = (normalize_question(question), params, version)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                del self._entries[key]
+            if self.semantic_threshold is None:
+                self.misses += 1
+                return None
+            candidates = [(k, e) for k, e in self._entries.items()
+                          if k[1:] == key[1:] and e[1] > now and e[2] is not None]
+
+        if candidates:
+            query = self._embed(question)
+            best_key, best = max(candidates, key=lambda item: float(item[1][2] @ query))
+            if float(best[2] @ query) >= self.semantic_threshold:
+                with self._lock:
+                    if best_key in self._entries:
+                        self._entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                return best[0]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, question, params, version, value):
+        key = (normalize_question(question), params, version)
+        embedding = self._embed(question) if self.semantic_threshold is not None else None
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate(self, version):
+        """Drops the entries cached for one index version."""
+        with self._lock:
+            for key in [k for k in self._entries if k[2] == version]:
+                del self._entries[key]
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+        }
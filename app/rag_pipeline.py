@@ -1,94 +1,1048 @@
-import os 
+import os
 import json
+import mmap
+import shutil
+import stat
+import time
+import uuid
+import threading
+import zipfile
+from collections import defaultdict, deque
+from itertools import chain, islice
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
 
-from app.utils import extract_code_chunks
+from app.utils import parse_code_file, parse_code_bytes, IDENTIFIER
+from app.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from app.symbol_index import SymbolIndex
+from app.dedup import Deduplicator, fingerprint
+from app.embedding_cache import EmbeddingCache
+from app.embedding_backend import load_embedding_model, embedding_model_id, BucketedEncoder
+from app.query_cache import QueryCache
+from app.chunk_store import ChunkStore, ChunkStoreWriter, write_chunk_store
+from app.index_registry import IndexRegistry, validate_codebase_id
+from app import vector_index, metrics
 from app.config import *
 
-model = SentenceTransformer(EMBED_MODEL_NAME)
-index = None
-chunks_list = []
+_encoder = None
+_encoder_lock = threading.Lock()
+embedding_cache = EmbeddingCache(EMBED_CACHE_FILE, embedding_model_id(EMBED_MODEL_NAME, EMBED_BACKEND),
+                                 EMBED_CACHE_MAX_ENTRIES)
+query_cache = QueryCache(QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL_SECONDS,
+                         semantic_threshold=QUERY_CACHE_SEMANTIC_THRESHOLD,
+                         embed_fn=lambda question: get_encoder().encode([question])[0])
+RETRIEVED_CHUNKS = metrics.Histogram("rag_retrieved_chunks", "Chunks returned per query.",
+                                     buckets=(0, 1, 2, 3, 5, 8, 10, 20, 50))
+_build_locks = {}
+_listings = {}
 
-CHUNK_FILE = "vector_store/id_mapping.json"
-INDEX_FILE = "vector_store/index.faiss"
+# A vector store keeps each build in its own folder and names the served one in CURRENT
+CURRENT_BUILD_FILE = "CURRENT"
+BUILD_DIR_PREFIX = ".build-"
+
+SUPPORTED_EXTENSIONS = (".cpp", ".c", ".h", ".hpp", ".cc", ".cxx",
+                        ".py", ".java", ".js", ".ts", ".tsx",
+                        ".cs", ".go", ".php", ".rb", ".swift")
 
 def get_code_files(directory):
-    supported_exts = (".cpp", ".c", ".h", ".hpp", ".cc", ".cxx",
-                      ".py", ".java", ".js", ".ts", ".tsx",
-                      ".cs", ".go", ".php", ".rb", ".swift")
     return [
         os.path.join(dp, f)
         for dp, _, files in os.walk(directory)
-        for f in files if f.lower().endswith(supported_exts)
+        for f in files if f.lower().endswith(SUPPORTED_EXTENSIONS)
     ]
 
 
-def process_and_store_local_code(base_path=CODE_FOLDER):
+def _list_files(base_path):
+    """Yields (key, filepath, mtime, size) for the supported files under base_path."""
+    for filepath in get_code_files(base_path):
+        try:
+            stat = os.stat(filepath)
+        except OSError as e:
+            print(f" Could not read {filepath}: {e}")
+            continue
+        yield os.path.relpath(filepath, base_path), filepath, stat.st_mtime, stat.st_size
+
+
+def _list_zip_members(archive, include=None):
+    """
+    Returns (key, ZipInfo, mtime, size) for the supported archive members that include()
+    accepts, skipping directories, absolute or parent-relative paths and members over
+    ZIP_MAX_MEMBER_BYTES. Only the central directory is read.
+    """
+    members = []
+    total = 0
+    for info in archive.infolist():
+        key = os.path.normpath(info.filename)
+        if (info.is_dir() or os.path.isabs(key) or key.split(os.sep)[0] == ".."
+                or not key.lower().endswith(SUPPORTED_EXTENSIONS) or (include and not include(key))):
+            continue
+        if info.file_size > ZIP_MAX_MEMBER_BYTES:
+            print(f" Skipping {info.filename}: {info.file_size} bytes is over the size limit")
+            continue
+        total += info.file_size
+        if total > ZIP_MAX_TOTAL_BYTES:
+            raise ValueError(f"Archive expands to more than {ZIP_MAX_TOTAL_BYTES} bytes of code")
+        members.append((key, info, time.mktime(info.date_time + (0, 0, -1)), info.file_size))
+    return members
+
+
+def _write_source(source_dir, key, raw):
+    path = os.path.join(source_dir, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(raw)
+
+
+def codebase_store_dir(codebase_id):
+    validate_codebase_id(codebase_id)
+    if codebase_id == DEFAULT_CODEBASE:
+        return VECTOR_STORE_DIR
+    return os.path.join(CODEBASE_STORE_DIR, codebase_id)
+
+
+def codebase_source_dir(codebase_id):
+    validate_codebase_id(codebase_id)
+    if codebase_id == DEFAULT_CODEBASE:
+        return CODE_FOLDER
+    return os.path.join(CODEBASE_UPLOAD_DIR, codebase_id)
+
+
+def _remove_readonly(func, path, _):
+    """Clear the readonly bit and reattempt the removal."""
+    os.chmod(path, stat.S_IWRITE)
+    func(path)
+
+
+def remove_tree(path):
+    if os.path.exists(path):
+        shutil.rmtree(path, onerror=_remove_readonly)
+
+
+def _sibling_dir(codebase_id, suffix):
+    # The leading dot keeps it apart from codebase ids
+    parent, name = os.path.split(os.path.normpath(codebase_source_dir(codebase_id)))
+    return os.path.join(parent, f".{name}.{suffix}")
+
+
+def stage_sources(codebase_id):
+    """
+    Creates an empty staging folder next to the codebase's upload folder for the sources
+    of a new build (build with source_dir=<it>); replace_sources swaps it in once the
+    build succeeded, and the caller removes it otherwise.
+    """
+    staging_dir = _sibling_dir(codebase_id, "staging")
+    remove_tree(staging_dir)
+    os.makedirs(staging_dir)
+    return staging_dir
+
+
+def replace_sources(codebase_id, staging_dir):
+    """Moves staging_dir to the codebase's upload folder, carrying over its .git folder."""
+    upload_dir = codebase_source_dir(codebase_id)
+    if os.path.isdir(os.path.join(upload_dir, ".git")):
+        os.replace(os.path.join(upload_dir, ".git"), os.path.join(staging_dir, ".git"))
+    previous = _sibling_dir(codebase_id, "previous")
+    remove_tree(previous)
+    if os.path.exists(upload_dir):
+        os.replace(upload_dir, previous)
+    os.makedirs(os.path.dirname(os.path.abspath(upload_dir)), exist_ok=True)
+    os.replace(staging_dir, upload_dir)
+    remove_tree(previous)
+
+
+def current_build_dir(store_dir):
     """
-    Processes the given codebase folder and stores FAISS index + chunk mapping.
-    Always rebuilds the index when called.
+    The folder of the build being served from store_dir: the one its CURRENT file names,
+    or store_dir itself for stores written before each build got its own folder.
     """
-    global index, chunks_list
+    try:
+        with open(os.path.join(store_dir, CURRENT_BUILD_FILE), "r", encoding="utf-8") as f:
+            return os.path.join(store_dir, f.read().strip())
+    except FileNotFoundError:
+        return store_dir
 
-    os.makedirs(os.path.dirname(CHUNK_FILE), exist_ok=True)
 
-    files = get_code_files(base_path)
-    if not files:
-        print(f"No supported code files found in {base_path}")
+def _remove_old_builds(store_dir, keep):
+    """
+    Removes the build folders of store_dir not in keep. On Windows a folder whose files
+    a reader still has open or mapped cannot be removed yet; it is retried after the next commit.
+    """
+    for name in os.listdir(store_dir):
+        path = os.path.join(store_dir, name)
+        if name.startswith(BUILD_DIR_PREFIX) and path not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def codebase_exists(codebase_id):
+    """True if codebase_id is valid and has a vector store on disk."""
+    return os.path.exists(os.path.join(current_build_dir(codebase_store_dir(codebase_id)), "index.faiss"))
+
+
+def list_codebases():
+    """Ids of all codebases that have a vector store on disk."""
+    codebases = []
+    if os.path.exists(os.path.join(current_build_dir(VECTOR_STORE_DIR), "index.faiss")):
+        codebases.append(DEFAULT_CODEBASE)
+    if os.path.isdir(CODEBASE_STORE_DIR):
+        codebases.extend(sorted(
+            name for name in os.listdir(CODEBASE_STORE_DIR)
+            if name != DEFAULT_CODEBASE and not name.startswith(".")
+            and os.path.exists(os.path.join(current_build_dir(os.path.join(CODEBASE_STORE_DIR, name)), "index.faiss"))
+        ))
+    return codebases
+
+
+def list_source_files(codebase_id):
+    """
+    Metadata of the files indexed for codebase_id, read from its manifest: returns
+    (listing version, files), where files are {name, path, type, size, mtime, chunks}
+    dicts sorted by path. The version is the index version plus the manifest's mtime,
+    so it changes with every build, including ones that only moved file mtimes.
+    The parsed listing is kept until the manifest changes. (None, []) before the first build.
+    """
+    manifest_file = os.path.join(current_build_dir(codebase_store_dir(codebase_id)), "manifest.json")
+    try:
+        stamp = os.stat(manifest_file).st_mtime_ns
+    except FileNotFoundError:
+        return None, []
+    cached = _listings.get(codebase_id)
+    if cached is not None and cached[0] == stamp:
+        return cached[1], cached[2]
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    files = [
+        {
+            "name": os.path.basename(path),
+            "path": path,
+            "type": os.path.splitext(path)[1].lstrip(".").lower() or "unknown",
+            "size": entry["size"],
+            "mtime": entry["mtime"],
+            "chunks": len(entry["ids"]),
+        }
+        for path, entry in sorted(manifest["files"].items())
+    ]
+    version = f"{manifest.get('version') or 'legacy'}-{stamp:x}"
+    _listings[codebase_id] = (stamp, version, files)
+    return version, files
+
+
+def _skip_lines(mm, count, pos):
+    """Offset just past the count-th newline after pos (end of mm if there are fewer)."""
+    for _ in range(count):
+        pos = mm.find(b"\n", pos) + 1
+        if not pos:
+            return len(mm)
+    return pos
+
+
+def read_source_file(codebase_id, path, start_line=1, end_line=None):
+    """
+    Returns lines start_line..end_line (1-based, inclusive; end_line None reads to the end)
+    of an uploaded file of codebase_id. The file is memory-mapped, so only the pages up
+    to the requested lines are read. Raises ValueError for paths outside the codebase's
+    upload folder and FileNotFoundError if the file does not exist.
+    """
+    source_dir = os.path.realpath(codebase_source_dir(codebase_id))
+    filepath = os.path.realpath(os.path.join(source_dir, path))
+    if filepath == source_dir or os.path.commonpath([source_dir, filepath]) != source_dir:
+        raise ValueError(f"Invalid file path: {path!r}")
+    with open(filepath, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = _skip_lines(mm, start_line - 1, 0)
+            end = len(mm) if end_line is None else _skip_lines(mm, end_line - start_line + 1, start)
+            return mm[start:end].decode("utf-8", errors="ignore")
+
+
+def _parse_and_fingerprint(parse, *args):
+    """Runs parse(*args) and adds the dedup fingerprints to its chunks (in the worker process)."""
+    digest, chunks, file_outline, error = parse(*args)
+    for chunk in chunks or ():
+        chunk["content_hash"], chunk["simhash"] = fingerprint(chunk["content"], DEDUP_MIN_TOKENS)
+    return digest, chunks, file_outline, error
+
+
+def _location(chunk):
+    return {"source": chunk["source"], "start_line": chunk.get("start_line"), "end_line": chunk.get("end_line")}
+
+
+def _retrieved(chunk):
+    """
+    A stored chunk as returned by retrieval: without its dedup fingerprints, and with at
+    most DEDUP_LISTED_LOCATIONS of its copies' locations plus their total duplicate_count.
+    """
+    chunk.pop("content_hash", None)
+    chunk.pop("simhash", None)
+    if "duplicates" in chunk:
+        chunk["duplicate_count"] = len(chunk["duplicates"])
+        del chunk["duplicates"][DEDUP_LISTED_LOCATIONS:]
+    return chunk
+
+
+def _parse_files(jobs, base_path, archive=None, write_dir=None):
+    """
+    Yields (job, parse result) in order. Files are chunked in a process pool with a
+    bounded window of files in flight, so parsing overlaps with embedding. build()
+    spills each file's chunks to disk as they arrive, so memory does not grow with
+    repository size.
+    Chunk sources name the file's path under base_path, wherever it is read from.
+    With an archive, job[1] is a ZipInfo: the member is read here (and written under
+    write_dir if given) and only its bytes go to the workers.
+    """
+    def task(job):
+        source_path = os.path.join(base_path, job[0])
+        if archive is None:
+            fn, args = parse_code_file, (job[1], job[4], source_path)
+        else:
+            raw = archive.read(job[1])
+            if write_dir:
+                _write_source(write_dir, job[0], raw)
+            fn, args = parse_code_bytes, (raw, source_path, job[4])
+        return (_parse_and_fingerprint, (fn, *args)) if DEDUP_CHUNKS else (fn, args)
+
+    workers = min(INGEST_WORKERS, len(jobs))
+    if workers <= 1 or len(jobs) < INGEST_PARALLEL_MIN_FILES:
+        for job in jobs:
+            fn, args = task(job)
+            yield job, fn(*args)
         return
 
-    documents = []
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for job in jobs:
+            fn, args = task(job)
+            pending.append((job, pool.submit(fn, *args)))
+            if len(pending) >= workers * 4:
+                done, future = pending.popleft()
+                yield done, future.result()
+        while pending:
+            done, future = pending.popleft()
+            yield done, future.result()
+
+
+def get_encoder():
+    """
+    The embedding model, loaded on first use and shared by ingestion, retrieval and
+    the query cache. Symbol lookups and cached embeddings never load it.
+    """
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                print(f"Loading embedding model {EMBED_MODEL_NAME} ({EMBED_BACKEND})...")
+                model = load_embedding_model(EMBED_MODEL_NAME, EMBED_BACKEND, EMBED_ONNX_FILE)
+                _encoder = BucketedEncoder(model, EMBED_MAX_BATCH_TOKENS, EMBED_BATCH_SIZE)
+    return _encoder
+
+
+def is_loaded():
+    return _encoder is not None
+
+
+def warmup():
+    """Loads the embedding model and runs one query through it."""
+    embed_queries(["warmup"])
+
+
+def embed_texts(texts):
+    """
+    Embeds texts as L2-normalized vectors, serving repeats from the embedding cache;
+    only misses reach the model.
+    """
+    vectors = embedding_cache.get_many(texts)
+    misses = [i for i, v in enumerate(vectors) if v is None]
+    if misses:
+        fresh = get_encoder().encode([texts[i] for i in misses])
+        embedding_cache.put_many([texts[i] for i in misses], fresh)
+        for i, vector in zip(misses, fresh):
+            vectors[i] = vector
+    vectors = np.vstack(vectors).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def embed_queries(queries):
+    return get_encoder().encode(queries, normalize=True)
+
+
+def _rebuild_index(store, index_type, num_vectors):
+    """
+    Builds a fresh index of index_type over the num_vectors canonical chunks of the
+    chunk store, training it on a sample first. Vectors come from the embedding cache,
+    so this rarely calls the model. Duplicate chunks have no vector of their own and are skipped.
+    """
+    print(f"Building {index_type} index over {num_vectors} vectors...")
+    new_index = vector_index.create_index(index_type, get_encoder().dimension, num_vectors)
+    if not new_index.is_trained:
+        sample_size = vector_index.train_sample_size(new_index)
+        chunks = (store.at(int(p)) for p in np.random.default_rng(0).permutation(len(store)))
+        sample = list(islice((c for c in chunks if "duplicate_of" not in c), sample_size))
+        new_index.train(embed_texts([c["content"] for c in sample]))
 
-    for filepath in files:
+    chunks = (c for c in store if "duplicate_of" not in c)
+    while True:
+        part = list(islice(chunks, EMBED_BATCH_SIZE * 16))
+        if not part:
+            break
+        new_index.add_with_ids(embed_texts([c["content"] for c in part]),
+                               np.array([c["id"] for c in part], dtype=np.int64))
+    return vector_index.apply_search_params(new_index)
+
+
+class CodebaseIndex:
+    """
+    FAISS index, chunk store, lexical index, symbol index and manifest of one
+    codebase. Each build is written to its own folder under store_dir (build_dir)
+    and served once the CURRENT file names it. The symbol index is only read once a
+    diagram or symbol lookup needs it.
+    """
+
+    def __init__(self, codebase_id, store_dir=None):
+        self.codebase_id = codebase_id
+        self.store_dir = store_dir or codebase_store_dir(codebase_id)
+        self.legacy_chunk_file = os.path.join(self.store_dir, "id_mapping.json")
+        self._use_build_dir(current_build_dir(self.store_dir))
+        # New chunks of a running build, spilled to disk until the staged chunk store is written
+        self.build_chunk_files = (os.path.join(self.store_dir, "build_chunk_offsets.npy.tmp"),
+                                  os.path.join(self.store_dir, "build_chunks.blob.tmp"))
+        self.index = None
+        self.chunk_store = None
+        self.lexical_index = None
+        self.symbol_index = None
+        self._symbol_lock = threading.Lock()
+        self.version = None
+        self._staging_dir = None
+        self._staged = []
+
+    def _use_build_dir(self, build_dir):
+        self.build_dir = build_dir
+        self.chunk_offsets_file = os.path.join(build_dir, "chunk_offsets.npy")
+        self.chunk_blob_file = os.path.join(build_dir, "chunks.blob")
+        self.index_file = os.path.join(build_dir, "index.faiss")
+        self.manifest_file = os.path.join(build_dir, "manifest.json")
+        self.lexical_index_file = os.path.join(build_dir, "lexical_index.npz")
+        self.symbol_index_file = os.path.join(build_dir, "symbol_index.json")
+
+    def memory_bytes(self):
+        """
+        Estimated resident size: the index and lexical index files, plus the symbol index
+        once loaded. The chunk store is memory-mapped and paged in on demand, so it is not counted.
+        """
+        files = [self.index_file, self.lexical_index_file]
+        if self.symbol_index is not None:
+            files.append(self.symbol_index_file)
+        return sum(os.path.getsize(path) for path in files if os.path.exists(path))
+
+    def _open_chunk_store(self):
+        if self.chunk_store is not None:
+            self.chunk_store.close()
+        self.chunk_store = ChunkStore(self.chunk_offsets_file, self.chunk_blob_file)
+
+    def _write_chunk_store(self, chunks):
+        """
+        Writes chunks as the chunk store of build_dir, which must not exist yet, and opens it.
+        The previously open store is closed once the chunks (which may come from it) are written.
+        """
+        write_chunk_store(chunks, self.chunk_offsets_file, self.chunk_blob_file)
+        if self.chunk_store is not None:
+            self.chunk_store.close()
+        for path in (self.chunk_blob_file, self.chunk_offsets_file):
+            os.replace(path + ".tmp", path)
+        self.chunk_store = ChunkStore(self.chunk_offsets_file, self.chunk_blob_file)
+
+    def _rebuild_lexical_index(self):
+        self.lexical_index = LexicalIndex.build(self.chunk_store, k1=BM25_K1, b=BM25_B)
+        self.lexical_index.save(self.lexical_index_file)
+
+    def _build_symbol_index(self, files, base_path):
+        self.symbol_index = SymbolIndex.build(self.chunk_store, files, base_path,
+                                              cache_entries=DIAGRAM_CACHE_ENTRIES)
+        self.symbol_index.save(self.symbol_index_file + ".tmp")
+        os.replace(self.symbol_index_file + ".tmp", self.symbol_index_file)
+
+    def get_symbol_index(self):
+        """
+        The codebase's SymbolIndex, read from disk on first use. Stores written before
+        symbol indexes existed get one built from the chunk store and manifest (without
+        include edges until their files are re-indexed).
+        """
+        with self._symbol_lock:
+            if self.symbol_index is None:
+                if os.path.exists(self.symbol_index_file):
+                    self.symbol_index = SymbolIndex.load(self.symbol_index_file,
+                                                         cache_entries=DIAGRAM_CACHE_ENTRIES)
+                else:
+                    manifest = self._load_manifest() or {"files": {}}
+                    self._build_symbol_index(manifest["files"], codebase_source_dir(self.codebase_id))
+            return self.symbol_index
+
+    def _stage_build_dir(self):
+        """Starts a new build folder; build_dir and the file paths point into it from now on."""
+        self._staging_dir = os.path.join(self.store_dir, BUILD_DIR_PREFIX + uuid.uuid4().hex)
+        os.makedirs(self._staging_dir)
+        self._use_build_dir(self._staging_dir)
+
+    def _stage_manifest(self, manifest):
+        """
+        Writes the manifest of a new build folder, or, when build() kept the served build,
+        a .tmp next to its manifest that commit() renames over it (the manifest is never
+        held open, unlike the mapped index and chunk store).
+        """
+        path = self.manifest_file
+        if self._staging_dir is None:
+            self._staged.append(path)
+            path += ".tmp"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+    def commit(self):
+        """
+        Makes the build staged by build() the served one by renaming a new CURRENT file
+        over the old one. Files of the previous build are never renamed or overwritten, so
+        readers that still have them open or mapped keep using them (Windows refuses to
+        replace such files). Build folders older than the previous one are removed.
+        """
+        for path in self._staged:
+            os.replace(path + ".tmp", path)
+        self._staged = []
+        if self._staging_dir is None:
+            return
+        previous = current_build_dir(self.store_dir)
+        pointer = os.path.join(self.store_dir, CURRENT_BUILD_FILE)
+        with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+            f.write(os.path.basename(self._staging_dir))
+        os.replace(pointer + ".tmp", pointer)
+        self._staging_dir = None
+        _remove_old_builds(self.store_dir, keep={self.build_dir, previous})
+
+    def discard(self):
+        """Removes the files staged by a build() that is not going to be committed."""
+        for path in self._staged:
+            if os.path.exists(path + ".tmp"):
+                os.remove(path + ".tmp")
+        self._staged = []
+        if self._staging_dir is not None:
+            if self.chunk_store is not None:
+                self.chunk_store.close()
+                self.chunk_store = None
+            shutil.rmtree(self._staging_dir, ignore_errors=True)
+            self._staging_dir = None
+
+    def _load_lexical_index(self):
+        if os.path.exists(self.lexical_index_file):
+            self.lexical_index = LexicalIndex.load(self.lexical_index_file, k1=BM25_K1, b=BM25_B)
+        else:
+            self._rebuild_lexical_index()
+
+    def _set_version(self, version):
+        """
+        Records which index build is being served; cached query results of the previous build are dropped.
+        """
+        if self.version is not None and self.version != version:
+            query_cache.invalidate(self.version)
+        self.version = version
+
+    def _migrate_legacy_mapping(self):
+        """
+        Converts a pretty-printed id_mapping.json into the compact chunk store of a new
+        build folder, with a copy of the index and a lexical index, and serves that build.
+        The legacy files in store_dir are left as they are.
+        Chunks saved before ids existed get their FAISS position as id.
+        """
+        print("Converting id_mapping.json to the compact chunk store...")
+        with open(self.legacy_chunk_file, "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        for position, chunk in enumerate(chunks):
+            chunk.setdefault("id", position)
+        legacy_index_file = self.index_file
+        self._stage_build_dir()
         try:
-            with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-                code = f.read()
-                chunks = extract_code_chunks(code, filepath)
-                documents.extend(chunks)
-        except Exception as e:
-            print(f" Could not read {filepath}: {e}")
+            shutil.copyfile(legacy_index_file, self.index_file)
+            self._write_chunk_store(sorted(chunks, key=lambda c: c["id"]))
+            self._rebuild_lexical_index()
+        except BaseException:
+            self.discard()
+            raise
+        self.commit()
 
-    if not documents:
-        print(" No chunks generated from code files.")
-        return
+    def _read_index(self, use_mmap):
+        """
+        IO_FLAG_MMAP_IFC maps the vector storage of flat, HNSW and IVF indexes straight
+        from the file (IO_FLAG_MMAP alone only maps IVF lists). A mapped index is read-only;
+        build() reloads it without mmap before modifying it.
+        """
+        if use_mmap:
+            try:
+                return faiss.read_index(self.index_file, faiss.IO_FLAG_MMAP_IFC)
+            except RuntimeError:
+                pass  # this index type cannot be mapped; read it into memory
+        return faiss.read_index(self.index_file)
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_file):
+            return None
+        with open(self.manifest_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _can_update_incrementally(self, manifest):
+        """
+        True when the stored index supports remove_ids/add_with_ids and matches the manifest.
+        The index is (re)loaded without mmap because it is about to be modified.
+        """
+        if manifest is None:
+            return False
+        try:
+            self.load(use_mmap=False)
+        except FileNotFoundError:
+            return False
+        return hasattr(self.index, "id_map")
+
+    def _embed_and_add(self, chunks):
+        """
+        Embeds one batch of chunks and adds the vectors to the index under their chunk ids.
+        """
+        embeddings = embed_texts([c["content"] for c in chunks])
+        if self.index is None:
+            self.index = vector_index.create_index("flat", embeddings.shape[1], len(chunks))
+        self.index.add_with_ids(embeddings, np.array([c["id"] for c in chunks], dtype=np.int64))
+
+    def build(self, base_path, incremental=True, progress=None, archive=None, include=None,
+              write_sources=False, source_dir=None):
+        """
+        Processes the given codebase folder into a staged FAISS index + chunk mapping;
+        commit() makes it the on-disk version. See process_and_store_local_code.
+        progress, if given, is called with keyword updates (stage, files_total,
+        files_processed, chunks_processed, chunks_per_sec) as the build advances.
+        With archive (a ZipFile), its members are indexed instead, as if extracted
+        to base_path; see process_zip_archive.
+        When every file of an existing build is gone, an empty build is staged so the
+        deleted code stops being served. Returns None, with nothing staged, when there
+        is nothing to index and no previous build.
+        With source_dir, the files are read from (with write_sources, written to) that
+        folder instead, e.g. a staging folder the caller moves to base_path afterwards;
+        chunk sources and the symbol index still name base_path.
+        """
+        stats = None
+        try:
+            stats = self._build(base_path, incremental, progress, archive, include, write_sources,
+                                source_dir or base_path)
+            return stats
+        finally:
+            if stats is None:
+                self.discard()
+            for path in self.build_chunk_files:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _build(self, base_path, incremental, progress, archive, include, write_sources, source_dir):
+        report = progress or (lambda **fields: None)
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._use_build_dir(current_build_dir(self.store_dir))
+
+        report(stage="scanning")
+        if archive is None:
+            files = list(_list_files(source_dir))
+        else:
+            files = _list_zip_members(archive, include)
+        has_build = os.path.exists(self.manifest_file)
+        if not files and not has_build:
+            print(f"No supported code files found in {source_dir}")
+            return
+
+        manifest = self._load_manifest() if incremental else None
+        if self._can_update_incrementally(manifest):
+            old_files = manifest["files"]
+            next_id = manifest["next_id"]
+            old_store = self.chunk_store
+        else:
+            self.index = None
+            old_files = {}
+            next_id = 0
+            old_store = None
+
+        # Canonical chunks by fingerprint, and every duplicate chunk's canonical id and location
+        dedup = Deduplicator(DEDUP_MAX_DISTANCE) if DEDUP_CHUNKS else None
+        aliases = {}
+        if dedup and old_store is not None:
+            for chunk in old_store:
+                if "duplicate_of" in chunk:
+                    aliases[chunk["id"]] = (chunk["duplicate_of"], _location(chunk))
+                elif "content_hash" in chunk:
+                    dedup.add(chunk["id"], chunk["content_hash"], chunk.get("simhash"), chunk.get("symbol"))
+
+        new_files = {}
+        jobs = []
+        skipped = 0
+
+        for key, source, mtime, size in files:
+            entry = old_files.get(key)
+            if entry and entry["mtime"] == mtime and entry["size"] == size:
+                new_files[key] = entry
+                skipped += 1
+                if write_sources:
+                    _write_source(source_dir, key, archive.read(source))
+                continue
+            jobs.append((key, source, mtime, size, entry["sha256"] if entry else None))
+
+        stale_ids = []
+        spill = ChunkStoreWriter(*self.build_chunk_files)
+        batch = []
+        updated = parsed_files = embedded_chunks = 0
+        unchanged_files = skipped
+        cache_before = embedding_cache.stats()
+        start = time.perf_counter()
+        report(stage="embedding", files_total=len(files), files_processed=unchanged_files)
+
+        parsed = _parse_files(jobs, base_path, archive, source_dir if write_sources else None)
+        for (key, source, mtime, size, known_digest), (digest, chunks, file_outline, error) in parsed:
+            parsed_files += 1
+            report(files_processed=unchanged_files + parsed_files)
+            if error:
+                print(f" Could not read {key}: {error}")
+                continue
+
+            entry = old_files.get(key)
+            if chunks is None:
+                new_files[key] = dict(entry, mtime=mtime, size=size)
+                skipped += 1
+                continue
+
+            if entry:
+                stale_ids.extend(entry["ids"])
+            ids = list(range(next_id, next_id + len(chunks)))
+            next_id += len(chunks)
+            for chunk_id, chunk in zip(ids, chunks):
+                chunk["id"] = chunk_id
+                if dedup:
+                    canonical = dedup.find(chunk["content_hash"], chunk["simhash"], chunk.get("symbol"))
+                    if canonical is None:
+                        dedup.add(chunk_id, chunk["content_hash"], chunk["simhash"], chunk.get("symbol"))
+                    else:
+                        chunk["duplicate_of"] = canonical
+                        aliases[chunk_id] = (canonical, _location(chunk))
+            new_files[key] = {"mtime": mtime, "size": size, "sha256": digest, "ids": ids, **file_outline}
+            updated += 1
 
-    embeddings = model.encode([c["content"] for c in documents])
-    index = faiss.IndexFlatL2(embeddings.shape[1])
-    index.add(np.array(embeddings, dtype=np.float32))
-    chunks_list = documents
+            for chunk in chunks:
+                spill.add(chunk)
+            batch.extend(c for c in chunks if "duplicate_of" not in c)
+            while len(batch) >= EMBED_BATCH_SIZE:
+                self._embed_and_add(batch[:EMBED_BATCH_SIZE])
+                embedded_chunks += EMBED_BATCH_SIZE
+                batch = batch[EMBED_BATCH_SIZE:]
+                report(chunks_processed=embedded_chunks,
+                       chunks_per_sec=round(embedded_chunks / (time.perf_counter() - start), 1))
 
-    with open(CHUNK_FILE, "w", encoding="utf-8") as f:
-        json.dump(documents, f, indent=2)
+        if batch:
+            self._embed_and_add(batch)
+            embedded_chunks += len(batch)
+        report(chunks_processed=embedded_chunks,
+               chunks_per_sec=round(embedded_chunks / max(time.perf_counter() - start, 1e-9), 1))
+        spill.close()
+        new_chunks = ChunkStore(*self.build_chunk_files)
 
-    faiss.write_index(index, INDEX_FILE)
-    print(f"Indexed {len(documents)} chunks from {len(files)} files in {base_path}")
+        elapsed = max(time.perf_counter() - start, 1e-9)
 
-def load_faiss_index_and_chunks():
+        removed = [key for key in old_files if key not in new_files]
+        for key in removed:
+            stale_ids.extend(old_files[key]["ids"])
+
+        stats = {
+            "skipped": skipped,
+            "updated": updated,
+            "removed": len(removed),
+            "files_per_sec": round(parsed_files / elapsed, 1),
+            "chunks_per_sec": round(embedded_chunks / elapsed, 1),
+            "embedding_cache_hits": embedding_cache.hits - cache_before["hits"],
+            "embedding_cache_misses": embedding_cache.misses - cache_before["misses"],
+            "changed": bool(updated or removed) or old_store is None,
+        }
+
+        if old_store is not None and not stats["changed"]:
+            # Only mtimes moved (content hashes matched): keep serving the current build
+            self._stage_manifest(dict(manifest, files=new_files))
+            print(f"No changes in {base_path} ({skipped} files unchanged)")
+            return stats
+
+        if stale_ids and self.index is not None:
+            if vector_index.supports_remove(self.index):
+                self.index.remove_ids(np.array(stale_ids, dtype=np.int64))
+            else:
+                self.index = None  # HNSW cannot delete; rebuilt below from cached embeddings
+
+        if old_store is None and not new_chunks and not has_build:
+            print(" No chunks generated from code files.")
+            return
+
+        # Duplicates of a chunk that went away: the first remaining copy becomes canonical
+        # and gets the vector
+        stale = set(stale_ids)
+        members = defaultdict(list)
+        for chunk_id, (canonical, _) in aliases.items():
+            if chunk_id not in stale:
+                members[canonical].append(chunk_id)
+        promoted = {canonical: min(ids) for canonical, ids in members.items() if canonical in stale}
+        canonical_of = {chunk_id: promoted.get(canonical, canonical) for chunk_id, (canonical, _) in aliases.items()
+                        if chunk_id not in stale}
+        duplicates = defaultdict(list)
+        for chunk_id, canonical in canonical_of.items():
+            if canonical != chunk_id:
+                duplicates[canonical].append(aliases[chunk_id][1])
+        if promoted and self.index is not None:
+            self._embed_and_add([new_chunks[c] if c in new_chunks else old_store[c] for c in promoted.values()])
+
+        def annotate(chunk):
+            chunk.pop("duplicates", None)
+            canonical = canonical_of.get(chunk["id"], chunk["id"])
+            if canonical != chunk["id"]:
+                chunk["duplicate_of"] = canonical
+                return chunk
+            chunk.pop("duplicate_of", None)
+            if chunk["id"] in duplicates:
+                chunk["duplicates"] = duplicates[chunk["id"]]
+            return chunk
+
+        # Old ids are all below next_id at the start of this run, so the merged
+        # stream stays sorted by id.
+        report(stage="indexing")
+        self._stage_build_dir()
+        kept = (c for c in (old_store or ()) if c["id"] not in stale)
+        self._write_chunk_store(map(annotate, chain(kept, new_chunks)))
+        new_chunks.close()
+        self._rebuild_lexical_index()
+        self._build_symbol_index(new_files, base_path)
+
+        duplicate_count = sum(len(locations) for locations in duplicates.values())
+        stats["chunks"] = len(self.chunk_store)
+        stats["vectors"] = len(self.chunk_store) - duplicate_count
+        stats["duplicates"] = duplicate_count
+        # An emptied codebase gets an empty flat index (IVF types cannot be trained on nothing)
+        index_type = vector_index.choose_index_type(stats["vectors"]) if stats["vectors"] else "flat"
+        if self.index is None or vector_index.needs_rebuild(self.index, index_type):
+            self.index = _rebuild_index(self.chunk_store, index_type, stats["vectors"])
+
+        faiss.write_index(self.index, self.index_file)
+
+        version = uuid.uuid4().hex
+        self._stage_manifest({"next_id": next_id, "version": version, "files": new_files})
+        self._set_version(version)
+        print(f"Indexed {len(self.chunk_store)} chunks from {len(files)} files in {base_path} "
+              f"({skipped} skipped, {updated} updated, {len(removed)} removed)")
+        print(f"Ingest throughput: {stats['files_per_sec']} files/s, {stats['chunks_per_sec']} chunks/s")
+        print(f"Embedding cache: {stats['embedding_cache_hits']} hits, {stats['embedding_cache_misses']} misses")
+        if duplicate_count:
+            print(f"Deduplication: {duplicate_count} duplicate chunks share the vector of another copy "
+                  f"({stats['vectors']} vectors for {stats['chunks']} chunks)")
+        return stats
+
+    def load(self, use_mmap=INDEX_MMAP):
+        """
+        Opens the FAISS index and chunk store from disk.
+        With use_mmap the index is memory-mapped, so loading does not read it into RAM.
+        """
+        self._use_build_dir(current_build_dir(self.store_dir))
+        if not os.path.exists(self.index_file):
+            raise FileNotFoundError(f"Vector store of codebase {self.codebase_id} not found. "
+                                    "Run process_and_store_local_code() first.")
+        if not os.path.exists(self.chunk_offsets_file):
+            if not os.path.exists(self.legacy_chunk_file):
+                raise FileNotFoundError(f"Vector store of codebase {self.codebase_id} not found. "
+                                        "Run process_and_store_local_code() first.")
+            self._migrate_legacy_mapping()
+        else:
+            self._open_chunk_store()
+        self._load_lexical_index()
+
+        self.index = vector_index.apply_search_params(self._read_index(use_mmap))
+        manifest = self._load_manifest() or {}
+        self._set_version(manifest.get("version") or str(os.path.getmtime(self.index_file)))
+        print(f"FAISS {vector_index.index_type_of(self.index)} index and chunks of codebase "
+              f"{self.codebase_id} loaded for use.")
+        return self
+
+    def retrieve_batch(self, queries, ks, thresholds=None):
+        """
+        See retrieve_relevant_chunks_batch.
+        """
+        index, chunk_store, lexical_index = self.index, self.chunk_store, self.lexical_index
+        if index is None or chunk_store is None:
+            raise RuntimeError("FAISS index not initialized. Call process_and_store_local_code() first.")
+        if not len(chunk_store):
+            return [[] for _ in queries]  # every file of the codebase was deleted
+
+        thresholds = thresholds or [None] * len(queries)
+        hybrid = HYBRID_RETRIEVAL and lexical_index is not None
+        results = [None] * len(queries)
+        scores = [{} for _ in queries]
+        if hybrid:
+            for i, query in enumerate(queries):
+                if IDENTIFIER.fullmatch(query.strip()):
+                    with metrics.span("symbol_lookup"):
+                        results[i] = lexical_index.lookup_symbol(query.strip())[:ks[i]] or None
+                    scores[i] = dict.fromkeys(results[i] or [], 1.0)
+
+        pending = [i for i, ids in enumerate(results) if ids is None]
+        if pending:
+            depth = max(ks[i] for i in pending) * (HYBRID_CANDIDATES if hybrid else 1)
+            with metrics.span("embed_query"):
+                query_vecs = embed_queries([queries[i] for i in pending])
+            with metrics.span("vector_search"):
+                distances, indices = index.search(query_vecs, depth)
+            similarity = vector_index.similarities(index, distances)
+            fusion_start = time.perf_counter()
+            for n, i in enumerate(pending):
+                vector_ids = [int(chunk_id) for chunk_id in indices[n] if chunk_id >= 0]
+                scores[i] = {int(c): float(sim) for c, sim in zip(indices[n], similarity[n]) if c >= 0}
+                if not hybrid:
+                    results[i] = vector_ids[:ks[i]]
+                    continue
+                lexical_ids = [chunk_id for chunk_id, _ in lexical_index.search(queries[i], ks[i] * HYBRID_CANDIDATES)]
+                symbol_ids = [chunk_id for name in dict.fromkeys(IDENTIFIER.findall(queries[i]))
+                              for chunk_id in lexical_index.lookup_symbol(name)]
+                scores[i].update(dict.fromkeys(symbol_ids, 1.0))
+                results[i] = reciprocal_rank_fusion([symbol_ids, vector_ids, lexical_ids], ks[i], RRF_K)
+
+                # Lexical-only hits have no vector score yet; compare against their cached embeddings
+                unscored = [c for c in results[i] if c not in scores[i] and c in chunk_store]
+                if unscored:
+                    vectors = embed_texts([chunk_store[c]["content"] for c in unscored])
+                    scores[i].update(zip(unscored, (vectors @ query_vecs[n]).tolist()))
+            if hybrid:
+                metrics.record("hybrid_fusion", time.perf_counter() - fusion_start)
+
+        retrieved = []
+        for ids, score, threshold in zip(results, scores, thresholds):
+            chunks = []
+            for rank, chunk_id in enumerate(c for c in ids if c in chunk_store):
+                chunk_score = score.get(chunk_id, 0.0)
+                if threshold is not None and chunk_score < threshold and rank >= MIN_CONTEXT_CHUNKS:
+                    continue
+                chunk = _retrieved(chunk_store[chunk_id])
+                chunk["score"] = round(chunk_score, 4)
+                chunks.append(chunk)
+            RETRIEVED_CHUNKS.observe(len(chunks))
+            retrieved.append(chunks)
+        return retrieved
+
+
+registry = IndexRegistry(lambda codebase_id: CodebaseIndex(codebase_id).load(),
+                         MAX_RESIDENT_CODEBASES, RESIDENT_MEMORY_BUDGET_MB * 1024 * 1024)
+
+
+@metrics.collector
+def _cache_and_index_metrics():
+    query, embedding, resident = query_cache.stats(), embedding_cache.stats(), registry.stats()
+    codebases = registry.resident()
+    return [
+        ("rag_query_cache_total", "counter", "Answer cache lookups by result.", ("result",),
+         [(("hit",), query["hits"]), (("semantic_hit",), query["semantic_hits"]), (("miss",), query["misses"])]),
+        ("rag_embedding_cache_total", "counter", "Embedding cache lookups by result.", ("result",),
+         [(("hit",), embedding["hits"]), (("miss",), embedding["misses"])]),
+        ("rag_index_loads_total", "counter", "Codebase indexes loaded from disk.", (), [((), resident["loads"])]),
+        ("rag_index_evictions_total", "counter", "Codebase indexes evicted from memory.", (),
+         [((), resident["evictions"])]),
+        ("rag_index_vectors", "gauge", "Vectors in each resident codebase index.", ("codebase",),
+         [((codebase_id,), codebase.index.ntotal) for codebase_id, codebase in codebases if codebase.index is not None]),
+        ("rag_index_memory_bytes", "gauge", "Memory held by each resident codebase index.", ("codebase",),
+         [((codebase_id,), codebase.memory_bytes()) for codebase_id, codebase in codebases]),
+    ]
+
+
+def get_codebase(codebase_id=DEFAULT_CODEBASE):
+    """
+    Returns the loaded index of a codebase, loading it from disk if it is not resident.
+    """
+    validate_codebase_id(codebase_id)
+    return registry.get(codebase_id)
+
+
+def process_and_store_local_code(base_path=None, incremental=True, codebase_id=DEFAULT_CODEBASE, progress=None,
+                                 source_dir=None):
     """
-    Loads the FAISS index and chunk mapping from disk.
+    Processes the given codebase folder and stores FAISS index + chunk mapping
+    in the vector store of codebase_id. base_path defaults to the codebase's upload folder.
+    The new build is made next to the one being served and swapped in only when
+    complete, so queries never see a partial index; when no file content changed,
+    the served build (and its cached answers) stay as they are.
+    Files whose size/mtime or content hash match the manifest are skipped;
+    only added or changed files are re-embedded and vectors of deleted files are dropped.
+    Pass incremental=False to force a full rebuild.
+    Chunking runs in worker processes while embeddings are computed in
+    EMBED_BATCH_SIZE batches and added to the index as they arrive.
+    Afterwards the index is rebuilt if the chunk count calls for a different
+    index type (see vector_index.choose_index_type).
+    With DEDUP_CHUNKS, a chunk that duplicates an earlier one is stored with
+    "duplicate_of" but gets no vector or BM25 entry; the earlier chunk lists its
+    location under "duplicates".
+    With source_dir the files are read from there but indexed as if they were in
+    base_path (see CodebaseIndex.build).
     """
-    global index, chunks_list
-    if not os.path.exists(CHUNK_FILE) or not os.path.exists(INDEX_FILE):
-        raise FileNotFoundError("Vector store files not found. Run process_and_store_local_code() first.")
+    return _build_and_swap(codebase_id, base_path or codebase_source_dir(codebase_id), incremental, progress,
+                           source_dir=source_dir)
 
-    with open(CHUNK_FILE, "r", encoding="utf-8") as f:
-        chunks_list = json.load(f)
 
-    index = faiss.read_index(INDEX_FILE)
-    print("FAISS index and chunks loaded for use.")
+def process_zip_archive(zip_path, codebase_id=DEFAULT_CODEBASE, include=None,
+                        write_sources=UPLOAD_KEEP_SOURCES, incremental=True, progress=None, source_dir=None):
+    """
+    Indexes a zip archive of a codebase without extracting it first: each supported
+    member (accepted by include(name), within the ZIP_MAX_* limits) is read once and
+    its bytes go straight to chunking and embedding.
+    With write_sources the members are also written to the codebase's upload folder;
+    otherwise only the vector store is written. Chunk sources name the paths the
+    members would have there, so both modes produce the same index.
+    source_dir writes the members to another folder (e.g. a staging folder) instead.
+    """
+    with zipfile.ZipFile(zip_path) as archive:
+        return _build_and_swap(codebase_id, codebase_source_dir(codebase_id), incremental, progress,
+                               archive=archive, include=include, write_sources=write_sources,
+                               source_dir=source_dir)
 
-    return index, chunks_list
 
-def retrieve_relevant_chunks(query, k=5):
+def _build_and_swap(codebase_id, base_path, incremental, progress, **sources):
+    codebase = CodebaseIndex(codebase_id)
+    with _build_locks.setdefault(codebase_id, threading.Lock()):
+        stats = codebase.build(base_path, incremental, progress, **sources)
+        if stats is not None:
+            if progress:
+                progress(stage="committing")
+            registry.swap(codebase_id, codebase.commit, codebase if stats["changed"] else None)
+    return stats
+
+def load_faiss_index_and_chunks(use_mmap=INDEX_MMAP, codebase_id=DEFAULT_CODEBASE):
     """
-    Retrieves top-k relevant chunks for a given query.
+    Opens the FAISS index and chunk store of a codebase from disk and makes it resident.
+    With use_mmap the index is memory-mapped, so startup does not read it into RAM.
     """
-    global index, chunks_list
-    if index is None or not chunks_list:
-        raise RuntimeError("FAISS index not initialized. Call process_and_store_local_code() first.")
+    codebase = CodebaseIndex(codebase_id).load(use_mmap)
+    registry.put(codebase_id, codebase)
+    return codebase.index, codebase.chunk_store
 
-    query_vec = model.encode([query])
-    distances, indices = index.search(np.array(query_vec, dtype=np.float32), k)
-    return [chunks_list[i] for i in indices[0] if i < len(chunks_list)]
+def retrieve_relevant_chunks(query, k=5, similarity_threshold=None, codebase_id=DEFAULT_CODEBASE):
+    """
+    Retrieves top-k relevant chunks of a codebase for a given query.
+    Each chunk carries its cosine "score"; chunks scoring below similarity_threshold are dropped.
+    Chunks with copies elsewhere in the codebase list up to DEDUP_LISTED_LOCATIONS of them
+    under "duplicates" and their number as "duplicate_count".
+    """
+    return get_codebase(codebase_id).retrieve_batch([query], [k], [similarity_threshold])[0]
+
+def retrieve_relevant_chunks_batch(queries, ks, thresholds=None, codebase_ids=None):
+    """
+    Retrieves chunks for several queries with one encode call and one index search per codebase.
+    ks, thresholds and codebase_ids hold the top-k, similarity threshold and codebase of each query.
+    With HYBRID_RETRIEVAL, FAISS results are fused with BM25 and exact-symbol matches
+    by reciprocal rank; a query that is just a known symbol skips the embedder.
+    Exact symbol matches score 1.0; at least MIN_CONTEXT_CHUNKS chunks are always kept.
+    """
+    thresholds = thresholds or [None] * len(queries)
+    codebase_ids = codebase_ids or [DEFAULT_CODEBASE] * len(queries)
+    retrieved = [None] * len(queries)
+    for codebase_id in dict.fromkeys(codebase_ids):
+        group = [i for i, c in enumerate(codebase_ids) if c == codebase_id]
+        chunk_lists = get_codebase(codebase_id).retrieve_batch(
+            [queries[i] for i in group], [ks[i] for i in group], [thresholds[i] for i in group])
+        for i, chunks in zip(group, chunk_lists):
+            retrieved[i] = chunks
+    return retrieved
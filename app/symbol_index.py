@@ -0,0 +1,244 @@
+import json
+import os
+import posixpath
+import re
+import threading
+from collections import OrderedDict, defaultdict
+
+C_EXTENSIONS = {".c", ".h", ".cpp", ".hpp", ".cc", ".cxx"}
+
+# Import statements per extension; every pattern's groups are candidate targets
+IMPORTS = {
+    "c": re.compile(r'^[ \t]*#[ \t]*include[ \t]*[<"]([^>"\n]+)[>"]', re.M),
+    ".py": re.compile(r'^[ \t]*(?:from[ \t]+(\.*[\w.]*)[ \t]+import\b|import[ \t]+([\w., \t]+))', re.M),
+    ".js": re.compile(r'''(?:\bimport\b[^'"`;]*?\bfrom\s*|\bimport\s*\(?\s*|\brequire\s*\(\s*|\bexport\b[^'"`;]*?\bfrom\s*)['"]([^'"\n]+)['"]'''),
+    ".java": re.compile(r'^[ \t]*import[ \t]+(?:static[ \t]+)?([\w.]+?)(?:\.\*)?[ \t]*;', re.M),
+    ".go": re.compile(r'^[ \t]*import[ \t]*(?:\(([^)]*)\)|(?:[\w.]+[ \t]+)?"([^"\n]+)")', re.M),
+    ".cs": re.compile(r'^[ \t]*using[ \t]+(?:static[ \t]+)?([\w.]+)[ \t]*;', re.M),
+    ".php": re.compile(r'''^[ \t]*(?:(?:require|include)(?:_once)?[ \t(]*['"]([^'"\n]+)['"]|use[ \t]+([\w\\]+))''', re.M),
+    ".rb": re.compile(r'''^[ \t]*require(_relative)?[ \t(]*['"]([^'"\n]+)['"]''', re.M),
+    ".swift": re.compile(r'^[ \t]*import[ \t]+(?:\w+[ \t]+)?([\w.]+)', re.M),
+}
+IMPORTS[".ts"] = IMPORTS[".tsx"] = IMPORTS[".js"]
+GO_IMPORT_PATH = re.compile(r'"([^"\n]+)"')
+CLASS_DEFINITION = re.compile(
+    r'^[ \t]*(?:(?:export|default|public|private|protected|internal|abstract|final|static|sealed'
+    r'|partial|open|data|typedef)[ \t]+)*(?:class|struct|interface|enum|trait|protocol)[ \t]+([A-Za-z_]\w*)'
+    r'(?![\w \t]*;)', re.M)
+
+# Strings and comments are blanked out before looking for call sites
+NON_CODE = re.compile(r'//[^\n]*|#[^\n]*|/\*.*?(?:\*/|\Z)|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'', re.S)
+CALL = re.compile(r'([A-Za-z_]\w*)\s*\(')
+NOT_CALLS = {
+    "if", "for", "while", "switch", "return", "sizeof", "catch", "new", "delete", "elif", "and", "or",
+    "not", "in", "print", "assert", "defined", "typeof", "function", "def", "lambda", "with", "except",
+    "alignof", "decltype", "static_assert", "foreach", "using", "throw", "yield", "await", "super",
+}
+
+
+def _import_targets(code, ext):
+    """Import targets of one file as slash-separated paths; relative ones start with '.'."""
+    pattern = IMPORTS.get("c" if ext in C_EXTENSIONS else ext)
+    if pattern is None:
+        return []
+    targets = []
+    for groups in pattern.findall(code):
+        groups = groups if isinstance(groups, tuple) else (groups,)
+        if ext == ".py":
+            source, names = groups
+            if source:
+                dots = len(source) - len(source.lstrip("."))
+                module = source[dots:].replace(".", "/")
+                prefix = "./" + "../" * (dots - 1) if dots else ""
+                targets.append(prefix + module if module else prefix.rstrip("/") or ".")
+            else:
+                targets.extend(name.split()[0].replace(".", "/") for name in names.split(",") if name.strip())
+        elif ext == ".go":
+            block, single = groups
+            targets.extend(GO_IMPORT_PATH.findall(block) if block else [single])
+        elif ext == ".rb":
+            relative, target = groups
+            targets.append(("./" if relative and not target.startswith(".") else "") + target)
+        elif ext in (".java", ".cs", ".swift"):
+            targets.append(groups[0].replace(".", "/"))
+        elif ext == ".php":
+            targets.append(groups[0] or groups[1].replace("\\", "/"))
+        else:
+            targets.append(groups[0])
+    return list(dict.fromkeys(t for t in targets if t))
+
+
+def outline(code, source_path):
+    """
+    File-level facts the chunker does not keep: import targets and the classes
+    (name, 0-based line) the file defines. Stored per file in the manifest.
+    """
+    ext = os.path.splitext(source_path)[1].lower()
+    classes = [[m.group(1), code.count("\n", 0, m.start())] for m in CLASS_DEFINITION.finditer(code)]
+    return {"imports": _import_targets(code, ext), "classes": classes}
+
+
+def _suffixes(path):
+    parts = path.split("/")
+    return ["/".join(parts[i:]) for i in range(len(parts))]
+
+
+class _Resolver:
+    """
+    Maps import targets to files of the codebase: relative targets against the
+    importing file's folder, others by path suffix, with or without extension
+    (package __init__/index files also answer for their folder).
+    """
+
+    def __init__(self, paths):
+        self.by_path = {}
+        self.by_suffix = defaultdict(list)
+        for path in paths:
+            stem = os.path.splitext(path)[0]
+            names = [path, stem]
+            if posixpath.basename(stem) in ("__init__", "index", "mod"):
+                names.append(posixpath.dirname(stem))
+            for name in names:
+                self.by_path.setdefault(name, path)
+                for suffix in _suffixes(name):
+                    self.by_suffix[suffix].append(path)
+
+    def resolve(self, target, importer):
+        folder = posixpath.dirname(importer)
+        local = self.by_path.get(posixpath.normpath(posixpath.join(folder, target)))
+        if local or target.startswith("."):
+            return local
+        candidates = self.by_suffix.get(target.strip("/"))
+        if not candidates:
+            return None
+        # Several files end with the same path: take the one closest to the importer
+        return max(candidates, key=lambda p: len(os.path.commonprefix([folder + "/", p])))
+
+
+class SymbolIndex:
+    """
+    Codebase-wide symbol table: where every function and class is defined, which
+    files each file includes/imports, and which codebase functions each function calls.
+    Built once per ingestion from the chunk store and the manifest, saved next to the
+    FAISS index, and answers all lookups from dicts. Functions are keyed by their
+    unqualified name (Foo::bar is "bar"), so calls resolve without type information.
+    Rendered diagrams are memoized per index; a new build gets a fresh cache.
+    """
+
+    def __init__(self, data, cache_entries=256):
+        self.files = data["files"]
+        self.definitions = data["definitions"]
+        self.classes = data["classes"]
+        self.calls = data["calls"]
+        self.included_by = defaultdict(list)
+        for path, info in self.files.items():
+            for target in info["includes"]:
+                self.included_by[target].append(path)
+        self.callers = defaultdict(list)
+        for caller, callees in self.calls.items():
+            for callee, _, _ in callees:
+                self.callers[callee].append(caller)
+        self.cache_entries = cache_entries
+        self._diagrams = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, chunks, files, base_path, **params):
+        """
+        Builds the index from an iterable of chunk dicts and the manifest's file entries
+        (keys relative to base_path, carrying the "imports"/"classes" from outline()).
+        """
+        from app.utils import symbol_from_signature  # app.utils imports this module
+        paths = {key: key.replace(os.sep, "/") for key in files}
+        resolver = _Resolver(paths.values())
+        index_files = {}
+        classes = defaultdict(list)
+        for key, entry in files.items():
+            path = paths[key]
+            includes = (resolver.resolve(target, path) for target in entry.get("imports", ()))
+            index_files[path] = {"includes": sorted({p for p in includes if p and p != path}), "functions": []}
+            for name, line in entry.get("classes", ()):
+                classes[name].append([path, line])
+
+        definitions = {}
+        bodies = []
+        for chunk in chunks:
+            symbol = chunk.get("symbol") or symbol_from_signature(chunk.get("signature"))
+            if not symbol or "(" not in (chunk.get("signature") or ""):
+                continue
+            name = symbol.rsplit("::", 1)[-1]
+            path = os.path.relpath(chunk["source"], base_path).replace(os.sep, "/")
+            places = definitions.setdefault(name, [])
+            for place in places:
+                if place[0] == path and place[1] <= chunk["start_line"] <= place[2] + 1:
+                    # A later part of a function split into several chunks
+                    place[2] = max(place[2], chunk["end_line"])
+                    place[3].append(chunk["id"])
+                    break
+            else:
+                places.append([path, chunk["start_line"], chunk["end_line"], [chunk["id"]]])
+                if path in index_files:
+                    index_files[path]["functions"].append(name)
+            bodies.append((name, path, chunk))
+
+        calls = defaultdict(dict)
+        for name, path, chunk in bodies:
+            content = chunk["content"]
+            # Skip the signature so a function's own name is not a call
+            if path.endswith(".py"):
+                body_start = content.find(":\n") + 1 or content.find("\n") + 1
+            else:
+                body_start = content.find("{") + 1 or content.find("\n") + 1
+            code = NON_CODE.sub(lambda m: re.sub(r"[^\n]", " ", m.group()), content[body_start:])
+            found = calls[name]
+            for match in CALL.finditer(code):
+                callee = match.group(1)
+                if callee in definitions and callee not in NOT_CALLS and callee not in found:
+                    line = chunk["start_line"] + content.count("\n", 0, body_start + match.start())
+                    found[callee] = [callee, line, path]
+        return cls({
+            "files": index_files,
+            "definitions": definitions,
+            "classes": dict(classes),
+            "calls": {name: list(found.values()) for name, found in calls.items() if found},
+        }, **params)
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files, "definitions": self.definitions,
+                       "classes": self.classes, "calls": self.calls}, f)
+
+    @classmethod
+    def load(cls, path, **params):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), **params)
+
+    def lookup(self, name):
+        """(path, start_line, end_line, chunk ids) of every definition of function `name`."""
+        return self.definitions.get(name.rsplit("::", 1)[-1], [])
+
+    def callees(self, name):
+        return [callee for callee, _, _ in self.calls.get(name, ())]
+
+    def memoize(self, key, render):
+        """Returns render(), computed once per key for this build of the index."""
+        with self._lock:
+            if key in self._diagrams:
+                self._diagrams.move_to_end(key)
+                return self._diagrams[key]
+        text = render()
+        with self._lock:
+            self._diagrams[key] = text
+            while len(self._diagrams) > self.cache_entries:
+                self._diagrams.popitem(last=False)
+        return text
+
+    def stats(self):
+        return {
+            "files": len(self.files),
+            "functions": len(self.definitions),
+            "classes": len(self.classes),
+            "include_edges": sum(len(info["includes"]) for info in self.files.values()),
+            "call_edges": sum(len(callees) for callees in self.calls.values()),
+            "memoized_diagrams": len(self._diagrams),
+        }
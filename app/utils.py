@@ -1,10 +1,50 @@
 import re
+import hashlib
+
+from app.chunker import chunk_code
+from app.symbol_index import outline
 
 FUNC_SIGNATURE = re.compile(
     r'^[a-zA-Z_][\w\s\*\[\],]*\([^)]*\)\s*\{?'
 )
+IDENTIFIER = re.compile(r'[A-Za-z_]\w*(?:::~?[A-Za-z_]\w*)*')
+SUBTOKEN = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+')
+MAX_TOKEN_LENGTH = 64
+
+def symbol_from_signature(signature):
+    """
+    Returns the (possibly qualified) function name of a chunk signature, or None.
+    """
+    if not signature or signature == "fallback" or "(" not in signature:
+        return None
+    names = IDENTIFIER.findall(signature.split("(", 1)[0])
+    return names[-1] if names else None
+
+def tokenize_code(text):
+    """
+    Lower-cased lexical terms of a piece of code or a question: every identifier,
+    the parts of qualified names, and camelCase/snake_case sub-words.
+    """
+    terms = []
+    for ident in IDENTIFIER.findall(text):
+        if len(ident) > MAX_TOKEN_LENGTH:
+            continue
+        terms.append(ident.lower())
+        parts = SUBTOKEN.findall(ident)
+        if len(parts) > 1:
+            terms.extend(part.lower() for part in parts)
+    return terms
 
 def extract_code_chunks(code, source_path):
+    """
+    Splits a source file into function-level chunks (see app.chunker.chunk_code).
+    """
+    return chunk_code(code, source_path)
+
+def extract_code_chunks_regex(code, source_path):
+    """
+    Previous line-by-line regex chunker, kept as the baseline for benchmarks/chunker.py.
+    """
     chunks = []
     lines = code.splitlines()
     i = 0
@@ -31,7 +71,8 @@ def extract_code_chunks(code, source_path):
                     "content": "\n".join(buffer),
                     "source": source_path,
                     "start_line": start_line,
-                    "signature": signature
+                    "signature": signature,
+                    "symbol": symbol_from_signature(signature)
                 })
                 i = j
             else:
@@ -51,3 +92,30 @@ def extract_code_chunks(code, source_path):
                     "signature": "fallback"
                 })
     return chunks
+
+
+def parse_code_bytes(raw, source_path, known_digest=None):
+    """
+    Chunks the raw bytes of one source file; runs inside ingestion worker processes.
+    Returns (sha256, chunks, outline, error), outline being the file's imports and classes
+    (see app.symbol_index.outline). chunks and outline are None when the content hash
+    equals known_digest.
+    """
+    digest = hashlib.sha256(raw).hexdigest()
+    if digest == known_digest:
+        return digest, None, None, None
+    code = raw.decode("utf-8", errors="ignore")
+    return digest, extract_code_chunks(code, source_path), outline(code, source_path), None
+
+
+def parse_code_file(filepath, known_digest=None, source_path=None):
+    """
+    Reads and chunks one file; see parse_code_bytes. Chunks name source_path
+    (default filepath) as their source.
+    """
+    try:
+        with open(filepath, "rb") as f:
+            raw = f.read()
+    except Exception as e:
+        return None, None, None, str(e)
+    return parse_code_bytes(raw, source_path or filepath, known_digest)
@@ -0,0 +1,167 @@
+import math
+import time
+
+import numpy as np
+import faiss
+
+from app.config import *
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+
+def choose_index_type(num_vectors):
+    """
+    Picks the FAISS index type for a corpus of num_vectors vectors.
+    INDEX_TYPE in config overrides the size-based policy unless it is "auto"; a forced
+    IVF-PQ index falls back to flat while there are fewer vectors than PQ training needs.
+    """
+    if INDEX_TYPE == "auto":
+        if num_vectors <= INDEX_AUTO_FLAT_MAX:
+            return "flat"
+        if num_vectors <= INDEX_AUTO_IVF_FLAT_MAX:
+            return "ivf_flat"
+        return "ivf_pq"
+    if INDEX_TYPE == "ivf_pq" and num_vectors < (1 << PQ_NBITS):
+        return "flat"
+    return INDEX_TYPE
+
+
+def _nlist_for(num_vectors):
+    # ~4*sqrt(n) lists, capped so every list gets enough training points
+    return max(1, min(IVF_NLIST or int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+
+
+def _pq_m_for(dim):
+    return max(m for m in range(1, PQ_M + 1) if dim % m == 0)
+
+
+def create_index(index_type, dim, num_vectors):
+    """
+    Creates an empty, untrained id-mapped inner-product index of the given type.
+    Vectors are L2-normalized, so scores are cosine similarities.
+    """
+    metric = faiss.METRIC_INNER_PRODUCT
+    if index_type == "flat":
+        inner = faiss.IndexFlatIP(dim)
+    elif index_type == "hnsw":
+        inner = faiss.IndexHNSWFlat(dim, HNSW_M, metric)
+        inner.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif index_type == "ivf_flat":
+        inner = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, _nlist_for(num_vectors), metric)
+    elif index_type == "ivf_pq":
+        inner = faiss.IndexIVFPQ(faiss.IndexFlatIP(dim), dim, _nlist_for(num_vectors),
+                                 _pq_m_for(dim), PQ_NBITS, metric)
+    else:
+        raise ValueError(f"Unknown index type '{index_type}'. Expected one of {INDEX_TYPES}.")
+    return faiss.IndexIDMap2(inner)
+
+
+def _inner(index):
+    return faiss.downcast_index(index.index if hasattr(index, "id_map") else index)
+
+
+def index_type_of(index):
+    inner = _inner(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def needs_rebuild(index, index_type):
+    """
+    True when index is not of index_type or still uses the old L2 metric.
+    """
+    return index_type_of(index) != index_type or index.metric_type != faiss.METRIC_INNER_PRODUCT
+
+
+def similarities(index, distances):
+    """
+    Converts search distances to cosine similarities.
+    Indexes built before the switch to inner product return squared L2 distances
+    between unit vectors, where cos = 1 - d / 2.
+    """
+    if index.metric_type == faiss.METRIC_L2:
+        return 1 - distances / 2
+    return distances
+
+
+def supports_remove(index):
+    return index_type_of(index) != "hnsw"
+
+
+def train_sample_size(index):
+    inner = _inner(index)
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return max(inner.nlist * IVF_TRAIN_POINTS_PER_LIST, (1 << PQ_NBITS) * 39)
+    if isinstance(inner, faiss.IndexIVF):
+        return inner.nlist * IVF_TRAIN_POINTS_PER_LIST
+    return 0
+
+
+def apply_search_params(index, nprobe=None, ef_search=None):
+    """
+    Sets the query-time knobs: nprobe for IVF indexes, efSearch for HNSW.
+    """
+    inner = _inner(index)
+    if isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = nprobe or IVF_NPROBE
+    elif isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = ef_search or HNSW_EF_SEARCH
+    return index
+
+
+def build_index(index_type, vectors, ids=None):
+    """
+    Builds and trains an index of index_type over an in-memory matrix of vectors.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    if ids is None:
+        ids = np.arange(len(vectors), dtype=np.int64)
+    index = create_index(index_type, vectors.shape[1], len(vectors))
+    if not index.is_trained:
+        sample = np.random.default_rng(0).permutation(len(vectors))[:train_sample_size(index)]
+        index.train(vectors[sample])
+    index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+    return apply_search_params(index)
+
+
+def compare_recall(vectors, queries, k=10, configs=None):
+    """
+    Measures recall@k and mean search latency of ANN configurations against exact flat search.
+    configs is a list of (index_type, {"nprobe": .., "ef_search": ..}) pairs.
+    """
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    faiss.normalize_L2(queries)
+    if configs is None:
+        configs = [(t, {}) for t in INDEX_TYPES if t != "flat"]
+
+    exact = build_index("flat", vectors)
+    _, truth = exact.search(queries, k)
+
+    results = []
+    built = {}
+    for index_type, params in configs:
+        if index_type not in built:
+            start = time.perf_counter()
+            built[index_type] = (build_index(index_type, vectors), time.perf_counter() - start)
+        index, build_seconds = built[index_type]
+        apply_search_params(index, **params)
+
+        start = time.perf_counter()
+        _, found = index.search(queries, k)
+        search_seconds = time.perf_counter() - start
+
+        hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+        results.append({
+            "index_type": index_type,
+            **params,
+            "recall_at_k": round(hits / (len(queries) * k), 4),
+            "build_seconds": round(build_seconds, 3),
+            "search_ms_per_query": round(1000 * search_seconds / len(queries), 4),
+        })
+    return results
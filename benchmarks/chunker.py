@@ -0,0 +1,80 @@
+"""
+Chunking throughput of app.chunker.chunk_code against the previous regex chunker.
+
+    python -m benchmarks.chunker                      # synthetic generated C file
+    python -m benchmarks.chunker path/to/file.c ...   # real files
+
+The regex chunker is the faster of the two in MB/s (the structural chunker ran at
+0.87x on the synthetic file, 0.62x on 1000 C files and 0.37x on 1500 JS files), but it
+counts braces inside strings and comments and misses most non-C definitions: on the
+synthetic file it returns the whole 3 MB as one chunk.
+"""
+import argparse
+import json
+import time
+
+from app.utils import extract_code_chunks, extract_code_chunks_regex
+
+
+def synthetic_c_source(functions=5000, statements=12):
+    """
+    A large generated-style C file: many functions, string literals and
+    comments containing braces, long initializer tables.
+    """
+    parts = ['#include <stdio.h>\n', 'static const int table[] = {\n']
+    parts += [f"    {i}, {i * 3}, {i * 7},\n" for i in range(2000)]
+    parts.append('};\n\n')
+    for f in range(functions):
+        parts.append(f"/* generated helper {f} {{ see spec }} */\n")
+        parts.append(f"int generated_fn_{f}(int a, const char *s)\n{{\n")
+        for s in range(statements):
+            parts.append(f'    if (a > {s}) {{ printf("}}{{ %d\\n", a); }} // {{\n')
+        parts.append("    return a;\n}\n\n")
+    return "".join(parts)
+
+
+def measure(chunker, sources, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = [c for path, code in sources for c in chunker(code, path)]
+        best = min(best, time.perf_counter() - start)
+    sizes = [len(c["content"]) for c in chunks]
+    total_bytes = sum(len(code) for _, code in sources)
+    return {
+        "seconds": round(best, 4),
+        "chunks": len(chunks),
+        "chunks_per_sec": round(len(chunks) / best, 1),
+        "mb_per_sec": round(total_bytes / best / 1e6, 2),
+        "max_chunk_chars": max(sizes, default=0),
+        "mean_chunk_chars": round(sum(sizes) / len(sizes), 1) if sizes else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*")
+    parser.add_argument("--functions", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.paths:
+        sources = []
+        for path in args.paths:
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                sources.append((path, f.read()))
+    else:
+        sources = [("generated.c", synthetic_c_source(args.functions))]
+
+    regex = measure(extract_code_chunks_regex, sources, args.repeat)
+    current = measure(extract_code_chunks, sources, args.repeat)
+    print(json.dumps({
+        "files": len(sources),
+        "regex_chunker": regex,
+        "chunker": current,
+        "speedup": round(regex["seconds"] / current["seconds"], 2) if current["seconds"] else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Index size and ingest cost with and without chunk deduplication.
+
+    python -m benchmarks.dedup                          # generated corpus with vendored copies
+    python -m benchmarks.dedup --vendored 0.5 --edited 0.5
+    python -m benchmarks.dedup ~/src/repo-a ~/src/repo-b
+
+Each corpus is ingested from scratch twice, with DEDUP_CHUNKS off and on, each with
+its own empty embedding cache. Reports chunks, vectors, texts sent to the model,
+ingest seconds, the on-disk size of the FAISS index, chunk store and BM25 index, and
+how many of the top-k results of a query repeat an earlier result (same text up to
+whitespace). Without paths, the corpus is the e2e benchmark's generated C/C++ code
+plus --vendored of its files copied under vendor/, --edited of those copies with two
+constants changed in every function (near-duplicates).
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.e2e import synthetic_corpus, query_set
+
+
+def vendor_copies(root, fraction, edited, seed=0):
+    """Copies fraction of the files under root into root/vendor/, editing the `edited` share of the copies."""
+    rng = random.Random(seed + 2)
+    paths = sorted(os.path.relpath(os.path.join(d, f), root) for d, _, names in os.walk(root) for f in names)
+    copies = rng.sample(paths, int(len(paths) * fraction))
+    for n, path in enumerate(copies):
+        with open(os.path.join(root, path), "r", encoding="utf-8") as f:
+            code = f.read()
+        if n < len(copies) * edited:
+            code = code.replace("% 997", "% 1009").replace("int acc = 0;", "int acc = 1;")
+        target = os.path.join(root, "vendor", path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(code)
+    return len(copies)
+
+
+def redundant_results(codebase, queries, k):
+    """Mean number of top-k results per query whose text repeats a higher-ranked result."""
+    from app.dedup import fingerprint
+    counts = []
+    for query in queries:
+        hashes = [fingerprint(c["content"])[0] for c in codebase.retrieve_batch([query], [k])[0]]
+        counts.append(len(hashes) - len(set(hashes)))
+    return round(float(np.mean(counts)), 3) if counts else None
+
+
+def ingest(rag_pipeline, corpus, codebase_id, dedup):
+    from app.embedding_cache import EmbeddingCache
+    from app.embedding_backend import embedding_model_id
+    rag_pipeline.DEDUP_CHUNKS = dedup
+    rag_pipeline.embedding_cache = EmbeddingCache(f"{codebase_id}_embeddings.sqlite",
+                                                  embedding_model_id(rag_pipeline.EMBED_MODEL_NAME,
+                                                                     rag_pipeline.EMBED_BACKEND),
+                                                  rag_pipeline.EMBED_CACHE_MAX_ENTRIES)
+    start = time.perf_counter()
+    stats = rag_pipeline.process_and_store_local_code(base_path=corpus, incremental=False, codebase_id=codebase_id)
+    seconds = time.perf_counter() - start
+    codebase = rag_pipeline.get_codebase(codebase_id)
+    files = {"index_bytes": codebase.index_file, "lexical_index_bytes": codebase.lexical_index_file,
+             "chunk_store_bytes": codebase.chunk_blob_file}
+    return codebase, {
+        "chunks": stats["chunks"],
+        "vectors": stats["vectors"],
+        "embedded_texts": stats["embedding_cache_misses"],
+        "ingest_seconds": round(seconds, 2),
+        **{name: os.path.getsize(path) for name, path in files.items()},
+    }
+
+
+def symbol_queries(codebase, count, seed=0):
+    """Questions about count functions of an indexed codebase."""
+    symbols = sorted({c["symbol"] for c in codebase.chunk_store if c.get("symbol")})
+    picked = random.Random(seed).sample(symbols, min(count, len(symbols)))
+    return [f"how does {symbol.replace('_', ' ')} work" for symbol in picked]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="codebases to measure (default: a generated corpus)")
+    parser.add_argument("--files", type=int, default=300)
+    parser.add_argument("--functions", type=int, default=10)
+    parser.add_argument("--vendored", type=float, default=0.3, help="share of files copied under vendor/")
+    parser.add_argument("--edited", type=float, default=0.5, help="share of the copies that are edited")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    corpora = [os.path.abspath(p) for p in args.paths]
+
+    scratch = tempfile.mkdtemp(prefix="dedup_bench_")
+    os.chdir(scratch)  # vector stores and embedding caches go to the scratch directory
+    from app import rag_pipeline
+
+    results = {}
+    queries = {}
+    if not corpora:
+        corpus = os.path.join(scratch, "corpus")
+        defined = synthetic_corpus(corpus, args.files, args.functions, 12, args.seed)
+        copied = vendor_copies(corpus, args.vendored, args.edited, args.seed)
+        corpora = [corpus]
+        queries[corpus] = [q["query"] for q in query_set(defined, args.queries, args.seed)]
+        results["generated"] = {"files": args.files, "vendored_copies": copied}
+    for n, corpus in enumerate(corpora):
+        baseline_index, baseline = ingest(rag_pipeline, corpus, f"corpus{n}-baseline", dedup=False)
+        dedup_index, dedup = ingest(rag_pipeline, corpus, f"corpus{n}-dedup", dedup=True)
+        questions = queries.get(corpus) or symbol_queries(baseline_index, args.queries, args.seed)
+        baseline[f"redundant_results@{args.k}"] = redundant_results(baseline_index, questions, args.k)
+        dedup[f"redundant_results@{args.k}"] = redundant_results(dedup_index, questions, args.k)
+        reduction = {name: f"{1 - dedup[name] / baseline[name]:.1%}" if baseline[name] else None
+                     for name in ("vectors", "embedded_texts", "index_bytes", "lexical_index_bytes",
+                                  "chunk_store_bytes")}
+        results[corpus] = {"baseline": baseline, "dedup": dedup, "reduction": reduction}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+End-to-end benchmark: ingest, retrieval and generation on a generated C/C++ corpus.
+
+    python -m benchmarks.e2e                                   # 200 files, no generation
+    python -m benchmarks.e2e --files 2000 --functions 20 --output runs/$(date +%s).json
+    python -m benchmarks.e2e --generate 5 --max-new-tokens 64  # also time the LLM
+
+The corpus is generated from --seed, so runs with the same arguments index the same
+code and ask the same questions. Every function has a unique
+"<verb> the <noun> <noun>" description in its comment; queries ask for a function
+either by that description or by name, and the function's chunk is the known
+relevant result. Everything runs in a scratch directory with its own vector store
+and embedding cache, i.e. from a cold start.
+
+Reports chunking, embedding and ingest throughput, build time / search latency
+(p50/p95/p99) / recall@k per FAISS index type, the same for the full retrieval path
+(retrieve_relevant_chunks), prefill and decode tokens/s, and peak RSS (None on Windows),
+as one JSON document (also written to --output) that can be compared across runs.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is reported as None
+    resource = None
+
+VERBS = ["parse", "encode", "decode", "validate", "compress", "hash", "allocate", "release", "serialize",
+         "schedule", "flush", "merge", "split", "resolve", "normalize", "render", "verify", "rotate",
+         "sort", "sample"]
+NOUNS = ["packet", "buffer", "header", "checksum", "socket", "frame", "matrix", "vector", "string", "token",
+         "session", "cache", "queue", "timer", "config", "record", "index", "stream", "texture", "ledger"]
+QUALIFIERS = ["", "cached", "async", "legacy", "secure", "fast", "raw", "batched", "shared", "local"]
+
+
+def _descriptions(rng):
+    """Unique (qualifier, verb, noun, noun) combinations in a seed-dependent order."""
+    combos = [(v, a, b) for v in VERBS for a in NOUNS for b in NOUNS if a != b]
+    rng.shuffle(combos)
+    for qualifier in QUALIFIERS:
+        for verb, a, b in combos:
+            yield qualifier, verb, a, b
+
+
+def synthetic_corpus(root, files, functions, statements, seed=0):
+    """
+    Writes files .c/.cpp/.h sources of functions functions with about statements
+    statements each under root. Returns [(relative path, function name, description)]
+    for every generated function.
+    """
+    rng = random.Random(seed)
+    descriptions = _descriptions(rng)
+    defined = []
+    for f in range(files):
+        ext = (".c", ".cpp", ".h")[f % 3]
+        path = os.path.join(f"module_{f % 25}", f"unit_{f}{ext}")
+        lines = ['#include <stdio.h>', f'#include "unit_{max(f - 1, 0)}.h"', '']
+        if ext == ".cpp":
+            lines.append(f"namespace bench_{f} {{")
+        for _ in range(functions):
+            qualifier, verb, a, b = next(descriptions)
+            name = "_".join(w for w in (verb, qualifier, a, b) if w) + f"_{len(defined)}"
+            description = " ".join(w for w in (verb, "the", qualifier, a, b) if w)
+            lines.append(f"/* {description.capitalize()} and report the status. */")
+            if ext == ".h":
+                lines += [f"static inline int {name}(int value)", "{", f"    return value * {len(defined) % 7 + 1};", "}", ""]
+            else:
+                lines += [f"int {name}(int value, const char *label)", "{", "    int acc = 0;"]
+                for s in range(statements):
+                    callee = defined[rng.randrange(len(defined))][1] if defined and s % 4 == 0 else None
+                    if callee:
+                        lines.append(f"    acc += {callee}(value + {s}, label);")
+                    elif s % 3 == 0:
+                        lines.append(f'    if (acc > {s * 13}) {{ printf("%s {a} %d\\n", label, acc); }}')
+                    else:
+                        lines.append(f"    acc = (acc * {s + 3} + value) % {997 + s};")
+                lines += ["    return acc;", "}", ""]
+            defined.append((path, name, description))
+        if ext == ".cpp":
+            lines.append(f"}}  // namespace bench_{f}")
+        full = os.path.join(root, path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, "w", encoding="utf-8") as out:
+            out.write("\n".join(lines) + "\n")
+    return defined
+
+
+def query_set(defined, count, seed=0):
+    """
+    Fixed queries with their relevant function: half by description, half by name.
+    Only .c/.cpp functions are asked for (header functions call nothing and all look alike).
+    """
+    rng = random.Random(seed + 1)
+    candidates = [d for d in defined if not d[0].endswith(".h")]
+    picks = rng.sample(candidates, min(count, len(candidates)))
+    queries = []
+    for n, (path, name, description) in enumerate(picks):
+        text = f"which function does {description}" if n % 2 == 0 else f"where is {name} defined"
+        queries.append({"query": text, "kind": "description" if n % 2 == 0 else "symbol",
+                        "path": path, "function": name})
+    return queries
+
+
+def percentiles(seconds):
+    ms = np.array(seconds) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(ms, p)), 3) for p in (50, 95, 99)} if len(ms) else {}
+
+
+def recall(ranked_ids, relevant_ids, ks):
+    return {f"recall@{k}": round(float(np.mean([bool(set(r[:k]) & rel) for r, rel in zip(ranked_ids, relevant_ids)])), 4)
+            for k in ks}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--functions", type=int, default=10, help="functions per file")
+    parser.add_argument("--statements", type=int, default=12, help="statements per function")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--index-types", nargs="+", default=["flat", "hnsw", "ivf_flat", "ivf_pq"])
+    parser.add_argument("--embed-sample", type=int, default=2000, help="chunks timed for embedding throughput")
+    parser.add_argument("--generate", type=int, default=0, help="questions answered by the LLM")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+
+    scratch = tempfile.mkdtemp(prefix="e2e_bench_")
+    os.chdir(scratch)  # the vector store and embedding cache paths in app.config are relative
+    from app import config, rag_pipeline, vector_index, llm_module
+    from app.chunker import chunk_code
+
+    max_k = max(args.k)
+    result = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+            "config": {name: getattr(config, name) for name in (
+                "EMBED_MODEL_NAME", "EMBED_BACKEND", "EMBED_BATCH_SIZE", "INDEX_TYPE", "HYBRID_RETRIEVAL",
+                "MODEL_NAME", "LLM_DTYPE", "LLM_PREFIX_CACHE")},
+        },
+    }
+
+    # Corpus
+    corpus_dir = os.path.join(scratch, "corpus")
+    defined = synthetic_corpus(corpus_dir, args.files, args.functions, args.statements, args.seed)
+    queries = query_set(defined, args.queries, args.seed)
+    sources = []
+    for path in sorted({d[0] for d in defined}):
+        with open(os.path.join(corpus_dir, path), "r", encoding="utf-8") as f:
+            sources.append((os.path.join(corpus_dir, path), f.read()))
+    total_bytes = sum(len(code) for _, code in sources)
+    result["corpus"] = {"files": len(sources), "functions": len(defined), "mb": round(total_bytes / 1e6, 2),
+                        "queries": len(queries)}
+
+    # Chunking (single process)
+    start = time.perf_counter()
+    chunks = [c for path, code in sources for c in chunk_code(code, path)]
+    seconds = time.perf_counter() - start
+    result["chunking"] = {"seconds": round(seconds, 3), "chunks": len(chunks),
+                          "files_per_sec": round(len(sources) / seconds, 1),
+                          "chunks_per_sec": round(len(chunks) / seconds, 1),
+                          "mb_per_sec": round(total_bytes / seconds / 1e6, 2)}
+
+    # Embedding (model only, no cache)
+    encoder = rag_pipeline.get_encoder()
+    sample = [c["content"] for c in chunks[:args.embed_sample]]
+    encoder.encode(sample[:8], normalize=True)  # first call pays one-off setup
+    before = encoder.stats()
+    start = time.perf_counter()
+    encoder.encode(sample, normalize=True)
+    seconds = time.perf_counter() - start
+    after = encoder.stats()
+    result["embedding"] = {"texts": len(sample), "seconds": round(seconds, 3),
+                           "texts_per_sec": round(len(sample) / seconds, 1),
+                           "tokens_per_sec": round((after["tokens"] - before["tokens"]) / seconds, 1)}
+
+    # Ingest (parse in worker processes, embed, build and swap in the index)
+    start = time.perf_counter()
+    stats = rag_pipeline.process_and_store_local_code(base_path=corpus_dir, incremental=False, codebase_id="bench")
+    codebase = rag_pipeline.get_codebase("bench")
+    result["ingest"] = {"seconds": round(time.perf_counter() - start, 3), "files_per_sec": stats["files_per_sec"],
+                        "chunks_per_sec": stats["chunks_per_sec"],
+                        "index_type": vector_index.index_type_of(codebase.index)}
+
+    # Relevant chunk ids of every query
+    store = codebase.chunk_store
+    by_function = {}
+    for chunk in store:
+        by_function.setdefault((os.path.relpath(chunk["source"], corpus_dir), chunk.get("symbol")), set()).add(chunk["id"])
+    relevant = [by_function.get((q["path"], q["function"]), set()) for q in queries]
+
+    # FAISS index types: build time, single-query latency, recall of the relevant chunk
+    ids = np.array([c["id"] for c in store], dtype=np.int64)
+    vectors = rag_pipeline.embed_texts([c["content"] for c in store])
+    query_vectors = rag_pipeline.embed_queries([q["query"] for q in queries])
+    result["index"] = {}
+    for index_type in args.index_types:
+        try:
+            start = time.perf_counter()
+            index = vector_index.build_index(index_type, vectors, ids)
+            build_seconds = time.perf_counter() - start
+        except Exception as e:
+            result["index"][index_type] = {"error": str(e)}
+            continue
+        latencies, ranked = [], []
+        for vector in query_vectors:
+            start = time.perf_counter()
+            _, found = index.search(vector[None, :], max_k)
+            latencies.append(time.perf_counter() - start)
+            ranked.append([int(i) for i in found[0]])
+        result["index"][index_type] = {"build_seconds": round(build_seconds, 3), **percentiles(latencies),
+                                       **recall(ranked, relevant, args.k)}
+
+    # Full retrieval path: query embedding, FAISS, BM25 and symbol lookup, fusion
+    rag_pipeline.retrieve_relevant_chunks(queries[0]["query"], k=max_k, codebase_id="bench")
+    latencies, ranked = [], []
+    for q in queries:
+        start = time.perf_counter()
+        found = rag_pipeline.retrieve_relevant_chunks(q["query"], k=max_k, codebase_id="bench")
+        latencies.append(time.perf_counter() - start)
+        ranked.append([c["id"] for c in found])
+    result["retrieval"] = {**percentiles(latencies), **recall(ranked, relevant, args.k)}
+    for kind in ("description", "symbol"):
+        picked = [n for n, q in enumerate(queries) if q["kind"] == kind]
+        result["retrieval"][kind] = recall([ranked[n] for n in picked], [relevant[n] for n in picked], args.k)
+
+    # Generation: prefill and decode throughput from the LLM's own counters
+    if args.generate:
+        try:
+            llm_module.warmup()
+            before = llm_module.llm_stats()
+            for q in queries[:args.generate]:
+                found = rag_pipeline.retrieve_relevant_chunks(q["query"], k=5, codebase_id="bench")
+                llm_module.generate_answer(q["query"], found, temperature=0, max_new_tokens=args.max_new_tokens)
+            after = llm_module.llm_stats()
+            delta = {key: after[key] - before[key] for key in
+                     ("generations", "prompt_tokens", "cached_prompt_tokens", "new_tokens",
+                      "prefill_seconds", "decode_seconds")}
+            result["generation"] = {
+                **{key: round(value, 3) for key, value in delta.items()},
+                "prefill_tokens_per_sec": round((delta["prompt_tokens"] - delta["cached_prompt_tokens"])
+                                                / delta["prefill_seconds"], 1) if delta["prefill_seconds"] else None,
+                "decode_tokens_per_sec": round(delta["new_tokens"] / delta["decode_seconds"], 1)
+                if delta["decode_seconds"] else None,
+            }
+        except Exception as e:
+            result["generation"] = {"error": str(e)}
+
+    result["peak_rss_mb"] = (round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+                             if resource else None)
+    text = json.dumps(result, indent=2)
+    if output:
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Parity and speed of the quantized embedding backends against the fp32 model.
+
+    python -m benchmarks.embedding_parity                        # torch_int8 and onnx
+    python -m benchmarks.embedding_parity --backends torch_int8 --min-cosine 0.995
+
+Texts are chunks of the default codebase's vector store if one exists, otherwise
+chunks of a generated C file. For each backend it reports embedding throughput,
+cosine similarity to the fp32 vectors and top-k neighbour overlap with fp32 search.
+Exits with status 1 when a backend's minimum cosine is below --min-cosine, or when
+a backend cannot be loaded (unless --allow-missing).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from app.chunk_store import ChunkStore
+from app.chunker import chunk_code
+from app.config import (EMBED_MODEL_NAME, EMBED_ONNX_FILE, EMBED_MAX_BATCH_TOKENS, EMBED_BATCH_SIZE,
+                        VECTOR_STORE_DIR)
+from app.embedding_backend import load_embedding_model, BucketedEncoder
+from benchmarks.chunker import synthetic_c_source
+
+
+def sample_texts(count):
+    offsets = os.path.join(VECTOR_STORE_DIR, "chunk_offsets.npy")
+    blob = os.path.join(VECTOR_STORE_DIR, "chunks.blob")
+    if os.path.exists(offsets) and os.path.exists(blob):
+        store = ChunkStore(offsets, blob)
+        picks = np.random.default_rng(0).permutation(len(store))[:count]
+        return [store.at(int(p))["content"] for p in picks]
+    chunks = chunk_code(synthetic_c_source(functions=count, statements=8), "synthetic.c")
+    return [c["content"] for c in chunks][:count]
+
+
+def embed(model, texts):
+    encoder = BucketedEncoder(model, EMBED_MAX_BATCH_TOKENS, EMBED_BATCH_SIZE)
+    start = time.perf_counter()
+    vectors = encoder.encode(texts, normalize=True)
+    return vectors, time.perf_counter() - start, encoder.stats()
+
+
+def neighbour_overlap(reference, vectors, queries, k):
+    ref = np.argsort(-(reference[:queries] @ reference.T), axis=1)[:, :k]
+    got = np.argsort(-(vectors[:queries] @ vectors.T), axis=1)[:, :k]
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(ref, got)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=EMBED_MODEL_NAME)
+    parser.add_argument("--backends", nargs="+", default=["torch_int8", "onnx"])
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--allow-missing", action="store_true",
+                        help="report backends that fail to load (e.g. onnxruntime not installed) without failing")
+    args = parser.parse_args()
+
+    texts = sample_texts(args.texts)
+    reference, seconds, stats = embed(load_embedding_model(args.model, "torch"), texts)
+    results = {"torch": {"texts_per_sec": round(len(texts) / seconds, 1), **stats}}
+
+    failed = False
+    for backend in args.backends:
+        try:
+            model = load_embedding_model(args.model, backend, EMBED_ONNX_FILE)
+        except Exception as e:
+            results[backend] = {"error": str(e)}
+            failed |= not args.allow_missing
+            continue
+        vectors, seconds, stats = embed(model, texts)
+        cosine = np.sum(reference * vectors, axis=1)
+        results[backend] = {
+            "texts_per_sec": round(len(texts) / seconds, 1),
+            "speedup": round(len(texts) / seconds / results["torch"]["texts_per_sec"], 2),
+            "cosine_mean": round(float(cosine.mean()), 5),
+            "cosine_min": round(float(cosine.min()), 5),
+            f"top{args.k}_overlap": round(neighbour_overlap(reference, vectors, min(200, len(texts)), args.k), 4),
+            **stats,
+        }
+        failed |= float(cosine.min()) < args.min_cosine
+
+    print(json.dumps({"model": args.model, "texts": len(texts), "min_cosine": args.min_cosine,
+                      "results": results}, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Load test of the Flask frontend server's SQLite-backed routes.
+
+    python -m benchmarks.frontend_load
+    python -m benchmarks.frontend_load --clients 16 --seconds 10 --files 500
+
+Runs frontend/server.py on a local port in a scratch directory (fresh database.db),
+seeds --users users with --files files and query logs each, then has --clients
+threads, each logged in as one of the users, call every route for --seconds, and
+once more while a writer keeps replacing one user's files.
+Reports requests/s and p50/p95 latency per route, plus rows/s of the bulk
+upload insert against the old one-connection-and-one-INSERT-per-row pattern.
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+ROUTES = {
+    "files": "/api/files",
+    "query_logs": "/api/query-logs",
+    "search": "/api/files/search?q=helper_7",
+}
+
+
+def synthetic_files(count, lines=40):
+    return [{
+        "name": f"src/file_{i}.c",
+        "type": "c",
+        "content": "\n".join(f"int fn_{i}_{j}(int a) {{ return helper_{(i + j) % 50}(a) + {j}; }}"
+                             for j in range(lines)),
+    } for i in range(count)]
+
+
+def client(base_url, email):
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    body = json.dumps({"email": email, "password": "secret"}).encode()
+    opener.open(urllib.request.Request(base_url + "/api/login", body, {"Content-Type": "application/json"}))
+    return opener
+
+
+def run_clients(base_url, emails, route, clients, seconds):
+    latencies = [[] for _ in range(clients)]
+    errors = [0] * clients
+    deadline = time.perf_counter() + seconds
+
+    def work(n):
+        opener = client(base_url, emails[n % len(emails)])
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                opener.open(base_url + route).read()
+            except Exception:
+                errors[n] += 1
+                continue
+            latencies[n].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done = np.array([x for per_client in latencies for x in per_client])
+    return {
+        "requests_per_sec": round(len(done) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(done, 50)) * 1000, 2) if len(done) else None,
+        "p95_ms": round(float(np.percentile(done, 95)) * 1000, 2) if len(done) else None,
+        "errors": sum(errors),
+    }
+
+
+def bulk_insert(db, files, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        db.replace_user_files(1, files)
+    return round(len(files) * repeats / (time.perf_counter() - start), 1)
+
+
+def row_by_row_insert(db, path, files, repeats):
+    """
+    The previous upload path on the same schema: a fresh rollback-journal
+    connection and one INSERT per row.
+    """
+    with sqlite3.connect(path) as conn:
+        for statement in db.SCHEMA + (db.FTS_SCHEMA if db.fts_enabled else ()):
+            conn.execute(statement)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        conn = sqlite3.connect(path)
+        conn.execute("DELETE FROM user_files WHERE user_id = ?", (1,))
+        for f in files:
+            conn.execute("INSERT INTO user_files (user_id, filename, content, file_type) VALUES (?, ?, ?, ?)",
+                         (1, f["name"], f["content"], f["type"]))
+        conn.commit()
+        conn.close()
+    return round(len(files) * repeats / (time.perf_counter() - start), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--logs", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    frontend = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frontend")
+    scratch = tempfile.mkdtemp(prefix="frontend_load_")
+    os.chdir(scratch)
+    os.environ["DATABASE_PATH"] = os.path.join(scratch, "database.db")
+    sys.path.insert(0, frontend)
+    import bcrypt
+    import db
+    import server
+    from werkzeug.serving import make_server
+
+    files = synthetic_files(args.files)
+    password = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=4))
+    emails = []
+    for u in range(args.users):
+        email = f"user{u}@example.com"
+        user_id = db.create_user(f"user{u}", email, password)
+        db.replace_user_files(user_id, files)
+        for n in range(args.logs):
+            db.log_query(user_id, f"question {n}", f"answer {n}")
+        emails.append(email)
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    httpd = make_server("127.0.0.1", 0, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{httpd.server_port}"
+
+    results = {name: run_clients(base_url, emails, route, args.clients, args.seconds)
+               for name, route in ROUTES.items()}
+
+    # Reads while another user's files are replaced over and over: with WAL they do not wait for the writer
+    stop = threading.Event()
+    uploads = [0]
+
+    def writer():
+        while not stop.is_set():
+            db.replace_user_files(1, files)
+            uploads[0] += 1
+    thread = threading.Thread(target=writer)
+    thread.start()
+    results["query_logs_during_uploads"] = run_clients(base_url, emails[1:] or emails, ROUTES["query_logs"],
+                                                       args.clients, args.seconds)
+    stop.set()
+    thread.join()
+    results["query_logs_during_uploads"]["uploads_per_sec"] = round(uploads[0] / args.seconds, 1)
+    httpd.shutdown()
+
+    repeats = 5
+    storage = {
+        "bulk_insert_rows_per_sec": bulk_insert(db, files, repeats),
+        "row_by_row_rows_per_sec": row_by_row_insert(db, os.path.join(scratch, "baseline.db"), files, repeats),
+        "connections_opened": db.pool.opened,
+        "fts_enabled": db.fts_enabled,
+    }
+    print(json.dumps({"users": args.users, "files_per_user": args.files, "logs_per_user": args.logs,
+                      "clients": args.clients, "routes": results, "storage": storage}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Recall@k / latency comparison of the ANN index types against exact flat search.
+
+    python -m benchmarks.index_recall --k 10 --queries 200
+
+Vectors are taken from the stored chunk mapping (through the embedding cache),
+queries are held-out chunks perturbed with a little noise.
+"""
+import argparse
+import json
+
+import numpy as np
+
+from app import rag_pipeline, vector_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    args = parser.parse_args()
+
+    _, chunks = rag_pipeline.load_faiss_index_and_chunks()
+    vectors = rag_pipeline.embed_texts([c["content"] for c in chunks])
+
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(0, 0.01, size=(len(picks), vectors.shape[1])).astype(np.float32)
+
+    configs = [("flat", {})]
+    for index_type in ("ivf_flat", "ivf_pq"):
+        configs += [(index_type, {"nprobe": n}) for n in args.nprobe]
+    configs += [("hnsw", {"ef_search": ef}) for ef in args.ef_search]
+
+    results = vector_index.compare_recall(vectors, queries, k=args.k, configs=configs)
+    print(json.dumps({"num_vectors": len(vectors), "k": args.k, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Import time, memory and model-loading behaviour of the entry points.
+
+    python -m benchmarks.startup             # import cost only
+    python -m benchmarks.startup --warmup    # plus the cost of loading each model
+
+Each target is imported in a fresh interpreter. Reports wall time of the import,
+peak RSS, whether torch got imported and which models were loaded by the import
+(none should be: models load lazily or in warmup). With --warmup it then times
+rag_pipeline.warmup() and llm_module.warmup(), i.e. what the first request would pay.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+TARGETS = ["app.rag_pipeline", "app.llm_module", "app.main", "generate_index"]
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {target}
+result = {{"import_seconds": round(time.perf_counter() - start, 3)}}
+rag = sys.modules.get("app.rag_pipeline")
+llm = sys.modules.get("app.llm_module")
+result["torch_imported"] = "torch" in sys.modules
+result["embedding_model_loaded"] = bool(rag and rag.is_loaded())
+result["llm_imported"] = llm is not None
+result["llm_loaded"] = bool(llm and llm.is_loaded())
+if {warmup}:
+    for name, module in (("embedding", rag), ("llm", llm)):
+        if module:
+            start = time.perf_counter()
+            module.warmup()
+            result[name + "_warmup_seconds"] = round(time.perf_counter() - start, 3)
+result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+print(json.dumps(result))
+"""
+
+
+def measure(target, warmup):
+    proc = subprocess.run([sys.executable, "-c", PROBE.format(target=target, warmup=warmup)],
+                          capture_output=True, text=True)
+    if proc.returncode:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--warmup", action="store_true")
+    parser.add_argument("targets", nargs="*", default=TARGETS)
+    args = parser.parse_args()
+    print(json.dumps({target: measure(target, args.warmup) for target in args.targets}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
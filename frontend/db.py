@@ -0,0 +1,261 @@
+"""
+SQLite storage for server.py: users, uploaded files and query logs.
+"""
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_PATH = os.getenv("DATABASE_PATH", "database.db")
+POOL_SIZE = 8
+BUSY_TIMEOUT_MS = 5000
+
+# WAL lets readers run while a writer commits; with WAL, synchronous=NORMAL is
+# still crash-safe (the last transactions may roll back on power loss)
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS query_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        query TEXT NOT NULL,
+        response TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_files (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        filename TEXT NOT NULL,
+        content TEXT NOT NULL,
+        file_type TEXT NOT NULL,
+        uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    """,
+    # History and file listings filter by user and sort by time
+    "CREATE INDEX IF NOT EXISTS idx_query_logs_user_time ON query_logs (user_id, timestamp DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_user_files_user_time ON user_files (user_id, uploaded_at DESC)",
+)
+
+# Full-text index over user_files, kept in sync by triggers. External content:
+# the text is stored once, in user_files. '_' counts as a word character so
+# snake_case identifiers are single terms. user_id is indexed as a term too, so a
+# search only visits the rows of its user.
+FTS_SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS user_files_fts USING fts5(
+        filename, content, user_id, content='user_files', content_rowid='id',
+        tokenize="unicode61 tokenchars '_'"
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS user_files_ai AFTER INSERT ON user_files BEGIN
+        INSERT INTO user_files_fts (rowid, filename, content, user_id)
+        VALUES (new.id, new.filename, new.content, new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS user_files_ad AFTER DELETE ON user_files BEGIN
+        INSERT INTO user_files_fts (user_files_fts, rowid, filename, content, user_id)
+        VALUES ('delete', old.id, old.filename, old.content, old.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS user_files_au AFTER UPDATE ON user_files BEGIN
+        INSERT INTO user_files_fts (user_files_fts, rowid, filename, content, user_id)
+        VALUES ('delete', old.id, old.filename, old.content, old.user_id);
+        INSERT INTO user_files_fts (rowid, filename, content, user_id)
+        VALUES (new.id, new.filename, new.content, new.user_id);
+    END
+    """,
+)
+FTS_TRIGGERS = ("user_files_ai", "user_files_ad", "user_files_au")
+
+
+class ConnectionPool:
+    """
+    Reuses SQLite connections across requests instead of opening one per query.
+    Each thread borrows its own connection for the duration of a `with connection()`
+    block (nested blocks in the same thread share it) and hands it back afterwards;
+    up to size idle connections are kept open.
+    """
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self.opened = 0
+        self._idle = queue.LifoQueue()
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=BUSY_TIMEOUT_MS / 1000)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        self.opened += 1
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            if conn.in_transaction:
+                conn.rollback()
+            if self._idle.qsize() < self.size:
+                self._idle.put(conn)
+            else:
+                conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+pool = ConnectionPool(DB_PATH, POOL_SIZE)
+fts_enabled = False
+
+
+def init_db():
+    """
+    Creates tables and indexes. The FTS index is filled from existing rows the first
+    time it is created (an index from before user_id was indexed is recreated);
+    without FTS5 support in SQLite, search falls back to LIKE.
+    """
+    global fts_enabled
+    with pool.connection() as conn, conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+        fts = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'user_files_fts'").fetchone()
+        had_fts = fts is not None and "user_id" in fts["sql"]
+        try:
+            if fts is not None and not had_fts:
+                for trigger in FTS_TRIGGERS:
+                    conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+                conn.execute("DROP TABLE user_files_fts")
+            for statement in FTS_SCHEMA:
+                conn.execute(statement)
+        except sqlite3.OperationalError as e:
+            print(f"FTS5 not available, file search uses LIKE: {e}")
+            return
+        if not had_fts:
+            conn.execute("INSERT INTO user_files_fts (user_files_fts) VALUES ('rebuild')")
+        fts_enabled = True
+
+
+def find_user_by_email(email):
+    with pool.connection() as conn:
+        return conn.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+
+
+def create_user(name, email, password_hash):
+    """Returns the new user's id, or None if the email is taken."""
+    with pool.connection() as conn:
+        try:
+            with conn:
+                return conn.execute("INSERT INTO users (name, email, password) VALUES (?, ?, ?)",
+                                    (name, email, password_hash)).lastrowid
+        except sqlite3.IntegrityError:
+            return None
+
+
+def replace_user_files(user_id, files):
+    """Replaces all files of a user in one transaction with a single bulk insert."""
+    with pool.connection() as conn, conn:
+        conn.execute("DELETE FROM user_files WHERE user_id = ?", (user_id,))
+        conn.executemany(
+            "INSERT INTO user_files (user_id, filename, content, file_type) VALUES (?, ?, ?, ?)",
+            [(user_id, f['name'], f['content'], f['type']) for f in files])
+
+
+def list_user_files(user_id):
+    with pool.connection() as conn:
+        return conn.execute("""
+            SELECT filename, content, file_type, uploaded_at
+            FROM user_files
+            WHERE user_id = ?
+            ORDER BY uploaded_at DESC
+        """, (user_id,)).fetchall()
+
+
+def _match_query(text):
+    """Quotes every word so user input cannot use (or break) FTS5 query syntax."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+def search_user_files(user_id, text, limit=20):
+    """
+    Keyword search over a user's files, best matches first, with a snippet around the hits.
+    The user filter is part of the FTS query; the user_id column gets no weight in the ranking.
+    """
+    if not text.split():
+        return []
+    with pool.connection() as conn:
+        if fts_enabled:
+            return conn.execute("""
+                SELECT f.filename, f.file_type,
+                       snippet(user_files_fts, 1, '[', ']', '...', 16) AS snippet
+                FROM user_files_fts
+                JOIN user_files f ON f.id = user_files_fts.rowid
+                WHERE user_files_fts MATCH ?
+                ORDER BY bm25(user_files_fts, 1.0, 1.0, 0.0)
+                LIMIT ?
+            """, (f'user_id : "{int(user_id)}" AND ({_match_query(text)})', limit)).fetchall()
+        return conn.execute("""
+            SELECT filename, file_type, substr(content, 1, 200) AS snippet
+            FROM user_files
+            WHERE user_id = ? AND content LIKE ?
+            LIMIT ?
+        """, (user_id, f"%{text}%", limit)).fetchall()
+
+
+def log_query(user_id, query, response):
+    with pool.connection() as conn, conn:
+        conn.execute("INSERT INTO query_logs (user_id, query, response) VALUES (?, ?, ?)",
+                     (user_id, query, response))
+
+
+def recent_queries(user_id, limit=20):
+    with pool.connection() as conn:
+        return conn.execute("""
+            SELECT query, response, timestamp
+            FROM query_logs
+            WHERE user_id = ?
+            ORDER BY timestamp DESC
+            LIMIT ?
+        """, (user_id, limit)).fetchall()
@@ -1,12 +1,20 @@
 from flask import Flask, render_template, request, jsonify, session
 from flask_cors import CORS
 import os
-import sqlite3
+import sys
+import math
 import bcrypt
 from flask_session import Session
 import json
 from datetime import datetime
 
+# Chat answers come from the same retrieval stack as the FastAPI backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import rag_pipeline, llm_module
+from app.config import INGEST_JOB_WORKERS, INGEST_JOB_HISTORY
+from app.ingest_jobs import IngestJobs
+import db
+
 app = Flask(__name__)
 
 # Enable CORS for React frontend
@@ -18,49 +26,62 @@ app.config["SESSION_TYPE"] = "filesystem"
 app.config["SESSION_PERMANENT"] = False
 Session(app)
 
-# Initialize DB
-def get_db_connection():
-    conn = sqlite3.connect("database.db", check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def init_db():
-    db = get_db_connection()
-    with db:
-        db.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-        """)
-        db.execute("""
-            CREATE TABLE IF NOT EXISTS query_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                query TEXT NOT NULL,
-                response TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            );
-        """)
-        db.execute("""
-            CREATE TABLE IF NOT EXISTS user_files (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                filename TEXT NOT NULL,
-                content TEXT NOT NULL,
-                file_type TEXT NOT NULL,
-                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            );
-        """)
-    db.close()
-
 # Initialize database on startup
-init_db()
+db.init_db()
+
+CHAT_TOP_K = 5
+CHAT_MAX_TOP_K = 20
+CHAT_SIMILARITY_THRESHOLD = 0.3
+CHAT_TEMPERATURE = 0.2
+CHAT_MAX_TEMPERATURE = 2.0
+
+# Uploads are indexed in the background, one job at a time per user
+ingest_jobs = IngestJobs(INGEST_JOB_WORKERS, INGEST_JOB_HISTORY)
+
+
+def bounded_number(data, key, default, low, high):
+    """data[key] (or default) as a float clamped to [low, high]; ValueError if it is not a finite number."""
+    try:
+        value = float(data.get(key, default))
+    except (TypeError, ValueError):
+        raise ValueError(f'{key} must be a number')
+    if not math.isfinite(value):
+        raise ValueError(f'{key} must be a number')
+    return min(max(value, low), high)
+
+
+def user_codebase(user_id):
+    """Each user's uploads are indexed as their own codebase in app.rag_pipeline."""
+    return f"user-{user_id}"
+
+
+def index_user_files(user_id, files, progress=None):
+    """
+    Replaces the user's indexed sources with files and updates their index.
+    The update is incremental: files whose content did not change are not re-embedded.
+    The files are written to a staging folder that replaces the user's sources only
+    once the new index is built, so a failed build keeps the previous sources.
+    """
+    codebase_id = user_codebase(user_id)
+    staging_dir = rag_pipeline.stage_sources(codebase_id)
+    try:
+        for file_data in files:
+            name = os.path.normpath(file_data['name'])
+            if os.path.isabs(name) or name.split(os.sep)[0] == '..':
+                name = os.path.basename(name)
+            if not name.lower().endswith(rag_pipeline.SUPPORTED_EXTENSIONS):
+                continue
+            path = os.path.join(staging_dir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(file_data['content'])
+        stats = rag_pipeline.process_and_store_local_code(codebase_id=codebase_id, progress=progress,
+                                                          source_dir=staging_dir)
+        if stats is not None:
+            rag_pipeline.replace_sources(codebase_id, staging_dir)
+        return stats
+    finally:
+        rag_pipeline.remove_tree(staging_dir)
 
 # API Routes
 @app.route('/api/signup', methods=['POST'])
@@ -77,21 +98,10 @@ def signup():
         # Hash password
         hashed_pw = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
 
-        db = get_db_connection()
-        cursor = db.cursor()
-        
-        # Check if email exists
-        cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-        if cursor.fetchone():
-            db.close()
+        # Insert new user; the unique email index rejects duplicates
+        user_id = db.create_user(name, email, hashed_pw)
+        if user_id is None:
             return jsonify({'error': 'Email already exists'}), 400
-        
-        # Insert new user
-        cursor.execute("INSERT INTO users (name, email, password) VALUES (?, ?, ?)", 
-                       (name, email, hashed_pw))
-        db.commit()
-        user_id = cursor.lastrowid
-        db.close()
 
         # Set session
         session['user_id'] = user_id
@@ -120,11 +130,7 @@ def login():
         if not (email and password):
             return jsonify({'error': 'Email and password are required'}), 400
 
-        db = get_db_connection()
-        cursor = db.cursor()
-        cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-        user = cursor.fetchone()
-        db.close()
+        user = db.find_user_by_email(email)
 
         if user and bcrypt.checkpw(password.encode('utf-8'), user['password']):
             session['user_id'] = user['id']
@@ -175,59 +181,65 @@ def upload_files():
         if not files:
             return jsonify({'error': 'No files provided'}), 400
 
-        db = get_db_connection()
-        cursor = db.cursor()
-
-        # Clear existing files for this user
-        cursor.execute("DELETE FROM user_files WHERE user_id = ?", (user_id,))
-
-        # Insert new files
-        for file_data in files:
-            cursor.execute("""
-                INSERT INTO user_files (user_id, filename, content, file_type) 
-                VALUES (?, ?, ?, ?)
-            """, (user_id, file_data['name'], file_data['content'], file_data['type']))
+        # Replace the user's files in one transaction
+        db.replace_user_files(user_id, files)
 
-        db.commit()
-        db.close()
+        job = ingest_jobs.submit(user_codebase(user_id), index_user_files, user_id, files)
 
-        return jsonify({'success': True, 'message': f'Uploaded {len(files)} files'})
+        return jsonify({'success': True, 'message': f'Uploaded {len(files)} files, indexing in the background',
+                        'job_id': job.id, 'status_url': f'/api/upload-files/{job.id}'}), 202
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/upload-files/<job_id>', methods=['GET'])
+def upload_status(job_id):
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    job = ingest_jobs.get(job_id)
+    if job is None or job.codebase_id != user_codebase(session['user_id']):
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job.to_dict())
+
 @app.route('/api/files', methods=['GET'])
 def get_files():
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
 
     try:
-        user_id = session['user_id']
-        db = get_db_connection()
-        cursor = db.cursor()
-        
-        cursor.execute("""
-            SELECT filename, content, file_type, uploaded_at 
-            FROM user_files 
-            WHERE user_id = ? 
-            ORDER BY uploaded_at DESC
-        """, (user_id,))
-        
         files = []
-        for row in cursor.fetchall():
+        for row in db.list_user_files(session['user_id']):
             files.append({
                 'name': row['filename'],
                 'content': row['content'],
                 'type': row['file_type'],
                 'uploaded_at': row['uploaded_at']
             })
-        
-        db.close()
+
         return jsonify({'files': files})
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/files/search', methods=['GET'])
+def search_files():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    try:
+        query = request.args.get('q', '')
+        limit = min(request.args.get('limit', 20, type=int), 100)
+        results = [{
+            'name': row['filename'],
+            'type': row['file_type'],
+            'snippet': row['snippet']
+        } for row in db.search_user_files(session['user_id'], query, limit)]
+        return jsonify({'results': results})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     if 'user_id' not in session:
@@ -241,31 +253,34 @@ def chat():
         if not query:
             return jsonify({'error': 'Query is required'}), 400
 
-        # Get user's files for context
-        db = get_db_connection()
-        cursor = db.cursor()
-        cursor.execute("SELECT filename, content FROM user_files WHERE user_id = ?", (user_id,))
-        files = cursor.fetchall()
-
-        # Simple response generation (replace with actual RAG implementation)
-        context = ""
-        for file in files:
-            context += f"\n--- {file['filename']} ---\n{file['content']}\n"
-
-        # Placeholder response (integrate with your AI service here)
-        response = f"Based on your uploaded C/C++ files, here's information about: {query}\n\nContext from your codebase:\n{context[:500]}..."
+        codebase_id = user_codebase(user_id)
+        if not rag_pipeline.codebase_exists(codebase_id):
+            return jsonify({'error': 'No indexed files yet, upload some code first'}), 400
+
+        try:
+            top_k = min(max(int(data.get('top_k', CHAT_TOP_K)), 1), CHAT_MAX_TOP_K)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'top_k must be an integer'}), 400
+        try:
+            # Cosine similarity lies in [-1, 1]
+            similarity_threshold = bounded_number(data, 'similarity_threshold', CHAT_SIMILARITY_THRESHOLD, -1.0, 1.0)
+            temperature = bounded_number(data, 'temperature', CHAT_TEMPERATURE, 0.0, CHAT_MAX_TEMPERATURE)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Only the top-scoring chunks of the user's index reach the model
+        chunks = rag_pipeline.retrieve_relevant_chunks(
+            query, k=top_k, similarity_threshold=similarity_threshold, codebase_id=codebase_id)
+        response = llm_module.generate_answer(query, chunks, temperature=temperature)
 
         # Log the query
-        cursor.execute("""
-            INSERT INTO query_logs (user_id, query, response) 
-            VALUES (?, ?, ?)
-        """, (user_id, query, response))
-        db.commit()
-        db.close()
+        db.log_query(user_id, query, response)
 
         return jsonify({
             'success': True,
-            'response': response
+            'response': response,
+            'sources': [{'source': c['source'], 'start_line': c['start_line'], 'score': c['score']}
+                        for c in chunks]
         })
 
     except Exception as e:
@@ -277,27 +292,14 @@ def get_query_logs():
         return jsonify({'error': 'Not authenticated'}), 401
 
     try:
-        user_id = session['user_id']
-        db = get_db_connection()
-        cursor = db.cursor()
-        
-        cursor.execute("""
-            SELECT query, response, timestamp 
-            FROM query_logs 
-            WHERE user_id = ? 
-            ORDER BY timestamp DESC 
-            LIMIT 20
-        """, (user_id,))
-        
         logs = []
-        for row in cursor.fetchall():
+        for row in db.recent_queries(session['user_id']):
             logs.append({
                 'query': row['query'],
                 'response': row['response'],
                 'timestamp': row['timestamp']
             })
-        
-        db.close()
+
         return jsonify({'logs': logs})
 
     except Exception as e:
@@ -56,7 +56,7 @@ const [backendMode, setBackendMode] = useState<'api' | 'model'>(
   const [chatSettings, setChatSettings] = useState<ChatSettings>({
     temperature: 0.2,
     top_k: 5,
-    similarity_threshold: 0.7,
+    similarity_threshold: 0.3,
   });
 
   const [queryHistory, setQueryHistory] = useState<Array<any>>([]);
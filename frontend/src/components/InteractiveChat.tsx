@@ -414,13 +414,13 @@ export const InteractiveChat: React.FC<InteractiveChatProps> = ({
                         </div>
                         <div>
                             <label className={`block text-sm font-medium ${themeClasses.text} mb-1`}>
-                                Similarity: {settings.similarity_threshold}
+                                Min similarity: {settings.similarity_threshold}
                             </label>
                             <input
                                 type="range"
                                 min="0"
-                                max="2"
-                                step="0.1"
+                                max="1"
+                                step="0.05"
                                 value={settings.similarity_threshold}
                                 onChange={(e) => setSettings({ ...settings, similarity_threshold: parseFloat(e.target.value) })}
                                 className="w-full"
@@ -1,11 +1,9 @@
 import React, { useState, useEffect } from 'react';
 import { File, Code, Eye, Download, Trash2, FolderOpen } from 'lucide-react';
-import { backendApi } from '../services/backendApi';
+import { backendApi, CodebaseFile } from '../services/backendApi';
 
-interface FileData {
-  name: string;
-  content: string;
-  type: string;
+interface FileData extends CodebaseFile {
+  content?: string;
 }
 
 interface UploadedFilesProps {
@@ -44,22 +42,37 @@ export const UploadedFiles: React.FC<UploadedFilesProps> = ({ isDarkMode }) => {
   const loadFilesFromBackend = async () => {
     try {
       // 🔹 New endpoint you’ll add in main.py: /list_codebase
-      const backendFiles = await backendApi.listCodebaseFiles();
-      setFiles(backendFiles);
-      localStorage.setItem('uploadedFiles', JSON.stringify(backendFiles)); // optional sync
+      const allFiles = await backendApi.listAllCodebaseFiles();
+      setFiles(allFiles);
+      localStorage.setItem('uploadedFiles', JSON.stringify(allFiles)); // optional sync
     } catch (error) {
       console.error("Error loading files:", error);
     }
   };
 
-  const deleteFile = async (fileName: string) => {
+  // The listing carries no content; fetch a file's text the first time it is opened
+  const selectFile = async (file: FileData, show: boolean) => {
+    setSelectedFile(file);
+    setShowContent(show);
+    if (file.content !== undefined) return;
+    try {
+      const { content } = await backendApi.getCodebaseFile(file.path);
+      const loaded = { ...file, content };
+      setFiles(current => current.map(f => (f.path === file.path ? loaded : f)));
+      setSelectedFile(current => (current?.path === file.path ? loaded : current));
+    } catch (error) {
+      console.error("Error loading file:", error);
+    }
+  };
+
+  const deleteFile = async (filePath: string) => {
     try {
       // 🔹 You could make a backend delete endpoint if needed
-      const updatedFiles = files.filter(file => file.name !== fileName);
+      const updatedFiles = files.filter(file => file.path !== filePath);
       setFiles(updatedFiles);
       localStorage.setItem('uploadedFiles', JSON.stringify(updatedFiles));
 
-      if (selectedFile?.name === fileName) {
+      if (selectedFile?.path === filePath) {
         setSelectedFile(null);
         setShowContent(false);
       }
@@ -68,8 +81,9 @@ export const UploadedFiles: React.FC<UploadedFilesProps> = ({ isDarkMode }) => {
     }
   };
 
-  const downloadFile = (file: FileData) => {
-    const blob = new Blob([file.content], { type: 'text/plain' });
+  const downloadFile = async (file: FileData) => {
+    const content = file.content ?? (await backendApi.getCodebaseFile(file.path)).content;
+    const blob = new Blob([content], { type: 'text/plain' });
     const url = URL.createObjectURL(blob);
     const a = document.createElement('a');
     a.href = url;
@@ -98,8 +112,7 @@ export const UploadedFiles: React.FC<UploadedFilesProps> = ({ isDarkMode }) => {
     }
   };
 
-  const formatFileSize = (content: string) => {
-    const bytes = new Blob([content]).size;
+  const formatFileSize = (bytes: number) => {
     if (bytes === 0) return '0 Bytes';
     const k = 1024;
     const sizes = ['Bytes', 'KB', 'MB'];
@@ -135,22 +148,19 @@ export const UploadedFiles: React.FC<UploadedFilesProps> = ({ isDarkMode }) => {
             <div
               key={index}
               className={`p-4 rounded-lg border transition-all cursor-pointer ${
-                selectedFile?.name === file.name
+                selectedFile?.path === file.path
                   ? themeClasses.selectedBorder
                   : `${themeClasses.border} ${themeClasses.borderHover} ${themeClasses.itemBg}`
               }`}
-              onClick={() => {
-                setSelectedFile(file);
-                setShowContent(false);
-              }}
+              onClick={() => selectFile(file, false)}
             >
               <div className="flex items-center justify-between">
                 <div className="flex items-center space-x-3">
                   {getFileIcon(file.name)}
                   <div>
-                    <h3 className={`font-medium ${themeClasses.text}`}>{file.name}</h3>
+                    <h3 className={`font-medium ${themeClasses.text}`}>{file.path}</h3>
                     <p className={`text-sm ${themeClasses.secondaryText}`}>
-                      {formatFileSize(file.content)} • {countLines(file.content)} lines
+                      {formatFileSize(file.size)} • {file.chunks} chunks
                     </p>
                   </div>
                 </div>
@@ -159,8 +169,7 @@ export const UploadedFiles: React.FC<UploadedFilesProps> = ({ isDarkMode }) => {
                   <button
                     onClick={(e) => {
                       e.stopPropagation();
-                      setSelectedFile(file);
-                      setShowContent(true);
+                      selectFile(file, true);
                     }}
                     className={`p-2 ${themeClasses.secondaryText}`}
                     title="View content"
@@ -180,7 +189,7 @@ export const UploadedFiles: React.FC<UploadedFilesProps> = ({ isDarkMode }) => {
                   <button
                     onClick={(e) => {
                       e.stopPropagation();
-                      deleteFile(file.name);
+                      deleteFile(file.path);
                     }}
                     className={`p-2 ${themeClasses.secondaryText} hover:text-red-500`}
                     title="Delete file"
@@ -215,11 +224,13 @@ export const UploadedFiles: React.FC<UploadedFilesProps> = ({ isDarkMode }) => {
               <div className="grid grid-cols-2 gap-4 text-sm">
                 <div>
                   <span className={themeClasses.secondaryText}>File Size:</span>
-                  <span className={`ml-2 ${themeClasses.text}`}>{formatFileSize(selectedFile.content)}</span>
+                  <span className={`ml-2 ${themeClasses.text}`}>{formatFileSize(selectedFile.size)}</span>
                 </div>
                 <div>
                   <span className={themeClasses.secondaryText}>Lines:</span>
-                  <span className={`ml-2 ${themeClasses.text}`}>{countLines(selectedFile.content)}</span>
+                  <span className={`ml-2 ${themeClasses.text}`}>
+                    {selectedFile.content !== undefined ? countLines(selectedFile.content) : '…'}
+                  </span>
                 </div>
                 <div>
                   <span className={themeClasses.secondaryText}>Type:</span>
@@ -235,7 +246,7 @@ export const UploadedFiles: React.FC<UploadedFilesProps> = ({ isDarkMode }) => {
             {showContent && (
               <div className={`${themeClasses.contentBg} rounded-lg p-4 max-h-96 overflow-auto border ${themeClasses.border}`}>
                 <pre className={`text-sm ${themeClasses.secondaryText} whitespace-pre-wrap font-mono`}>
-                  {selectedFile.content}
+                  {selectedFile.content ?? 'Loading…'}
                 </pre>
               </div>
             )}
@@ -22,6 +22,24 @@ export interface QueryResponse {
   };
 }
 
+export interface CodebaseFile {
+  name: string;
+  path: string;
+  type: string;
+  size: number;
+  mtime: number;
+  chunks: number;
+}
+
+export interface CodebaseFilePage {
+  codebase_id: string;
+  index_version: string | null;
+  total: number;
+  offset: number;
+  limit: number;
+  files: CodebaseFile[];
+}
+
 export interface QueryRequest {
   query: string;
   temperature?: number;
@@ -48,9 +66,32 @@ class BackendApiService {
     return response.json();
   }
 
-  async listCodebaseFiles(): Promise<Array<{ name: string; content: string; type: string }>> {
-    // Use the generic request helper (GET)
-    return this.request('/list_codebase');
+  async listCodebaseFiles(offset = 0, limit = 100): Promise<CodebaseFilePage> {
+    // Metadata only; the browser revalidates with the ETag, so unchanged listings come back as 304s
+    return this.request(`/list_codebase?offset=${offset}&limit=${limit}`);
+  }
+
+  // Every page of the listing; starts over if the codebase is re-indexed between pages
+  async listAllCodebaseFiles(pageSize = 1000): Promise<CodebaseFile[]> {
+    let files: CodebaseFile[] = [];
+    let version: string | null | undefined;
+    for (let offset = 0; ; ) {
+      const page = await this.listCodebaseFiles(offset, pageSize);
+      if (version !== undefined && page.index_version !== version) {
+        files = [];
+        offset = 0;
+        version = undefined;
+        continue;
+      }
+      version = page.index_version;
+      files = files.concat(page.files);
+      offset += page.files.length;
+      if (offset >= page.total || page.files.length === 0) return files;
+    }
+  }
+
+  async getCodebaseFile(path: string): Promise<{ path: string; content: string }> {
+    return this.request(`/codebase_file?path=${encodeURIComponent(path)}`);
   }
  
   async uploadCodeFiles(file: File): Promise<{ message: string }> {
@@ -80,7 +121,7 @@ class BackendApiService {
         query: request.query,
         temperature: request.temperature || 0.2,
         top_k: request.top_k || 5,
-        similarity_threshold: request.similarity_threshold || 0.7,
+        similarity_threshold: request.similarity_threshold ?? 0.3,
         filter_type: request.filter_type,
       }),
     });
@@ -93,7 +134,7 @@ class BackendApiService {
         question: request.query,
         temperature: request.temperature || 0.2,
         top_k: request.top_k || 5,
-        similarity_threshold: request.similarity_threshold || 0.7,
+        similarity_threshold: request.similarity_threshold ?? 0.3,
       }),
     });
   }
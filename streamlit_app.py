@@ -4,7 +4,12 @@ from app.rag_pipeline import retrieve_relevant_chunks
 from app.llm_module import generate_answer
 from app.rag_pipeline import load_faiss_index_and_chunks, retrieve_relevant_chunks
 
-index, chunks = load_faiss_index_and_chunks()
+@st.cache_resource
+def load_index():
+    # Opened once per server process, not on every rerun; models load on the first question
+    return load_faiss_index_and_chunks()
+
+index, chunks = load_index()
 
 
 st.set_page_config(page_title="Chat with Code", layout="centered")
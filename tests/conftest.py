@@ -0,0 +1,78 @@
+import re
+import zlib
+
+import faiss
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def rag_pipeline(tmp_path, monkeypatch):
+    """app.rag_pipeline with the relative vector store paths of app.config under tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    from app import rag_pipeline
+    return rag_pipeline
+
+
+class HashingEncoder:
+    """Bag-of-words vectors over hashed tokens, standing in for the embedding model."""
+
+    dimension = 64
+
+    def encode(self, texts, normalize=False):
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text):
+                vectors[row, zlib.crc32(token.encode()) % self.dimension] += 1
+        if normalize:
+            faiss.normalize_L2(vectors)
+        return vectors
+
+
+@pytest.fixture
+def indexer(rag_pipeline, tmp_path, monkeypatch):
+    """rag_pipeline with a HashingEncoder and an empty embedding cache and registry, so builds need no model."""
+    from app.embedding_cache import EmbeddingCache
+    from app.index_registry import IndexRegistry
+    monkeypatch.setattr(rag_pipeline, "get_encoder", HashingEncoder)
+    monkeypatch.setattr(rag_pipeline, "embedding_cache",
+                        EmbeddingCache(str(tmp_path / "embeddings.sqlite"), "hashing", 100000))
+    monkeypatch.setattr(rag_pipeline, "registry",
+                        IndexRegistry(lambda codebase_id: rag_pipeline.CodebaseIndex(codebase_id).load(), 4, 1 << 30))
+    return rag_pipeline
+
+
+@pytest.fixture
+def main(indexer):
+    """app.main serving codebases indexed with the indexer fixture."""
+    from app import main
+    return main
+
+
+FUNCTION = """
+int {name}(int value) {{
+    int acc = 0;
+    for (int i = 0; i < value; ++i) {{
+        acc += (i * {factor}) % 997;
+    }}
+    return acc;
+}}
+"""
+
+
+def write_sources(root, files):
+    for path, names in files.items():
+        target = root / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text("".join(FUNCTION.format(name=name, factor=n + 3) for n, name in enumerate(names)))
+
+
+@pytest.fixture
+def sources(tmp_path):
+    root = tmp_path / "src"
+    write_sources(root, {
+        "a.c": ["alpha_sum", "alpha_scale"],
+        "b.c": ["beta_sum", "beta_mix"],
+        "lib/c.cpp": ["gamma_sum"],
+    })
+    return root
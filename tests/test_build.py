@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from tests.conftest import write_sources
+
+
+def contents(codebase):
+    return sorted((c["source"].replace(os.sep, "/").split("src/", 1)[1], c["content"]) for c in codebase.chunk_store)
+
+
+def test_incremental_build_matches_full_build(indexer, sources):
+    stats = indexer.process_and_store_local_code(str(sources), codebase_id="inc")
+    assert stats["chunks"] == stats["vectors"] > 0
+
+    write_sources(sources, {"a.c": ["alpha_sum", "alpha_changed"], "d.c": ["delta_sum"]})
+    os.remove(sources / "b.c")
+    stats = indexer.process_and_store_local_code(str(sources), codebase_id="inc")
+    assert (stats["updated"], stats["removed"]) == (2, 1)
+    indexer.process_and_store_local_code(str(sources), codebase_id="full", incremental=False)
+
+    incremental, full = indexer.get_codebase("inc"), indexer.get_codebase("full")
+    assert contents(incremental) == contents(full)
+    assert incremental.index.ntotal == full.index.ntotal == len(full.chunk_store)
+    assert not [name for name in os.listdir(incremental.store_dir) if name.endswith(".tmp")]
+
+
+def test_duplicate_is_promoted_when_its_canonical_copy_is_deleted(indexer, sources, monkeypatch):
+    monkeypatch.setattr(indexer, "DEDUP_CHUNKS", True)
+    write_sources(sources, {"vendor/a.c": ["alpha_sum", "alpha_scale"]})
+    stats = indexer.process_and_store_local_code(str(sources), codebase_id="dedup")
+    assert stats["duplicates"] == 2
+
+    os.remove(sources / "a.c")
+    write_sources(sources, {"e.c": ["alpha_sum"]})
+    stats = indexer.process_and_store_local_code(str(sources), codebase_id="dedup")
+    indexer.process_and_store_local_code(str(sources), codebase_id="full", incremental=False)
+
+    incremental, full = indexer.get_codebase("dedup"), indexer.get_codebase("full")
+    assert contents(incremental) == contents(full)
+    assert stats["vectors"] == incremental.index.ntotal == full.index.ntotal
+
+
+@pytest.mark.parametrize("incremental", [True, False])
+def test_deleting_every_file_commits_an_empty_build(indexer, sources, incremental):
+    indexer.process_and_store_local_code(str(sources), codebase_id="gone")
+    assert indexer.retrieve_relevant_chunks("alpha sum", codebase_id="gone")
+
+    for path in list(sources.rglob("*.c*")):
+        os.remove(path)
+    stats = indexer.process_and_store_local_code(str(sources), codebase_id="gone", incremental=incremental)
+
+    assert stats["chunks"] == stats["vectors"] == 0
+    codebase = indexer.get_codebase("gone")
+    assert codebase.index.ntotal == 0
+    assert indexer.retrieve_relevant_chunks("alpha sum", codebase_id="gone") == []
+    assert not [name for name in os.listdir(codebase.store_dir) if name.endswith(".tmp")]
+
+
+def test_failed_build_leaves_no_staged_files(indexer, sources, monkeypatch):
+    indexer.process_and_store_local_code(str(sources), codebase_id="failed")
+    served = indexer.get_codebase("failed")
+    write_sources(sources, {"d.c": ["delta_sum"]})
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(indexer.CodebaseIndex, "_build_symbol_index", fail)
+    with pytest.raises(OSError):
+        indexer.process_and_store_local_code(str(sources), codebase_id="failed")
+
+    assert not [name for name in os.listdir(served.store_dir) if name.endswith(".tmp")]
+    assert indexer.get_codebase("failed") is served
+
+
+def test_nothing_to_index_stages_nothing(indexer, tmp_path):
+    (tmp_path / "empty").mkdir()
+    assert indexer.process_and_store_local_code(str(tmp_path / "empty"), codebase_id="empty") is None
+    assert not os.listdir(indexer.CodebaseIndex("empty").store_dir)
+
+
+def test_rebuild_leaves_the_served_build_files_in_place(indexer, sources):
+    indexer.process_and_store_local_code(str(sources), codebase_id="swap")
+    first = indexer.get_codebase("swap")
+    stamps = {path: os.stat(path).st_mtime_ns for path in (first.index_file, first.chunk_blob_file)}
+
+    write_sources(sources, {"d.c": ["delta_sum"]})
+    indexer.process_and_store_local_code(str(sources), codebase_id="swap")
+    second = indexer.get_codebase("swap")
+    assert second.build_dir != first.build_dir
+    assert {path: os.stat(path).st_mtime_ns for path in stamps} == stamps
+    assert len(first.chunk_store) < len(second.chunk_store)
+
+    write_sources(sources, {"e.c": ["epsilon_sum"]})
+    indexer.process_and_store_local_code(str(sources), codebase_id="swap")
+    third = indexer.get_codebase("swap")
+    assert indexer.current_build_dir(third.store_dir) == third.build_dir
+    assert not os.path.exists(first.build_dir)
+    assert os.path.exists(second.build_dir)
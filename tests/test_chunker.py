@@ -0,0 +1,185 @@
+import pytest
+
+from app.chunker import BRACE_BODY_DEPTH, chunk_code
+
+
+def check_coverage(code, chunks):
+    """
+    Every non-whitespace byte of code, a file made only of definitions, lands in some
+    chunk, and chunk offsets match their content.
+    """
+    covered = bytearray(len(code))
+    for chunk in chunks:
+        assert code[chunk["start_byte"]:chunk["end_byte"]].strip() == chunk["content"]
+        assert code.count("\n", 0, chunk["start_byte"]) == chunk["start_line"]
+        covered[chunk["start_byte"]:chunk["end_byte"]] = b"\x01" * (chunk["end_byte"] - chunk["start_byte"])
+    missing = [i for i, char in enumerate(code) if not covered[i] and not char.isspace()]
+    assert not missing, code[missing[0]:missing[0] + 40]
+
+
+def symbols(chunks):
+    return [chunk["symbol"] for chunk in chunks]
+
+
+NESTED = """
+int outer(int x) {
+    if (x) {
+        while (x > 0) { x--; }
+    } else { x = 1; }
+    return x;
+}
+
+struct Point { int x; int y; };
+
+int after(void) { return 1; }
+"""
+
+CONTAINERS = """
+namespace geometry {
+class Shape {
+    double area() { return 0; }
+    struct Inner { int a; };
+};
+}
+"""
+
+BRACES_IN_STRINGS_AND_COMMENTS = r"""
+// a } in a comment before the function
+int quoted(void) {
+    puts("}");           /* } */
+    puts("\"{");         // }
+    char c = '}';
+    return c == '{';
+}
+
+const render = (name) => {
+    return `${name} }`;
+};
+
+int after(void) { return '\''; }
+"""
+
+UNTERMINATED_COMMENT = """
+int first(void) { return 1; }
+
+int truncated(void) {
+    /* the file ends inside this comment { }
+    return 2;
+}
+"""
+
+KR_STYLE = """
+int add(a, b)
+int a, b;
+{
+    return a + b;
+}
+
+static char *name_of(p)
+    struct person *p;   /* the person */
+{
+    return p->name;
+}
+
+int main(void) { return add(1, 2); }
+"""
+
+PREPROCESSOR_IN_BODY = """
+int configured(void) {
+#define BLOCK { }
+    int x = 0;
+#if defined(DEBUG)
+    x = 1;
+#endif
+    return x;
+}
+
+int after(void) { return 1; }
+"""
+
+
+@pytest.mark.parametrize("code, expected", [
+    (NESTED, ["outer", "Point", "after"]),
+    (BRACES_IN_STRINGS_AND_COMMENTS, ["quoted", "render", "after"]),
+    (UNTERMINATED_COMMENT, ["first", "truncated"]),
+    (KR_STYLE, ["add", "name_of", "main"]),
+    (PREPROCESSOR_IN_BODY, ["configured", "after"]),
+])
+def test_brace_units(code, expected):
+    chunks = chunk_code(code, "example.js" if "=>" in code else "example.cpp")
+    assert symbols(chunks) == expected
+    check_coverage(code, chunks)
+
+
+def test_containers_are_descended_into():
+    chunks = chunk_code(CONTAINERS, "example.cpp")
+    assert symbols(chunks) == ["area", "Inner"]
+    assert chunks[1]["content"] == "struct Inner { int a; };"
+
+
+EXTERN_C = """
+extern "C" {
+int c_add(int a, int b) { return a + b; }
+int c_sub(int a, int b) { return a - b; }
+}
+"""
+
+EXTERN_C_HEADER = """#ifndef MATH_H
+#define MATH_H
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+int c_add(int a, int b);
+static inline int c_twice(int a) { return a * 2; }
+static inline int c_half(int a) { return a / 2; }
+
+#ifdef __cplusplus
+}
+#endif
+#endif
+"""
+
+
+@pytest.mark.parametrize("code, expected", [(EXTERN_C, ["c_add", "c_sub"]),
+                                            (EXTERN_C_HEADER, ["c_twice", "c_half"])])
+def test_extern_c_blocks_are_descended_into(code, expected):
+    chunks = chunk_code(code, "math.h")
+    assert symbols(chunks) == expected
+    assert all(chunk["content"].startswith(("int ", "static inline")) for chunk in chunks)
+
+
+def test_unterminated_comment_runs_to_the_end_of_the_file():
+    chunks = chunk_code(UNTERMINATED_COMMENT, "example.c")
+    assert chunks[-1]["end_byte"] == len(UNTERMINATED_COMMENT)
+
+
+def test_kr_parameter_declarations_belong_to_the_definition():
+    chunks = chunk_code(KR_STYLE, "example.c")
+    assert chunks[0]["signature"] == "int add(a, b) int a, b;"
+    assert chunks[1]["content"].startswith("static char *name_of(p)\n    struct person *p;")
+
+
+def test_kr_lookalikes_still_end_the_declaration():
+    code = "DECLARE_TABLE(users)\nint count;\nint proto(a, b) ;\nint main(void) { return 0; }\n"
+    assert [chunk["signature"] for chunk in chunk_code(code, "example.c")] == ["int main(void)"]
+
+
+def test_bodies_nested_deeper_than_the_single_match_limit():
+    depth = BRACE_BODY_DEPTH + 3
+    code = "int deep(void) " + "{ x;\n" * depth + "}\n" * depth + "int after(void) { return 1; }\n"
+    chunks = chunk_code(code, "example.c")
+    assert symbols(chunks) == ["deep", "after"]
+    check_coverage(code, chunks)
+
+
+def test_python_units_cover_the_file():
+    code = (
+        "import os\n\n"
+        "def top(a,\n        b):\n    return '''\ndef not_a_function():\n'''\n\n"
+        "class Holder:\n    @property\n    def value(self):\n        return os.sep\n\n"
+        "    async def fetch(self):\n        pass\n"
+    )
+    chunks = chunk_code(code, "example.py")
+    assert symbols(chunks) == ["top", "value", "fetch"]
+    assert chunks[1]["content"].startswith("@property")
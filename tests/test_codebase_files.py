@@ -0,0 +1,119 @@
+import pathlib
+
+import pytest
+
+from tests.conftest import FUNCTION, write_sources
+
+FILES = {
+    "a.c": ["alpha_sum", "alpha_scale"],
+    "lib/b.cpp": ["beta_sum"],
+    "lib/c.h": ["gamma_sum"],
+    "src/lib_util.c": ["delta_sum"],
+}
+
+
+@pytest.fixture
+def client(main):
+    from fastapi.testclient import TestClient
+    write_sources(pathlib.Path(main.rag_pipeline.codebase_source_dir("listed")), FILES)
+    main.rag_pipeline.process_and_store_local_code(codebase_id="listed")
+    return TestClient(main.app)
+
+
+def listing(client, **params):
+    response = client.get("/list_codebase", params={"codebase_id": "listed", **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+def paths(page):
+    return [f["path"] for f in page["files"]]
+
+
+def test_listing_is_metadata_only_and_paged(client):
+    page = listing(client)
+    assert paths(page) == sorted(FILES)
+    assert page["total"] == 4
+    assert set(page["files"][0]) == {"name", "path", "type", "size", "mtime", "chunks"}
+    assert page["files"][0]["chunks"] == 2
+
+    page = listing(client, offset=1, limit=2)
+    assert paths(page) == ["lib/b.cpp", "lib/c.h"]
+    assert (page["total"], page["offset"], page["limit"]) == (4, 1, 2)
+    assert paths(listing(client, offset=10)) == []
+
+
+def test_page_size_is_bounded(main, client):
+    assert listing(client, limit=main.LIST_MAX_PAGE_SIZE)["limit"] == main.LIST_MAX_PAGE_SIZE
+    for limit in (main.LIST_MAX_PAGE_SIZE + 1, 0):
+        assert client.get("/list_codebase", params={"codebase_id": "listed", "limit": limit}).status_code == 422
+    assert client.get("/list_codebase", params={"codebase_id": "listed", "offset": -1}).status_code == 422
+
+
+def test_listing_filters(client):
+    assert paths(listing(client, type=".C")) == ["a.c", "src/lib_util.c"]
+    assert paths(listing(client, path_prefix="lib/")) == ["lib/b.cpp", "lib/c.h"]
+    assert paths(listing(client, q="LIB")) == ["lib/b.cpp", "lib/c.h", "src/lib_util.c"]
+    page = listing(client, type="c", q="lib")
+    assert paths(page) == ["src/lib_util.c"] and page["total"] == 1
+
+
+def test_unchanged_listing_and_files_answer_304(main, client):
+    response = client.get("/list_codebase", params={"codebase_id": "listed"})
+    etag = response.headers["etag"]
+    for url, params in (("/list_codebase", {}), ("/codebase_file", {"path": "a.c"})):
+        params = {"codebase_id": "listed", **params}
+        for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+            response = client.get(url, params=params, headers={"If-None-Match": header})
+            assert response.status_code == 304 and not response.content
+        assert client.get(url, params=params, headers={"If-None-Match": '"other"'}).status_code == 200
+
+    write_sources(pathlib.Path(main.rag_pipeline.codebase_source_dir("listed")), {"a.c": ["alpha_changed"]})
+    main.rag_pipeline.process_and_store_local_code(codebase_id="listed")
+    response = client.get("/list_codebase", params={"codebase_id": "listed"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+
+
+def test_file_content_and_line_ranges(client):
+    def read(**params):
+        response = client.get("/codebase_file", params={"codebase_id": "listed", "path": "lib/c.h", **params})
+        assert response.status_code == 200
+        return response.json()["content"]
+
+    content = FUNCTION.format(name="gamma_sum", factor=3)
+    lines = content.splitlines(keepends=True)
+    assert read() == content
+    assert read(start_line=2, end_line=3) == "".join(lines[1:3])
+    assert read(start_line=len(lines)) == lines[-1]
+    assert read(start_line=len(lines) + 5) == ""
+    response = client.get("/codebase_file", params={"codebase_id": "listed", "path": "lib/c.h",
+                                                    "start_line": 3, "end_line": 2})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("path", ["../other/a.c", "lib/../../other/a.c", "/etc/passwd", ".", "lib/.."])
+def test_paths_outside_the_upload_folder_are_rejected(main, client, path):
+    other = pathlib.Path(main.rag_pipeline.codebase_source_dir("other"))
+    write_sources(other, {"a.c": ["secret_sum"]})
+    response = client.get("/codebase_file", params={"codebase_id": "listed", "path": path})
+    assert response.status_code == 400
+    assert "secret_sum" not in response.text
+
+
+def test_symlinks_out_of_the_upload_folder_are_rejected(main, client, tmp_path):
+    (tmp_path / "secret.c").write_text("int secret_sum;\n")
+    link = pathlib.Path(main.rag_pipeline.codebase_source_dir("listed")) / "link.c"
+    try:
+        link.symlink_to(tmp_path / "secret.c")
+    except OSError:
+        pytest.skip("symlinks are not available")
+    response = client.get("/codebase_file", params={"codebase_id": "listed", "path": "link.c"})
+    assert response.status_code == 400
+
+
+def test_missing_files_and_unknown_codebases(client):
+    response = client.get("/codebase_file", params={"codebase_id": "listed", "path": "missing.c"})
+    assert response.status_code == 404
+    page = client.get("/list_codebase", params={"codebase_id": "nothing"}).json()
+    assert (page["total"], page["index_version"]) == (0, None)
+    assert client.get("/list_codebase", params={"codebase_id": "../listed"}).status_code == 400
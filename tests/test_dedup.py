@@ -0,0 +1,84 @@
+import os
+
+from app.dedup import Deduplicator, fingerprint
+from tests.conftest import write_sources
+
+BODY = """
+int checksum(const unsigned char *data, int length) {
+    int acc = 0;
+    for (int i = 0; i < length; ++i) {
+        acc = (acc * 31 + data[i]) % 65521;
+    }
+    return acc;
+}
+"""
+
+
+def test_whitespace_only_differences_share_a_content_hash():
+    reindented = BODY.replace("    ", "\t").replace("\n", "\r\n") + "\n\n"
+    assert fingerprint(BODY) == fingerprint(reindented)
+    assert fingerprint(BODY)[0] != fingerprint(BODY.replace("31", "33"))[0]
+
+    dedup = Deduplicator()
+    dedup.add(1, *fingerprint(BODY), "checksum")
+    assert dedup.find(*fingerprint(reindented), "checksum") == 1
+    assert dedup.find(*fingerprint(reindented), "other") == 1
+
+
+def test_near_duplicates_need_a_close_simhash_and_the_same_symbol():
+    dedup = Deduplicator(max_distance=3)
+    dedup.add(1, "h1", "0000000000000000", "checksum")
+    assert dedup.find("h2", "0000000000000007", "checksum") == 1
+    assert dedup.find("h2", "000000000000000f", "checksum") is None
+    assert dedup.find("h2", "0000000000000007", "crc") is None
+    assert Deduplicator(max_distance=0).find("h2", "0000000000000001", "checksum") is None
+
+
+def test_short_chunks_are_only_matched_exactly():
+    content_hash, simhash = fingerprint(BODY, min_tokens=1000)
+    assert simhash is None
+    assert fingerprint(BODY, min_tokens=8)[1] is not None
+
+    dedup = Deduplicator()
+    dedup.add(1, content_hash, simhash, "checksum")
+    assert dedup.find(content_hash, None, "checksum") == 1
+    assert dedup.find("other", None, "checksum") is None
+
+
+def test_retrieved_chunks_list_capped_duplicates_without_fingerprints(indexer, sources, monkeypatch):
+    monkeypatch.setattr(indexer, "DEDUP_CHUNKS", True)
+    monkeypatch.setattr(indexer, "DEDUP_LISTED_LOCATIONS", 1)
+    for vendor in ("vendor", "third_party", "extern"):
+        write_sources(sources, {f"{vendor}/a.c": ["alpha_sum", "alpha_scale"]})
+    indexer.process_and_store_local_code(str(sources), codebase_id="dedup")
+
+    chunks = indexer.retrieve_relevant_chunks("alpha_sum value acc", 10, -1.0, codebase_id="dedup")
+    canonical = [c for c in chunks if "duplicates" in c]
+    assert canonical
+    for chunk in chunks:
+        assert "content_hash" not in chunk and "simhash" not in chunk
+    for chunk in canonical:
+        assert chunk["duplicate_count"] == 3
+        assert len(chunk["duplicates"]) == 1
+
+
+def test_deleting_a_duplicate_drops_it_from_its_canonical_chunk(indexer, sources, monkeypatch):
+    monkeypatch.setattr(indexer, "DEDUP_CHUNKS", True)
+    write_sources(sources, {"vendor/a.c": ["alpha_sum", "alpha_scale"], "vendor/b.c": ["beta_sum"]})
+    stats = indexer.process_and_store_local_code(str(sources), codebase_id="dedup")
+    assert stats["duplicates"] == 3
+
+    os.remove(sources / "vendor" / "a.c")
+    stats = indexer.process_and_store_local_code(str(sources), codebase_id="dedup")
+    assert stats["duplicates"] == 1
+    indexer.process_and_store_local_code(str(sources), codebase_id="full", incremental=False)
+
+    def duplicates(codebase):
+        return sorted(
+            (os.path.basename(c["source"]), c["symbol"], [os.path.relpath(d["source"], sources) for d in c["duplicates"]])
+            for c in codebase.chunk_store if "duplicates" in c
+        )
+
+    incremental, full = indexer.get_codebase("dedup"), indexer.get_codebase("full")
+    assert duplicates(incremental) == duplicates(full) == [("b.c", "beta_sum", [os.path.join("vendor", "b.c")])]
+    assert stats["vectors"] == incremental.index.ntotal == full.index.ntotal
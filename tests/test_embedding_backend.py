@@ -0,0 +1,20 @@
+import pytest
+
+from app.embedding_backend import BucketedEncoder
+
+
+class RenamedModel:
+    """A sentence-transformers 6 model: only the new name of the dimension getter exists."""
+
+    def get_embedding_dimension(self):
+        return 384
+
+
+class LegacyModel:
+    def get_sentence_embedding_dimension(self):
+        return 768
+
+
+@pytest.mark.parametrize("model, dimension", [(RenamedModel(), 384), (LegacyModel(), 768)])
+def test_dimension_is_read_under_either_name(model, dimension):
+    assert BucketedEncoder(model, 1024, 32).dimension == dimension
@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from app.embedding_cache import EmbeddingCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_cache_file_is_opened_on_first_use(tmp_path):
+    path = tmp_path / "cache" / "embeddings.sqlite"
+    cache = EmbeddingCache(str(path), "model", 10)
+    assert not path.exists()
+    assert cache.stats()["entries"] is None
+
+    assert cache.get_many(["a"]) == [None]
+    assert path.exists()
+    cache.put_many(["a", "b"], np.eye(2, dtype=np.float32))
+    assert [v.tolist() for v in cache.get_many(["b", "a"])] == [[0.0, 1.0], [1.0, 0.0]]
+    assert cache.stats() == {"hits": 2, "misses": 1, "hit_rate": 0.667, "entries": 2}
+    assert EmbeddingCache(str(path), "model", 10).get_many(["a"])[0].tolist() == [1.0, 0.0]
+    assert EmbeddingCache(str(path), "other model", 10).get_many(["a"]) == [None]
+
+
+def test_least_recently_used_embeddings_are_evicted(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"), "model", 2)
+    cache.put_many(["a"], [[1.0]])
+    cache.put_many(["b"], [[2.0]])
+    cache.get_many(["a"])
+    cache.put_many(["c"], [[3.0]])
+    assert [v is not None for v in cache.get_many(["a", "b", "c"])] == [True, False, True]
+    assert cache.stats()["entries"] == 2
+
+
+def test_importing_the_pipeline_creates_no_cache_file(tmp_path):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    subprocess.run([sys.executable, "-c", "import app.rag_pipeline"], cwd=tmp_path, env=env, check=True)
+    assert not (tmp_path / "vector_store").exists()
@@ -0,0 +1,47 @@
+import pytest
+
+from frontend import db
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "pool", db.ConnectionPool(str(tmp_path / "test.db"), 2))
+    yield db
+    db.pool.close()
+
+
+def add_users(database):
+    ids = [database.create_user(name, f"{name}@example.com", "x") for name in ("ann", "bob")]
+    for user_id, name in zip(ids, ("ann", "bob")):
+        database.replace_user_files(user_id, [
+            {"name": f"{name}.c", "content": f"int parse_config(void) {{ return {name}_value; }}", "type": "c"},
+            {"name": f"{name}_util.c", "content": "void helper(void) {}", "type": "c"},
+        ])
+    return ids
+
+
+def test_search_only_returns_the_users_files(database):
+    database.init_db()
+    ann, bob = add_users(database)
+    assert [row["filename"] for row in database.search_user_files(ann, "parse_config")] == ["ann.c"]
+    assert [row["filename"] for row in database.search_user_files(bob, "parse_config")] == ["bob.c"]
+    assert database.search_user_files(bob, "ann_value") == []
+
+
+def test_fts_index_without_user_id_is_recreated(database):
+    with database.pool.connection() as conn, conn:
+        for statement in database.SCHEMA:
+            conn.execute(statement)
+        conn.execute("""CREATE VIRTUAL TABLE user_files_fts USING fts5(
+                            filename, content, content='user_files', content_rowid='id')""")
+        conn.execute("""CREATE TRIGGER user_files_ai AFTER INSERT ON user_files BEGIN
+                            INSERT INTO user_files_fts (rowid, filename, content)
+                            VALUES (new.id, new.filename, new.content);
+                        END""")
+    ann, bob = add_users(database)
+
+    database.init_db()
+    assert [row["filename"] for row in database.search_user_files(ann, "parse_config")] == ["ann.c"]
+    database.replace_user_files(bob, [{"name": "new.c", "content": "int fresh_symbol;", "type": "c"}])
+    assert [row["filename"] for row in database.search_user_files(bob, "fresh_symbol")] == ["new.c"]
+    assert database.search_user_files(bob, "parse_config") == []
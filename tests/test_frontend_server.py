@@ -0,0 +1,84 @@
+import os
+import time
+
+import pytest
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frontend")
+SOURCE = "int {name}(int value) {{\n    return value * 3 + 1;\n}}\n"
+
+
+@pytest.fixture
+def server(indexer, tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(FRONTEND_DIR)
+    import db
+    import server
+    monkeypatch.setattr(db, "pool", db.ConnectionPool(str(tmp_path / "test.db"), 2))
+    db.init_db()
+    return server
+
+
+@pytest.fixture
+def client(server):
+    client = server.app.test_client()
+    response = client.post("/api/signup", json={"name": "ann", "email": "ann@example.com", "password": "pw"})
+    client.user_id = response.get_json()["user"]["id"]
+    return client
+
+
+def upload(client, names):
+    files = [{"name": f"{name}.c", "content": SOURCE.format(name=name), "type": "c"} for name in names]
+    response = client.post("/api/upload-files", json={"files": files})
+    assert response.status_code == 202
+    for _ in range(300):
+        status = client.get(response.get_json()["status_url"]).get_json()
+        if status["finished_at"]:
+            return status
+        time.sleep(0.05)
+    raise AssertionError("indexing did not finish")
+
+
+def test_failed_indexing_keeps_the_previous_sources(server, client, monkeypatch):
+    assert upload(client, ["alpha_sum"])["status"] == "done"
+    source_dir = server.rag_pipeline.codebase_source_dir(server.user_codebase(client.user_id))
+    assert os.listdir(source_dir) == ["alpha_sum.c"]
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(server.rag_pipeline, "process_and_store_local_code", fail)
+    assert upload(client, ["beta_sum"])["status"] == "failed"
+    assert os.listdir(source_dir) == ["alpha_sum.c"]
+    assert sorted(os.listdir(os.path.dirname(source_dir))) == [os.path.basename(source_dir)]
+
+
+def test_chat_top_k_is_clamped(server, client, monkeypatch):
+    upload(client, ["alpha_sum"])
+    requested = []
+    retrieve = server.rag_pipeline.retrieve_relevant_chunks
+    monkeypatch.setattr(server.rag_pipeline, "retrieve_relevant_chunks",
+                        lambda query, k, **kwargs: requested.append(k) or retrieve(query, k=k, **kwargs))
+    monkeypatch.setattr(server.llm_module, "generate_answer", lambda query, chunks, **kwargs: "answer")
+
+    assert client.post("/api/chat", json={"query": "alpha sum", "top_k": 100000}).status_code == 200
+    assert client.post("/api/chat", json={"query": "alpha sum", "top_k": "many"}).status_code == 400
+    assert requested == [server.CHAT_MAX_TOP_K]
+
+
+def test_chat_rejects_or_clamps_bad_sampling_parameters(server, client, monkeypatch):
+    upload(client, ["alpha_sum"])
+    requested = []
+    monkeypatch.setattr(server.rag_pipeline, "retrieve_relevant_chunks",
+                        lambda query, k, similarity_threshold, **kwargs: requested.append(similarity_threshold) or [])
+    monkeypatch.setattr(server.llm_module, "generate_answer",
+                        lambda query, chunks, temperature: requested.append(temperature) or "answer")
+
+    def chat(**params):
+        return client.post("/api/chat", json={"query": "alpha sum", **params}).status_code
+
+    assert chat(similarity_threshold=2, temperature=-1) == 200
+    assert chat(similarity_threshold="-5", temperature=9) == 200
+    assert requested == [1.0, 0.0, -1.0, server.CHAT_MAX_TEMPERATURE]
+    for bad in ("high", None, [0.5], "nan"):
+        assert chat(similarity_threshold=bad) == 400
+        assert chat(temperature=bad) == 400
+    assert len(requested) == 4
@@ -0,0 +1,81 @@
+import pytest
+
+from app.index_registry import IndexRegistry, validate_codebase_id
+
+
+class Entry:
+    def __init__(self, codebase_id, size):
+        self.codebase_id = codebase_id
+        self.size = size
+
+    def memory_bytes(self):
+        return self.size
+
+
+def registry(max_resident, memory_budget, sizes=None):
+    sizes = sizes or {}
+    return IndexRegistry(lambda codebase_id: Entry(codebase_id, sizes.get(codebase_id, 1)),
+                         max_resident, memory_budget)
+
+
+def resident(registry):
+    return [codebase_id for codebase_id, _ in registry.resident()]
+
+
+def test_least_recently_used_codebase_is_evicted_beyond_max_resident():
+    lru = registry(2, 1 << 30)
+    a = lru.get("a")
+    lru.get("b")
+    assert lru.get("a") is a
+    lru.get("c")
+    assert resident(lru) == ["a", "c"]
+    assert lru.stats()["evictions"] == 1
+
+
+def test_codebases_are_evicted_beyond_the_memory_budget():
+    lru = registry(10, 100, {"a": 60, "b": 30, "c": 50, "huge": 500})
+    lru.get("a")
+    lru.get("b")
+    assert resident(lru) == ["a", "b"]
+    lru.get("c")
+    assert resident(lru) == ["b", "c"]
+    lru.get("huge")
+    assert resident(lru) == ["huge"]  # the most recently used entry is kept even over budget
+    assert lru.stats()["resident_bytes"] == 500
+
+
+def test_evicted_codebase_is_loaded_again_on_its_next_use():
+    lru = registry(1, 1 << 30)
+    a = lru.get("a")
+    lru.get("b")
+    assert lru.peek("a") is None
+    reloaded = lru.get("a")
+    assert reloaded is not a and reloaded.codebase_id == "a"
+    assert (lru.stats()["loads"], lru.stats()["hits"]) == (3, 0)
+
+
+@pytest.mark.parametrize("codebase_id", ["", "..", "a/b", "../etc", ".hidden", "x" * 65, None])
+def test_invalid_codebase_ids_are_rejected(codebase_id):
+    with pytest.raises(ValueError):
+        validate_codebase_id(codebase_id)
+
+
+def test_pipeline_reloads_evicted_codebases_from_disk(indexer, sources, monkeypatch):
+    lru = IndexRegistry(lambda codebase_id: indexer.CodebaseIndex(codebase_id).load(), 1, 1 << 30)
+    monkeypatch.setattr(indexer, "registry", lru)
+    indexer.process_and_store_local_code(str(sources), codebase_id="first")
+    indexer.process_and_store_local_code(str(sources), codebase_id="second")
+    assert resident(lru) == ["second"]
+
+    first = indexer.get_codebase("first")
+    assert resident(lru) == ["first"] and lru.stats()["loads"] == 1
+    assert indexer.retrieve_relevant_chunks("alpha_sum", 1, codebase_id="first")[0]["symbol"] == "alpha_sum"
+    assert indexer.get_codebase("first") is first
+
+
+@pytest.mark.parametrize("codebase_id, status", [("../etc", 400), ("a/b", 400), ("missing", 404)])
+def test_api_rejects_invalid_and_unknown_codebases(main, codebase_id, status):
+    from fastapi.testclient import TestClient
+    client = TestClient(main.app)
+    assert client.post("/ask_model", json={"question": "why", "codebase_id": codebase_id}).status_code == status
+    assert client.get("/diagrams/includes", params={"codebase_id": codebase_id}).status_code == status
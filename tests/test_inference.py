@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.inference import InferencePool, QueueFullError
+
+
+def _ticks(count, started, stop):
+    started.set()
+    for n in range(count):
+        if stop.wait(0.01):
+            return
+        yield n
+
+
+def test_stream_yields_items_in_order():
+    async def main():
+        pool = InferencePool(workers=1, max_queue=0, timeout=5)
+        items = [item async for item in pool.stream(_ticks, 5, threading.Event())]
+        assert items == [0, 1, 2, 3, 4]
+        assert pool.stats()["completed"] == 1
+
+    asyncio.run(main())
+
+
+def test_stream_is_admitted_by_the_pool():
+    async def main():
+        pool = InferencePool(workers=1, max_queue=0, timeout=5)
+        events = pool.stream(_ticks, 1000, threading.Event())
+        with pytest.raises(QueueFullError):
+            pool.stream(_ticks, 1000, threading.Event())
+        await events.aclose()
+
+    asyncio.run(main())
+
+
+def test_stream_stops_the_producer_on_timeout_and_disconnect():
+    async def main():
+        pool = InferencePool(workers=2, max_queue=0, timeout=0.2)
+        started = threading.Event()
+        with pytest.raises(asyncio.TimeoutError):
+            async for _ in pool.stream(_ticks, 1000, started):
+                pass
+        assert pool.stats()["timed_out"] == 1
+
+        events = pool.stream(_ticks, 1000, started)
+        await events.__anext__()
+        await events.aclose()
+        for _ in range(100):
+            if pool.stats()["active"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert pool.stats()["active"] == 0
+        assert pool.stats()["completed"] == 2
+
+    asyncio.run(main())
+
+
+def test_failing_call_does_not_fail_its_batch():
+    from app.inference import MicroBatcher
+
+    def batch_fn(calls):
+        if any(value < 0 for (value,) in calls):
+            raise ValueError("negative")
+        return [value * 2 for (value,) in calls]
+
+    batcher = MicroBatcher(batch_fn, max_size=4, window_ms=50)
+    futures = [batcher.submit((value,)) for value in (1, -1, 3)]
+    assert futures[0].result(timeout=5) == 2
+    assert futures[2].result(timeout=5) == 6
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=5)
+
+
+def test_batched_pool_admits_calls_without_a_thread_pool():
+    from app.inference import MicroBatcher
+
+    async def main():
+        pool = InferencePool(workers=2, max_queue=0, timeout=5)
+        batcher = MicroBatcher(lambda calls: [value * 2 for (value,) in calls], max_size=2, window_ms=50)
+        assert await asyncio.gather(pool.run_batched(batcher, 1), pool.run_batched(batcher, 2)) == [2, 4]
+        assert pool.stats()["completed"] == 2
+        assert pool._executor is None
+
+    asyncio.run(main())
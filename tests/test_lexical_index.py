@@ -0,0 +1,109 @@
+import math
+import re
+
+import faiss
+import numpy as np
+import pytest
+
+from app.lexical_index import LexicalIndex, reciprocal_rank_fusion
+
+CHUNKS = [
+    {"id": 3, "content": "int ring_push(Ring *ring, int value) { ring->items[ring->head++] = value; }",
+     "signature": "int ring_push(Ring *ring, int value)"},
+    {"id": 7, "content": "int ring_pop(Ring *ring) { return ring->items[--ring->head]; }",
+     "signature": "int ring_pop(Ring *ring)"},
+    {"id": 9, "content": "void log_value(int value) { printf(\"%d\", value); }",
+     "signature": "void log_value(int value)"},
+    {"id": 12, "content": "int ring_pop(Ring *ring) { return ring->items[--ring->head]; }",
+     "signature": "int ring_pop(Ring *ring)", "duplicate_of": 7},
+]
+
+
+def bm25(query_terms, doc, k1=1.2, b=0.75):
+    """Textbook BM25 over the tokenized chunks, for comparison."""
+    from app.utils import tokenize_code
+    docs = [tokenize_code(c["content"]) for c in CHUNKS if "duplicate_of" not in c]
+    avg_length = sum(map(len, docs)) / len(docs)
+    score = 0.0
+    for term in set(query_terms):
+        df = sum(term in d for d in docs)
+        tf = docs[doc].count(term)
+        if not tf:
+            continue
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(docs[doc]) / avg_length))
+    return score
+
+
+def test_bm25_scores_match_the_formula():
+    index = LexicalIndex.build(CHUNKS)
+    results = index.search("pop the ring value", 3)
+    assert [chunk_id for chunk_id, _ in results] == [7, 3, 9]
+    positions = {3: 0, 7: 1, 9: 2}
+    for chunk_id, score in results:
+        assert score == pytest.approx(bm25(["pop", "the", "ring", "value"], positions[chunk_id]), rel=1e-5)
+
+
+def test_duplicates_share_the_postings_of_their_canonical_chunk():
+    index = LexicalIndex.build(CHUNKS)
+    assert list(index.doc_ids) == [3, 7, 9]
+    assert index.lookup_symbol("ring_pop") == [7]
+
+
+def test_saved_index_loads_the_same_postings(tmp_path):
+    index = LexicalIndex.build(CHUNKS)
+    index.save(str(tmp_path / "lexical_index.npz"))
+    loaded = LexicalIndex.load(str(tmp_path / "lexical_index.npz"))
+
+    for name in ("doc_ids", "doc_lengths", "terms", "term_offsets", "postings", "frequencies",
+                 "symbols", "symbol_offsets", "symbol_postings"):
+        assert np.array_equal(getattr(loaded, name), getattr(index, name)), name
+    assert loaded.search("ring items head", 3) == index.search("ring items head", 3)
+    assert loaded.lookup_symbol("log_value") == [9]
+
+
+def test_reciprocal_rank_fusion_prefers_ids_ranked_by_several_lists():
+    # 1: 1/61 + 1/62, 3: 1/63 + 1/61, 5: 1/61, then 2: 1/62
+    assert reciprocal_rank_fusion([[1, 2, 3], [3, 1], [5, 4]], 3, rrf_k=60) == [1, 3, 5]
+
+
+class ProseEncoder:
+    """
+    Embeds only a few English words, like a general-purpose model that has no idea what a
+    code identifier means: "checked" and "verify" are neighbours, identifiers are noise.
+    """
+
+    dimension = 8
+    CONCEPTS = {"checked": 0, "verify": 0, "verified": 0, "verifies": 0}
+
+    def encode(self, texts, normalize=False):
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        vectors[:, -1] = 0.1
+        for row, text in enumerate(texts):
+            for word in re.findall(r"[a-z]+", text.lower()):
+                if word in self.CONCEPTS:
+                    vectors[row, self.CONCEPTS[word]] += 1
+        if normalize:
+            faiss.normalize_L2(vectors)
+        return vectors
+
+
+def test_exact_identifier_outranks_closer_embeddings_after_fusion(indexer, tmp_path, monkeypatch):
+    root = tmp_path / "src"
+    root.mkdir()
+    (root / "ring.c").write_text(
+        "int drain(Ring *ring, int n) {\n    if (n > RING_CAPACITY_LIMIT) return 0;\n    return n;\n}\n")
+    for n in range(5):
+        (root / f"check{n}.c").write_text(
+            f"/* verify the input; verified here, verify again */\nint verify_{n}(int x) {{ return x; }}\n")
+    monkeypatch.setattr(indexer, "get_encoder", ProseEncoder)
+    indexer.process_and_store_local_code(str(root), codebase_id="rrf")
+    query = "where is RING_CAPACITY_LIMIT checked"
+
+    monkeypatch.setattr(indexer, "HYBRID_RETRIEVAL", False)
+    vector_only = indexer.retrieve_relevant_chunks(query, k=3, codebase_id="rrf")
+    assert "RING_CAPACITY_LIMIT" not in " ".join(c["content"] for c in vector_only)
+
+    monkeypatch.setattr(indexer, "HYBRID_RETRIEVAL", True)
+    fused = indexer.retrieve_relevant_chunks(query, k=3, codebase_id="rrf")
+    assert "RING_CAPACITY_LIMIT" in fused[0]["content"]
@@ -0,0 +1,113 @@
+import re
+
+import pytest
+
+from app import metrics
+
+# One sample line of the text exposition format: name, optional {labels}, value
+SAMPLE = re.compile(r'([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_]\w*="(?:\\[\\"n]|[^\\"\n])*",?)*\})? (\S+)$')
+LABEL = re.compile(r'([a-zA-Z_]\w*)="((?:\\[\\"n]|[^\\"\n])*)"')
+
+
+def parse(text):
+    """{family: {"type", "help", "samples": [(name, {label: value}, value)]}}; asserts the text is well formed."""
+    assert text.endswith("\n")
+    families = {}
+    family = None
+    for line in text[:-1].split("\n"):
+        if line.startswith("# HELP "):
+            name, help = line[7:].split(" ", 1)
+            assert name not in families, f"{name} declared twice"
+            family = families[name] = {"help": help, "samples": []}
+        elif line.startswith("# TYPE "):
+            name, kind = line[7:].split(" ")
+            assert family is families.get(name) and kind in ("counter", "gauge", "histogram", "summary", "untyped")
+            family["type"] = kind
+        else:
+            match = SAMPLE.match(line)
+            assert match, f"malformed sample: {line!r}"
+            name, labels, value = match.groups()
+            suffixes = ("_bucket", "_sum", "_count") if family["type"] == "histogram" else ("",)
+            assert any(name == family_name + suffix for suffix in suffixes
+                       for family_name in families if families[family_name] is family)
+            float(value.replace("+Inf", "inf"))
+            family["samples"].append((name, dict(LABEL.findall(labels or "")), value))
+    return families
+
+
+def histogram_series(family, **labels):
+    """(bucket counts by le, sum, count) of one label set of a histogram family."""
+    buckets, total, count = {}, None, None
+    for name, sample_labels, value in family["samples"]:
+        le = sample_labels.pop("le", None)
+        if sample_labels != labels:
+            continue
+        if name.endswith("_bucket"):
+            buckets[le] = float(value)
+        elif name.endswith("_sum"):
+            total = float(value)
+        else:
+            count = float(value)
+    return buckets, total, count
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Metrics created in a test are dropped afterwards."""
+    monkeypatch.setattr(metrics, "_metrics", list(metrics._metrics))
+    monkeypatch.setattr(metrics, "_collectors", list(metrics._collectors))
+
+
+def test_histograms_render_cumulative_buckets_sum_and_count(registry):
+    latency = metrics.Histogram("test_latency_seconds", "Test latency.", ("route",), buckets=(0.1, 1))
+    for seconds in (0.05, 0.5, 0.5, 3):
+        latency.observe(seconds, route="/a")
+
+    family = parse(metrics.render())["test_latency_seconds"]
+    assert (family["type"], family["help"]) == ("histogram", "Test latency.")
+    buckets, total, count = histogram_series(family, route="/a")
+    assert buckets == {"0.1": 1, "1.0": 3, "+Inf": 4}
+    assert (total, count) == (pytest.approx(4.05), 4)
+
+
+def test_label_values_are_escaped(registry):
+    counter = metrics.Counter("test_requests_total", "Test requests.", ("path",))
+    counter.inc(path='C:\\src\\"quoted"\nnext')
+
+    text = metrics.render()
+    assert 'test_requests_total{path="C:\\\\src\\\\\\"quoted\\"\\nnext"} 1.0\n' in text
+    assert parse(text)["test_requests_total"]["samples"] == [
+        ("test_requests_total", {"path": 'C:\\\\src\\\\\\"quoted\\"\\nnext'}, "1.0")]
+
+
+def test_collectors_render_as_their_own_families(registry):
+    metrics.collector(lambda: [("test_depth", "gauge", "Test depth.", ("pool",), [(("ask",), 3)])])
+    family = parse(metrics.render())["test_depth"]
+    assert family["type"] == "gauge"
+    assert family["samples"] == [("test_depth", {"pool": "ask"}, "3.0")]
+
+
+def test_a_request_records_its_stages(main, sources, monkeypatch):
+    from fastapi.testclient import TestClient
+    main.rag_pipeline.process_and_store_local_code(str(sources), codebase_id="timed")
+    monkeypatch.setattr(main.llm_module, "generate_answer", lambda question, chunks, temperature: "answer")
+    monkeypatch.setattr(main.llm_module, "generate_answers",
+                        lambda questions, chunks, temperature: ["answer"] * len(questions))
+    client = TestClient(main.app)
+
+    def counts():
+        families = parse(client.get("/metrics").text)
+        stages = families["rag_stage_seconds"]
+        requests = families["http_request_seconds"]
+        return ({stage: histogram_series(stages, stage=stage)[2]
+                 for stage in {labels["stage"] for _, labels, _ in stages["samples"]}},
+                histogram_series(requests, method="POST", route="/ask_model", status="200")[2] or 0)
+
+    stages_before, requests_before = counts()
+    response = client.post("/ask_model", json={"question": "how is alpha summed", "codebase_id": "timed"})
+    assert response.status_code == 200
+    stages, requests = counts()
+    for stage in ("embed_query", "vector_search"):
+        assert stages[stage] == stages_before.get(stage, 0) + 1
+    assert requests == requests_before + 1
+    assert client.get("/metrics").headers["content-type"].startswith("text/plain; version=0.0.4")
@@ -0,0 +1,85 @@
+import numpy as np
+
+from app import query_cache
+from app.query_cache import QueryCache, normalize_question
+from tests.conftest import write_sources
+
+PARAMS = ("default", 5, 0.3, 0.2)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_questions_are_normalized_before_lookup():
+    assert normalize_question("  What does   ALPHA do?? ") == "what does alpha do"
+    cache = QueryCache(8, 60)
+    cache.put("What does alpha do?", PARAMS, "v1", "answer")
+    assert cache.get("what does\talpha   do", PARAMS, "v1") == "answer"
+    assert cache.get("what does alpha do", PARAMS[:3] + (0.7,), "v1") is None
+    assert cache.get("what does alpha do", PARAMS, "v2") is None
+    assert cache.stats() == {"entries": 1, "hits": 1, "semantic_hits": 0, "misses": 2}
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(query_cache.time, "time", clock)
+    cache = QueryCache(8, 60)
+    cache.put("q", PARAMS, "v1", "answer")
+    clock.now += 59
+    assert cache.get("q", PARAMS, "v1") == "answer"
+    clock.now += 2
+    assert cache.get("q", PARAMS, "v1") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted_at_max_entries():
+    cache = QueryCache(2, 60)
+    cache.put("a", PARAMS, "v1", "A")
+    cache.put("b", PARAMS, "v1", "B")
+    assert cache.get("a", PARAMS, "v1") == "A"
+    cache.put("c", PARAMS, "v1", "C")
+    assert [cache.get(q, PARAMS, "v1") for q in "abc"] == ["A", None, "C"]
+    assert cache.stats()["entries"] == 2
+
+
+def test_invalidate_drops_only_the_given_version():
+    cache = QueryCache(8, 60)
+    cache.put("q", PARAMS, "v1", "old")
+    cache.put("q", PARAMS, "v2", "new")
+    cache.invalidate("v1")
+    assert cache.get("q", PARAMS, "v1") is None
+    assert cache.get("q", PARAMS, "v2") == "new"
+
+
+def test_rebuilding_a_codebase_invalidates_its_cached_answers(indexer, sources):
+    indexer.process_and_store_local_code(str(sources), codebase_id="cached")
+    old_version = indexer.get_codebase("cached").version
+    indexer.query_cache.put("q", PARAMS, old_version, "answer")
+
+    write_sources(sources, {"a.c": ["alpha_sum", "alpha_changed"]})
+    indexer.process_and_store_local_code(str(sources), codebase_id="cached")
+    assert indexer.get_codebase("cached").version != old_version
+    assert indexer.query_cache.get("q", PARAMS, old_version) is None
+
+
+def test_semantic_hits_need_the_threshold_and_the_same_params_and_version():
+    vectors = {"alpha sum": [1.0, 0.0], "sum of alpha": [0.96, 0.28], "beta mix": [0.6, 0.8]}
+    cache = QueryCache(8, 60, semantic_threshold=0.95, embed_fn=lambda q: np.array(vectors[q]))
+    cache.put("alpha sum", PARAMS, "v1", "answer")
+
+    assert cache.get("sum of alpha", PARAMS, "v1") == "answer"  # cosine 0.96
+    assert cache.get("beta mix", PARAMS, "v1") is None  # cosine 0.6
+    assert cache.get("sum of alpha", PARAMS, "v2") is None
+    assert cache.get("sum of alpha", PARAMS[:1] + (10,) + PARAMS[2:], "v1") is None
+    assert cache.stats() == {"entries": 1, "hits": 0, "semantic_hits": 1, "misses": 3}
+
+
+def test_semantic_lookup_is_off_without_an_embedding_function():
+    cache = QueryCache(8, 60, semantic_threshold=0.5)
+    cache.put("alpha sum", PARAMS, "v1", "answer")
+    assert cache.get("sum of alpha", PARAMS, "v1") is None
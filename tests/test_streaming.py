@@ -0,0 +1,76 @@
+import pytest
+import torch
+
+
+class FailingModel:
+    def generate(self, **kwargs):
+        raise RuntimeError("CUDA out of memory")
+
+
+@pytest.fixture
+def main(monkeypatch):
+    from app import llm_module, main
+    monkeypatch.setattr(main, "_check_codebase", lambda codebase_id: None)
+    monkeypatch.setattr(main.rag_pipeline, "retrieve_relevant_chunks", lambda *args, **kwargs: [])
+    monkeypatch.setattr(llm_module, "_build_prompt", lambda question, chunks: question)
+    monkeypatch.setattr(llm_module, "_generate_kwargs", lambda prompts, max_new_tokens, temperature: (
+        {"input_ids": torch.zeros((1, 3), dtype=torch.long)}, None, 3, 0))
+    monkeypatch.setattr(llm_module, "tokenizer", object())
+    monkeypatch.setattr(llm_module, "model", FailingModel())
+    monkeypatch.setattr(main.stream_pool, "timeout", 30)
+    return main
+
+
+def test_failed_generation_ends_the_stream_with_an_error_event(main):
+    from fastapi.testclient import TestClient
+    response = TestClient(main.app).post("/ask_model/stream", json={"question": "why"})
+
+    events = [block.split("\n")[0] for block in response.text.strip().split("\n\n")]
+    assert events == ["event: context", "event: error"]
+    assert "CUDA out of memory" in response.text
+    assert main.stream_pool.stats()["active"] == 0
+
+
+@pytest.mark.parametrize("field, value", [("top_k", 0), ("top_k", -3), ("top_k", 10_000),
+                                          ("temperature", -1), ("similarity_threshold", "high")])
+def test_out_of_range_question_fields_are_rejected(main, field, value):
+    from fastapi.testclient import TestClient
+    client = TestClient(main.app)
+    for path in ("/ask_model", "/ask_model/stream"):
+        assert client.post(path, json={"question": "why", field: value}).status_code == 422
+
+
+@pytest.mark.parametrize("value, clamped", [(2.0, 1.0), (-5, -1.0), (0.4, 0.4)])
+def test_similarity_threshold_is_clamped_to_the_cosine_range(main, value, clamped):
+    assert main.QuestionInput(question="why", similarity_threshold=value).similarity_threshold == clamped
+
+
+def test_streams_are_limited_to_inference_workers(main, monkeypatch):
+    import threading
+    from fastapi.testclient import TestClient
+    from app.config import BATCHING_ENABLED, INFERENCE_WORKERS
+    assert BATCHING_ENABLED and INFERENCE_WORKERS == 1
+    assert main.stream_pool is not main.inference_pool
+
+    started, release = threading.Event(), threading.Event()
+
+    def blocking_answer(question, chunks, temperature, stop):
+        started.set()
+        release.wait(10)
+        yield "answer"
+
+    monkeypatch.setattr(main.llm_module, "stream_answer", blocking_answer)
+    monkeypatch.setattr(main.stream_pool, "max_queue", 0)
+    client = TestClient(main.app)
+    first = []
+    thread = threading.Thread(target=lambda: first.append(client.post("/ask_model/stream", json={"question": "a"})))
+    thread.start()
+    try:
+        assert started.wait(10)
+        second = client.post("/ask_model/stream", json={"question": "b"})
+        assert second.status_code == 503
+    finally:
+        release.set()
+        thread.join(10)
+    assert first[0].status_code == 200
+    assert "event: done" in first[0].text
@@ -0,0 +1,142 @@
+import pathlib
+
+import pytest
+
+from app.symbol_index import SymbolIndex, _import_targets, outline
+
+SOURCES = {
+    "include/util.h": """\
+#ifndef UTIL_H
+#define UTIL_H
+int scale(int value);
+struct Counter {
+    int total;
+};
+#endif
+""",
+    "util.c": """\
+#include "include/util.h"
+
+int scale(int value) {
+    return value * 3;
+}
+
+int clamp(int value) {
+    return value > 100 ? 100 : value;
+}
+""",
+    "main.c": """\
+#include <stdio.h>
+#include "util.h"
+
+int run(int value) {
+    // scale(value) in a comment is not a call
+    int scaled = scale(value);
+    printf("clamp(%d)\\n", scaled);
+    return clamp(scaled);
+}
+
+int main(void) {
+    return run(2);
+}
+""",
+}
+
+
+@pytest.fixture
+def codebase(indexer):
+    source_dir = pathlib.Path(indexer.codebase_source_dir("symbols"))
+    for path, code in SOURCES.items():
+        (source_dir / path).parent.mkdir(parents=True, exist_ok=True)
+        (source_dir / path).write_text(code)
+    indexer.process_and_store_local_code(codebase_id="symbols")
+    return indexer.get_codebase("symbols")
+
+
+def test_definitions_are_found_across_files(codebase):
+    # Chunk lines are 0-based, like the chunker's
+    symbols = codebase.get_symbol_index()
+    assert [place[:3] for place in symbols.lookup("scale")] == [["util.c", 2, 4]]
+    assert [place[:3] for place in symbols.lookup("main")] == [["main.c", 10, 12]]
+    assert symbols.lookup("printf") == []
+    chunk_ids = symbols.lookup("clamp")[0][3]
+    assert codebase.chunk_store[chunk_ids[0]]["content"].startswith("int clamp(int value)")
+    assert symbols.classes["Counter"] == [["include/util.h", 3]]
+    assert sorted(symbols.files["util.c"]["functions"]) == ["clamp", "scale"]
+
+
+def test_includes_resolve_to_codebase_files(codebase):
+    symbols = codebase.get_symbol_index()
+    # "util.h" from main.c resolves by path suffix, <stdio.h> is not part of the codebase
+    assert symbols.files["main.c"]["includes"] == ["include/util.h"]
+    assert symbols.files["util.c"]["includes"] == ["include/util.h"]
+    assert sorted(symbols.included_by["include/util.h"]) == ["main.c", "util.c"]
+
+
+def test_call_sites_skip_comments_strings_and_external_functions(codebase):
+    symbols = codebase.get_symbol_index()
+    assert symbols.calls["run"] == [["scale", 5, "main.c"], ["clamp", 7, "main.c"]]
+    assert symbols.callees("main") == ["run"]
+    assert sorted(symbols.callers["scale"]) == ["run"]
+    assert "scale" not in symbols.calls and "clamp" not in symbols.calls
+    assert symbols.stats()["call_edges"] == 3
+
+
+def test_saved_index_loads_unchanged(codebase, tmp_path):
+    symbols = codebase.get_symbol_index()
+    symbols.save(str(tmp_path / "symbols.json"))
+    loaded = SymbolIndex.load(str(tmp_path / "symbols.json"))
+    assert (loaded.files, loaded.definitions, loaded.calls) == (symbols.files, symbols.definitions, symbols.calls)
+    assert loaded.callers == symbols.callers and loaded.included_by == symbols.included_by
+
+
+def test_import_targets_per_language():
+    assert _import_targets('#include "a/b.h"\n#include <vector>\n', ".cpp") == ["a/b.h", "vector"]
+    assert _import_targets("from ..pkg.mod import x\nimport os, json.decoder\nfrom . import y\n", ".py") == \
+        ["./../pkg/mod", "os", "json/decoder", "."]
+    assert _import_targets("import a from './a';\nconst b = require(\"../b\");\n", ".js") == ["./a", "../b"]
+    assert outline("class Foo {\n};\nstruct Bar;\n", "x.hpp")["classes"] == [["Foo", 0]]
+
+
+def test_relative_and_package_imports_resolve_within_the_corpus():
+    files = {
+        "pkg/__init__.py": {"imports": []},
+        "pkg/util.py": {"imports": []},
+        "pkg/app.py": {"imports": ["./util", "pkg", "missing"]},
+        "web/index.js": {"imports": []},
+        "web/main.js": {"imports": ["./index", "../pkg/util"]},
+    }
+    symbols = SymbolIndex.build([], files, "")
+    assert symbols.files["pkg/app.py"]["includes"] == ["pkg/__init__.py", "pkg/util.py"]
+    assert symbols.files["web/main.js"]["includes"] == ["pkg/util.py", "web/index.js"]
+
+
+def diagram(main, kind, **params):
+    from fastapi.testclient import TestClient
+    return TestClient(main.app).get(f"/diagrams/{kind}", params={"codebase_id": "symbols", **params})
+
+
+def test_diagram_endpoints(main, codebase):
+    calls = diagram(main, "calls", name="run").json()["mermaid"]
+    assert all(name in calls for name in ("run", "scale", "clamp", "main"))
+    assert "printf" not in calls
+
+    includes = diagram(main, "includes", name="main.c").json()["mermaid"]
+    assert "include/util.h" in includes and "stdio" not in includes
+    assert "util.c" in diagram(main, "includes").json()["mermaid"]
+
+    assert diagram(main, "flowchart", name="run").json()["mermaid"].startswith(("flowchart", "graph"))
+    assert "Counter" in diagram(main, "class", name="Counter").json()["mermaid"]
+    structure = diagram(main, "structure").json()["mermaid"]
+    assert structure.count("-->") == 2
+
+
+@pytest.mark.parametrize("kind, params, status", [
+    ("sequence", {}, 404),
+    ("calls", {}, 400),
+    ("calls", {"name": "printf"}, 404),
+    ("includes", {"name": "missing.c"}, 404),
+    ("class", {"name": "Missing"}, 404),
+])
+def test_diagram_errors(main, codebase, kind, params, status):
+    assert diagram(main, kind, **params).status_code == status
@@ -0,0 +1,65 @@
+import os
+import time
+import zipfile
+
+import pytest
+
+
+def make_zip(path, files):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, function in files.items():
+            archive.writestr(name, f"int {function}(int value) {{\n    return value * 3 + 1;\n}}\n")
+    return str(path)
+
+
+def ingest(main, spool_path, filename="upload.zip"):
+    upload_dir = main.rag_pipeline.codebase_source_dir("up")
+    return main._ingest_upload(spool_path, filename, upload_dir, "up", lambda **fields: None)
+
+
+def test_upload_replaces_sources_after_the_build(main, tmp_path):
+    ingest(main, make_zip(tmp_path / "first.zip", {"a.c": "alpha_sum", "lib/b.c": "beta_sum"}))
+    ingest(main, make_zip(tmp_path / "second.zip", {"c.c": "gamma_sum"}))
+
+    upload_dir = main.rag_pipeline.codebase_source_dir("up")
+    assert sorted(os.listdir(upload_dir)) == ["c.c"]
+    chunks = main.rag_pipeline.retrieve_relevant_chunks("gamma sum", codebase_id="up")
+    assert chunks and all(chunk["source"] == os.path.join(upload_dir, "c.c") for chunk in chunks)
+    assert sorted(os.listdir(os.path.dirname(upload_dir))) == ["up"]
+
+
+@pytest.mark.parametrize("bad_upload", ["oversized", "corrupt"])
+def test_rejected_upload_keeps_the_previous_sources(main, tmp_path, monkeypatch, bad_upload):
+    ingest(main, make_zip(tmp_path / "first.zip", {"a.c": "alpha_sum"}))
+    served = main.rag_pipeline.get_codebase("up")
+
+    if bad_upload == "oversized":
+        monkeypatch.setattr(main.rag_pipeline, "ZIP_MAX_TOTAL_BYTES", 10)
+        spool_path, error = make_zip(tmp_path / "second.zip", {"c.c": "gamma_sum"}), ValueError
+    else:
+        (tmp_path / "second.zip").write_bytes(b"not a zip")
+        spool_path, error = str(tmp_path / "second.zip"), zipfile.BadZipFile
+    with pytest.raises(error):
+        ingest(main, spool_path)
+
+    upload_dir = main.rag_pipeline.codebase_source_dir("up")
+    assert os.listdir(upload_dir) == ["a.c"]
+    assert sorted(os.listdir(os.path.dirname(upload_dir))) == ["up"]
+    assert main.rag_pipeline.get_codebase("up") is served
+    assert not os.path.exists(spool_path)
+
+
+def test_upload_endpoint_indexes_in_the_background(main, tmp_path):
+    from fastapi.testclient import TestClient
+    client = TestClient(main.app)
+    with open(make_zip(tmp_path / "upload.zip", {"a.c": "alpha_sum"}), "rb") as f:
+        response = client.post("/upload_codebase?codebase_id=up", files={"file": ("upload.zip", f)})
+    assert response.status_code == 202
+
+    job = main.ingest_jobs.get(response.json()["job_id"])
+    for _ in range(300):
+        if job.finished_at:
+            break
+        time.sleep(0.1)
+    assert client.get(response.json()["status_url"]).json()["status"] == "done"
+    assert os.listdir(main.rag_pipeline.codebase_source_dir("up")) == ["a.c"]
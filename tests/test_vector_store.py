@@ -0,0 +1,74 @@
+import faiss
+import numpy as np
+import pytest
+
+from app import vector_index
+from tests.conftest import HashingEncoder
+
+
+def _storage(index):
+    inner = faiss.downcast_index(index.index)
+    return faiss.downcast_index(getattr(inner, "storage", inner))
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+def test_served_index_is_memory_mapped(rag_pipeline, tmp_path, index_type):
+    vectors = np.random.default_rng(0).standard_normal((2000, 32)).astype(np.float32)
+    codebase = rag_pipeline.CodebaseIndex("mmap", store_dir=str(tmp_path))
+    faiss.write_index(vector_index.build_index(index_type, vectors), codebase.index_file)
+
+    assert not _storage(codebase._read_index(use_mmap=True)).codes.is_owned
+    assert _storage(codebase._read_index(use_mmap=False)).codes.is_owned
+
+
+def write_functions(root, names):
+    root.mkdir(parents=True, exist_ok=True)
+    for n, name in enumerate(names):
+        (root / f"{name}.c").write_text(f"int {name}(int x) {{ return x * {n} + {len(name)}; }}\n")
+
+
+@pytest.mark.parametrize("functions, expected", [(20, "flat"), (300, "ivf_pq")])
+def test_forced_ivf_pq_falls_back_to_flat_below_the_training_minimum(indexer, tmp_path, monkeypatch,
+                                                                      functions, expected):
+    monkeypatch.setattr(vector_index, "INDEX_TYPE", "ivf_pq")
+    write_functions(tmp_path / "src", [f"fn_{n}" for n in range(functions)])
+    stats = indexer.process_and_store_local_code(str(tmp_path / "src"), codebase_id="pq")
+
+    codebase = indexer.get_codebase("pq")
+    assert vector_index.index_type_of(codebase.index) == expected
+    assert codebase.index.ntotal == stats["vectors"] == functions
+
+
+def test_ivf_lists_are_sized_by_vectors_not_duplicate_records(indexer, tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index, "INDEX_TYPE", "ivf_flat")
+    monkeypatch.setattr(indexer, "DEDUP_CHUNKS", True)
+    names = [f"fn_{n}" for n in range(80)]
+    write_functions(tmp_path / "src", names)
+    for copy in range(3):
+        write_functions(tmp_path / "src" / f"vendor{copy}", names)
+    stats = indexer.process_and_store_local_code(str(tmp_path / "src"), codebase_id="ivf")
+
+    assert (stats["chunks"], stats["vectors"]) == (320, 80)
+    assert faiss.downcast_index(indexer.get_codebase("ivf").index.index).nlist == vector_index._nlist_for(80)
+
+
+def test_legacy_mapping_is_migrated_into_a_build_folder(indexer, tmp_path):
+    store_dir = tmp_path / "legacy"
+    store_dir.mkdir()
+    chunks = [{"content": f"int {name}(int x) {{ return x; }}", "source": f"{name}.c", "start_line": 1,
+               "end_line": 1, "symbol": name} for name in ("alpha_sum", "beta_mix")]
+    index = faiss.IndexFlatIP(HashingEncoder.dimension)
+    index.add(HashingEncoder().encode([c["content"] for c in chunks], normalize=True))
+    faiss.write_index(index, str(store_dir / "index.faiss"))
+    (store_dir / "id_mapping.json").write_text(indexer.json.dumps(chunks, indent=2))
+    legacy_files = {p.name: p.stat().st_mtime_ns for p in store_dir.iterdir()}
+
+    codebase = indexer.CodebaseIndex("legacy", store_dir=str(store_dir)).load(use_mmap=False)
+    assert [c["symbol"] for c in codebase.retrieve_batch(["beta_mix"], [1])[0]] == ["beta_mix"]
+    build, current = sorted(p.name for p in store_dir.iterdir() if p.name not in legacy_files)
+    assert current == indexer.CURRENT_BUILD_FILE and build.startswith(indexer.BUILD_DIR_PREFIX)
+    assert codebase.build_dir == str(store_dir / build)
+    assert {p.name: p.stat().st_mtime_ns for p in store_dir.iterdir() if p.name in legacy_files} == legacy_files
+
+    reloaded = indexer.CodebaseIndex("legacy", store_dir=str(store_dir)).load(use_mmap=False)
+    assert reloaded.build_dir == codebase.build_dir and len(reloaded.chunk_store) == 2